@@ -0,0 +1,312 @@
+"""
+Local stand-ins for the services the server talks to, so it can be
+benchmarked offline: a Prometheus HTTP API replaying training_data/metrics.csv,
+an in-memory Firestore client behind the real FirestoreBackend, and a Groq
+client returning canned answers.
+"""
+import csv
+import json
+import threading
+import time
+import types
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from metrics_collector import MetricsCollector
+from storage import FirestoreBackend
+
+
+# --- Prometheus -------------------------------------------------------------
+
+def load_csv_columns(path, fields=tuple(MetricsCollector.METRIC_QUERIES)):
+    """Metric columns of a CSV export as lists of floats."""
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    return {field: [float(row[field]) for row in rows] for field in fields}
+
+
+class FakePrometheus:
+    """
+    Serves /api/v1/query and /api/v1/query_range for the collector's PromQL.
+    Instant queries return the row under the replay cursor (moved by advance());
+    range queries map each step timestamp onto a row, cycling through the file.
+    By-target queries return `targets` series, each scaled slightly differently.
+    `delay` adds seconds of latency to every response.
+    """
+
+    def __init__(self, columns, targets=0, delay=0.0, host="127.0.0.1", port=0):
+        self.columns = columns
+        self.rows = len(next(iter(columns.values())))
+        self.targets = targets
+        self.delay = delay
+        self.cursor = 0
+        self.requests = 0
+        self.queries = {query: metric for metric, query in MetricsCollector.METRIC_QUERIES.items()}
+        self.target_queries = {query: metric for metric, query in MetricsCollector.TARGET_METRIC_QUERIES.items()}
+
+        handler = type("Handler", (PrometheusHandler,), {"prometheus": self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def advance(self, steps=1):
+        self.cursor = (self.cursor + steps) % self.rows
+
+    def lookup(self, query):
+        """(metric, by_target) for one of the collector's queries, or (None, False)."""
+        if query in self.queries:
+            return self.queries[query], False
+        for template, metric in self.target_queries.items():
+            if metric_matches(template, query):
+                return metric, True
+        return None, False
+
+    def instant(self, query):
+        metric, by_target = self.lookup(query)
+        if metric is None:
+            return []
+        value = self.columns[metric][self.cursor]
+        now = time.time()
+        if not by_target:
+            return [{"metric": {}, "value": [now, str(value)]}]
+        return [
+            {"metric": {"job": "api", "instance": f"10.0.0.{i + 1}:8080"},
+             "value": [now, str(value * (1 + 0.05 * i))]}
+            for i in range(self.targets)
+        ]
+
+    def range(self, query, start, end, step):
+        metric, _ = self.lookup(query)
+        if metric is None:
+            return []
+        column = self.columns[metric]
+        values = []
+        t = start
+        while t <= end:
+            values.append([t, str(column[int(t // step) % self.rows])])
+            t += step
+        return [{"metric": {}, "values": values}]
+
+
+def metric_matches(template, query):
+    """Whether query is template with some label list substituted for {by}."""
+    parts = template.split("{by}")
+    if not query.startswith(parts[0]) or not query.endswith(parts[-1]):
+        return False
+    position = len(parts[0])
+    for part in parts[1:-1]:
+        found = query.find(part, position)
+        if found < 0:
+            return False
+        position = found + len(part)
+    return True
+
+
+class PrometheusHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the collector's pooled session expects
+    prometheus = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        fake = self.prometheus
+        fake.requests += 1
+        if fake.delay:
+            time.sleep(fake.delay)
+
+        if url.path == "/api/v1/query":
+            data = {"resultType": "vector", "result": fake.instant(params.get("query", ""))}
+        elif url.path == "/api/v1/query_range":
+            data = {"resultType": "matrix", "result": fake.range(
+                params.get("query", ""), float(params["start"]), float(params["end"]), float(params["step"])
+            )}
+        else:
+            self.send_error(404)
+            return
+
+        body = json.dumps({"status": "success", "data": data}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# --- Firestore --------------------------------------------------------------
+
+SERVER_TIMESTAMP = object()
+
+# Just the parts of firebase_admin.firestore that FirestoreBackend uses
+firestore_module = types.SimpleNamespace(
+    SERVER_TIMESTAMP=SERVER_TIMESTAMP,
+    Query=types.SimpleNamespace(ASCENDING="ASCENDING", DESCENDING="DESCENDING"),
+)
+
+OPERATORS = {
+    "==": lambda a, b: a == b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+
+class DocumentSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class DocumentReference:
+    def __init__(self, client, collection, doc_id):
+        self.client = client
+        self.collection = collection
+        self.id = doc_id
+
+    def set(self, data):
+        self.client.commit([(self, data)])
+
+    def get(self):
+        with self.client.lock:
+            data = self.client.collections.get(self.collection, {}).get(self.id)
+        return DocumentSnapshot(self.id, data)
+
+
+class Query:
+    def __init__(self, client, collection, filters=(), order=None, limit=None):
+        self.client = client
+        self.collection = collection
+        self.filters = tuple(filters)
+        self.order = order
+        self.count = limit
+
+    def where(self, field, op, value):
+        return Query(self.client, self.collection, self.filters + ((field, op, value),), self.order, self.count)
+
+    def order_by(self, field, direction="ASCENDING"):
+        return Query(self.client, self.collection, self.filters, (field, direction), self.count)
+
+    def limit(self, count):
+        return Query(self.client, self.collection, self.filters, self.order, count)
+
+    def stream(self):
+        with self.client.lock:
+            items = list(self.client.collections.get(self.collection, {}).items())
+        for field, op, value in self.filters:
+            items = [(i, d) for i, d in items if field in d and OPERATORS[op](d[field], value)]
+        if self.order:
+            field, direction = self.order
+            # Like Firestore, documents without the ordered field are left out
+            items = [(i, d) for i, d in items if field in d]
+            items.sort(key=lambda item: item[1][field], reverse=direction == "DESCENDING")
+        if self.count is not None:
+            items = items[:self.count]
+        return iter([DocumentSnapshot(i, d) for i, d in items])
+
+
+class CollectionReference(Query):
+    def document(self, doc_id=None):
+        return DocumentReference(self.client, self.collection, doc_id or self.client.new_id())
+
+
+class WriteBatch:
+    def __init__(self, client):
+        self.client = client
+        self.writes = []
+
+    def set(self, ref, data):
+        self.writes.append((ref, data))
+
+    def commit(self):
+        self.client.commit(self.writes)
+        self.writes = []
+
+
+class InMemoryFirestore:
+    """Dict-backed client with the collection/document/query/batch calls FirestoreBackend makes."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.collections = {}
+        self.next_id = 0
+        self.writes = 0
+
+    def new_id(self):
+        with self.lock:
+            self.next_id += 1
+            return f"doc{self.next_id:08d}"
+
+    def collection(self, name):
+        return CollectionReference(self, name)
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def commit(self, writes):
+        now = datetime.now(timezone.utc)
+        with self.lock:
+            for ref, data in writes:
+                stored = {k: now if v is SERVER_TIMESTAMP else v for k, v in data.items()}
+                self.collections.setdefault(ref.collection, {})[ref.id] = stored
+            self.writes += len(writes)
+
+
+class InMemoryFirestoreBackend(FirestoreBackend):
+    """The real FirestoreBackend, pointed at an InMemoryFirestore instead of Cloud Firestore."""
+
+    def __init__(self, client=None):
+        self.firestore = firestore_module
+        self.db = client or InMemoryFirestore()
+
+
+# --- Groq -------------------------------------------------------------------
+
+class FakeGroq:
+    """
+    Groq client returning a canned answer after `delay` seconds, streamed in
+    `chunks` pieces when stream=True. Counts calls per model.
+    """
+
+    ANSWER = ("Latency is stable around its baseline, error rate is low and memory is flat; "
+              "no incident is expected in the forecast window.")
+
+    def __init__(self, answer=ANSWER, delay=0.0, chunks=20):
+        self.answer = answer
+        self.delay = delay
+        self.chunks = chunks
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, stream=False, **kwargs):
+        with self.lock:
+            self.calls[model] = self.calls.get(model, 0) + 1
+        time.sleep(self.delay)
+        if not stream:
+            message = types.SimpleNamespace(content=self.answer)
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+        return self.stream()
+
+    def stream(self):
+        size = max(len(self.answer) // self.chunks, 1)
+        for i in range(0, len(self.answer), size):
+            delta = types.SimpleNamespace(content=self.answer[i:i + size])
+            yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)])
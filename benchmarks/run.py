@@ -0,0 +1,483 @@
+#!/usr/bin/env python
+"""
+Offline benchmarks for the collector, the forecast pipeline, the Flask API and
+the SQL agent's database layer. Prometheus, Firestore and Groq are replaced by
+the stand-ins in fakes.py, so no credentials or network access are needed.
+
+    python benchmarks/run.py                                  # every scenario
+    python benchmarks/run.py --scenarios collector endpoints --quick
+    python benchmarks/run.py --compare benchmarks/results/<commit>.json
+
+Results are written as JSON (default benchmarks/results/<commit>.json);
+--compare prints the change of every timing against an earlier results file.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "server"))
+sys.path.insert(0, os.path.join(ROOT, "sql_agent", "src"))
+sys.path.insert(0, os.path.join(ROOT, "common", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import requests
+
+import metrics_cache
+from fakes import FakeGroq, FakePrometheus, InMemoryFirestoreBackend, load_csv_columns
+from forecast_pipeline import ForecastPipeline
+from metrics_cache import MetricsCache
+from metrics_collector import MetricsCollector
+
+CSV_PATH = os.path.join(ROOT, "training_data", "metrics.csv")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+SCENARIOS = ["collector", "pipeline", "endpoints", "sql_agent"]
+
+
+def summarize(seconds):
+    """Latency summary in milliseconds."""
+    ms = np.asarray(seconds, dtype=float) * 1000
+    if not len(ms):
+        return {"count": 0}
+    return {
+        "count": len(ms),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+    }
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+@contextlib.contextmanager
+def quiet(verbose):
+    """Hide the components' progress prints unless --verbose."""
+    if verbose:
+        yield
+    else:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+# --- Shared fixtures ----------------------------------------------------------
+
+def train_models(columns, metrics=ForecastPipeline.TARGET_METRICS, points=500):
+    """Small ARIMA models fitted on the CSV, standing in for the trained models directory."""
+    from pmdarima import ARIMA
+
+    models = {}
+    for metric in metrics:
+        models[metric] = ARIMA(order=(1, 0, 1), suppress_warnings=True).fit(np.asarray(columns[metric][-points:]))
+    return models
+
+
+def filled_cache(columns, points, capacity=None, scale=1.0, step=600):
+    """A MetricsCache holding the CSV's last `points` rows at `step`-second spacing ending now."""
+    cache = MetricsCache(capacity=capacity or points)
+    now = datetime.now().replace(microsecond=0)
+    rows = len(columns["latency"])
+    docs = []
+    for i in range(points):
+        row = (rows - points + i) % rows
+        doc = {field: values[row] * scale for field, values in columns.items()}
+        doc["timestamp"] = (now - timedelta(seconds=step * (points - 1 - i))).isoformat()
+        docs.append(doc)
+    cache.extend(docs)
+    return cache
+
+
+class BenchPipeline(ForecastPipeline):
+    """ForecastPipeline loading its models from models_dir."""
+
+    def model_path(self, metric):
+        return os.path.join(self.models_dir, f"{metric}_arima_model.pkl")
+
+
+# --- Scenarios --------------------------------------------------------------
+
+def bench_collector(args, ctx):
+    """Latency of one collection tick (all PromQL queries + scoring + queueing), with and without targets."""
+    results = {"runs": []}
+    for targets in sorted({0, args.targets}):
+        ctx["prometheus"].targets = targets
+        metrics_cache.target_caches.clear()
+        with quiet(args.verbose):
+            collector = MetricsCollector(
+                storage=InMemoryFirestoreBackend(),
+                prometheus_url=ctx["prometheus"].url,
+                cache=MetricsCache(),
+                spool_path=os.path.join(ctx["tmp"], f"collector_{targets}.jsonl"),
+                target_labels=["job", "instance"] if targets else None,
+            )
+            # Backfill runs before live collection, as at startup
+            backfilled, backfill = timed(collector.backfill, hours=args.backfill_hours)
+            ticks = []
+            for _ in range(args.ticks):
+                ctx["prometheus"].advance()
+                ticks.append(timed(collector.add_data_point)[1])
+            _, flush = timed(collector.writer.flush)
+            if collector.target_writer:
+                collector.target_writer.flush()
+        collector.query_executor.shutdown()
+        results["runs"].append({
+            "targets": targets,
+            "tick": summarize(ticks),
+            "flush_ms": flush * 1000,
+            "backfill_points": backfilled,
+            "backfill_s": backfill,
+        })
+    metrics_cache.target_caches.clear()
+    ctx["prometheus"].targets = 0
+    results["backfill_hours"] = args.backfill_hours
+    return results
+
+
+def bench_pipeline(args, ctx):
+    """Wall time of run_pipeline() by number of per-target series (cold = first run, starting the worker pool)."""
+    columns = ctx["columns"]
+    runs = []
+    for targets in sorted({0, args.targets, args.targets * 4}):
+        target_caches = {
+            f"job=api,instance=10.0.0.{i + 1}:8080": filled_cache(columns, 200, scale=1 + 0.05 * i)
+            for i in range(targets)
+        }
+        with quiet(args.verbose):
+            pipeline = BenchPipeline(
+                models_dir=ctx["models_dir"],
+                cache=filled_cache(columns, 1000),
+                target_caches=target_caches,
+                storage=InMemoryFirestoreBackend(),
+                max_workers=args.workers,
+            )
+            _, cold = timed(pipeline.run_pipeline)
+            warm = [timed(pipeline.run_pipeline)[1] for _ in range(args.pipeline_runs)]
+            pipeline.executor.shutdown()
+        runs.append({
+            "targets": targets,
+            "series": len(pipeline.TARGET_METRICS) + targets * len(pipeline.TARGET_METRICS),
+            "cold_s": cold,
+            "warm_s": float(np.median(warm)),
+            "slowest_series_s": max(pipeline.last_series_timings.values(), default=0.0),
+        })
+    return {"workers": args.workers, "runs": runs}
+
+
+def load(url, method, body, concurrency, requests_per_client, session_per_client=False):
+    """Latencies and errors of concurrency x requests_per_client calls to one endpoint."""
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def client(n):
+        session = requests.Session()
+        payload = dict(body or {})
+        if session_per_client:
+            payload["session_id"] = f"bench-{n}-{time.time_ns()}"
+        mine = []
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            try:
+                response = session.request(method, url, json=payload if body is not None else None, timeout=60)
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            mine.append(time.perf_counter() - start)
+            if not ok:
+                with lock:
+                    errors.append(n)
+        with lock:
+            latencies.extend(mine)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(client, range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {**summarize(latencies), "errors": len(errors), "rps": len(latencies) / elapsed if elapsed else 0.0}
+
+
+def bench_endpoints(args, ctx):
+    """p50/p99 of the Flask endpoints under concurrent clients, with the app's storage and Groq client faked."""
+    import storage
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    backend = InMemoryFirestoreBackend()
+    storage.create_storage = lambda *a, **kw: backend
+    groq = FakeGroq(delay=args.llm_delay)
+    with quiet(args.verbose):
+        import app as server_app
+        server_app.create_app()
+        server_app.client = groq
+        server_app.metrics_service.prometheus_url = ctx["prometheus"].url
+        server_app.metrics_service.backfill(hours=args.backfill_hours)
+        server_app.forecast_pipeline.models = {m: pickle.loads(pickle.dumps(model)) for m, model in ctx["models"].items()}
+        server_app.forecast_pipeline.run_pipeline()
+
+    server = make_server("127.0.0.1", 0, server_app.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    now = int(time.time())
+    cases = {
+        "metrics_latest": ("GET", "/metrics?limit=100", None),
+        "metrics_range_auto": ("GET", f"/metrics?start={now - int(args.backfill_hours * 3600)}&end={now}", None),
+        "metrics_range_raw_1d": ("GET", f"/metrics?start={now - 86400}&end={now}&resolution=raw", None),
+        "forecast": ("GET", "/forecast", None),
+        "chat_routed": ("POST", "/chat", {"message": "average cpu over the last 6 hours"}),
+        "chat_llm": ("POST", "/chat", {"message": "Is an outage likely in the next hour?"}),
+    }
+    results = {"concurrency": args.concurrency, "requests_per_client": args.requests, "llm_delay_s": args.llm_delay}
+    try:
+        with quiet(args.verbose):
+            for name, (method, path, body) in cases.items():
+                # Chat clients keep a session, so follow-up turns reach the (stub) LLM
+                results[name] = load(base + path, method, body, args.concurrency, args.requests,
+                                     session_per_client=name.startswith("chat"))
+    finally:
+        server.shutdown()
+        server_app.forecast_pipeline.executor.shutdown()
+    results["llm_calls"] = dict(groq.calls)
+    return results
+
+
+class StubCrew:
+    """Canned-answer crew for the SQL agent's pool: one real query, then a fixed LLM delay."""
+
+    tasks = []
+    agents = []
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def kickoff(self, inputs):
+        from sql_agent.db import run_sql
+
+        run_sql("SELECT avg(latency), max(latency) FROM metrics")
+        time.sleep(self.delay)
+        return "Latency averaged within its normal range."
+
+
+def bench_sql_agent(args, ctx):
+    """Schema load, intent router and run_sql latency on a database built from the CSV; /query when FastAPI is available."""
+    db_path = os.path.join(ctx["tmp"], "metrics.db")
+    os.environ["SQL_AGENT_DB"] = db_path
+    with quiet(args.verbose):
+        from sql_agent.ingest import load_csv
+        from sql_agent import db
+        from sql_agent.router import IntentRouter
+        from sql_agent.schema import load_schema
+
+        _, ingest = timed(load_csv, CSV_PATH, db_path)
+        _, schema_cold = timed(load_schema)
+        schema_warm = [timed(load_schema)[1] for _ in range(args.requests)]
+
+        questions = [
+            "current latency", "average cpu over the last 6 hours", "max memory in the past day",
+            "top 5 latency spikes in the last 24 hours", "p95 request time last hour", "current risk score",
+        ]
+        router = IntentRouter()
+        routed = [timed(router.answer, q)[1] for _ in range(args.requests) for q in questions]
+
+        queries = [
+            "SELECT avg(latency), max(latency), min(latency) FROM metrics",
+            "SELECT substr(timestamp, 1, 13) AS hour, avg(cpu) FROM metrics GROUP BY hour",
+            "SELECT timestamp, latency FROM metrics ORDER BY latency DESC LIMIT 10",
+            "SELECT bucket, latency_p95 FROM metrics_hourly ORDER BY bucket DESC LIMIT 24",
+        ]
+        cold = [timed(db.run_sql, q)[1] for q in queries]
+        cached = [timed(db.run_sql, q)[1] for _ in range(args.requests) for q in queries]
+        uncached = []
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            # Distinct literals so every call misses the result cache and runs on a pooled connection
+            calls = [f"SELECT count(*) FROM metrics WHERE latency > {100 + i}" for i in range(args.concurrency * args.requests)]
+            uncached = list(pool.map(lambda q: timed(db.run_sql, q)[1], calls))
+
+    results = {
+        "ingest_s": ingest,
+        "schema_cold_ms": schema_cold * 1000,
+        "schema_warm": summarize(schema_warm),
+        "router": summarize(routed),
+        "router_hit_rate": router.stats()["hit_rate"],
+        "run_sql_cold": summarize(cold),
+        "run_sql_cached": summarize(cached),
+        "run_sql_concurrent": summarize(uncached),
+        "query": bench_sql_agent_api(args),
+    }
+    return results
+
+
+def bench_sql_agent_api(args):
+    """/query through FastAPI's test client with stub crews; skipped without fastapi/crewai."""
+    try:
+        from fastapi.testclient import TestClient
+        sys.path.insert(0, os.path.join(ROOT, "sql_agent"))
+        import server as agent_server
+    except ImportError as e:
+        return {"skipped": f"{e}"}
+
+    agent_server.crew_pool.factory = lambda: StubCrew(args.llm_delay)
+    cases = {
+        "routed": "average latency over the last hour",
+        "crew": "Why did latency rise on the second day?",
+    }
+    results = {}
+    with TestClient(agent_server.app) as http, ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for name, question in cases.items():
+            def ask(n):
+                # Distinct questions so the answer cache doesn't serve the crew case
+                text = question if name == "routed" else f"{question} ({n})"
+                return timed(http.post, "/query", json={"question": text})[1]
+            results[name] = summarize(list(pool.map(ask, range(args.concurrency * args.requests))))
+    results["pool"] = agent_server.crew_pool.stats()
+    return results
+
+
+BENCHMARKS = {
+    "collector": bench_collector,
+    "pipeline": bench_pipeline,
+    "endpoints": bench_endpoints,
+    "sql_agent": bench_sql_agent,
+}
+
+
+# --- Reporting --------------------------------------------------------------
+
+def timings(results, prefix=""):
+    """Flatten every *_ms / *_s number (and list entries by position) into path -> value."""
+    flat = {}
+    if isinstance(results, dict):
+        for key, value in results.items():
+            path = f"{prefix}.{key}" if prefix else key
+            if isinstance(value, (dict, list)):
+                flat.update(timings(value, path))
+            elif isinstance(value, (int, float)) and (key.endswith("_ms") or key.endswith("_s")):
+                flat[path] = value
+    elif isinstance(results, list):
+        for i, value in enumerate(results):
+            flat.update(timings(value, f"{prefix}[{i}]"))
+    return flat
+
+
+def compare(baseline, current, threshold=0.1):
+    """Print timings that moved by more than `threshold` (relative) between two results files."""
+    old = timings(baseline["scenarios"])
+    new = timings(current["scenarios"])
+    print(f"\nCompared with {baseline.get('commit')} ({baseline.get('created_at')}):")
+    changed = 0
+    for path in sorted(old.keys() & new.keys()):
+        before, after = old[path], new[path]
+        if not before:
+            continue
+        change = (after - before) / before
+        if abs(change) >= threshold:
+            changed += 1
+            flag = "slower" if change > 0 else "faster"
+            print(f"  {path}: {before:.3f} -> {after:.3f} ({change:+.0%}, {flag})")
+    if not changed:
+        print(f"  no timing changed by {threshold:.0%} or more")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks with local Prometheus, Firestore and Groq stand-ins")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--output", help="Results file (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", metavar="RESULTS", help="Earlier results file to compare against")
+    parser.add_argument("--quick", action="store_true", help="Fewer iterations, for a smoke run")
+    parser.add_argument("--ticks", type=int, default=200, help="Collector ticks per run")
+    parser.add_argument("--targets", type=int, default=4, help="Targets served by the fake Prometheus")
+    parser.add_argument("--backfill-hours", type=float, default=24 * 7)
+    parser.add_argument("--workers", type=int, default=min(os.cpu_count() or 1, 4), help="Forecast worker processes")
+    parser.add_argument("--pipeline-runs", type=int, default=3, help="Warm pipeline runs per series count")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent API clients")
+    parser.add_argument("--requests", type=int, default=25, help="Requests per client per endpoint")
+    parser.add_argument("--llm-delay", type=float, default=0.05, help="Seconds the LLM stub takes per call")
+    parser.add_argument("--prometheus-delay", type=float, default=0.0, help="Seconds the Prometheus stub takes per call")
+    parser.add_argument("--verbose", action="store_true", help="Show the components' own output")
+    args = parser.parse_args()
+    if args.quick:
+        args.ticks, args.backfill_hours, args.pipeline_runs, args.requests = 20, 24, 1, 5
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+
+    tmp = tempfile.mkdtemp(prefix="atom-bench-")
+    os.chdir(tmp)  # Spool files and the like land here, not in the tree
+    columns = load_csv_columns(CSV_PATH, fields=("latency", "error_rate", "cpu", "memory", "request_time", "risk_score"))
+    ctx = {
+        "tmp": tmp,
+        "columns": columns,
+        "prometheus": FakePrometheus(columns, delay=args.prometheus_delay).start(),
+    }
+    if {"pipeline", "endpoints"} & set(args.scenarios):
+        print("Training stand-in ARIMA models...")
+        ctx["models"] = train_models(columns)
+        ctx["models_dir"] = os.path.join(tmp, "models")
+        os.makedirs(ctx["models_dir"])
+        for metric, model in ctx["models"].items():
+            with open(os.path.join(ctx["models_dir"], f"{metric}_arima_model.pkl"), "wb") as f:
+                pickle.dump(model, f)
+
+    commit, dirty = git_commit()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "verbose")},
+        "scenarios": {},
+    }
+    try:
+        for name in args.scenarios:
+            print(f"Running {name}...")
+            started = time.perf_counter()
+            report["scenarios"][name] = BENCHMARKS[name](args, ctx)
+            print(f"  done in {time.perf_counter() - started:.1f}s")
+    finally:
+        ctx["prometheus"].stop()
+
+    output = output or os.path.join(RESULTS_DIR, f"{commit}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(json.dumps(report["scenarios"], indent=2, default=str))
+    print(f"\nResults written to {output}")
+
+    if baseline:
+        with open(baseline) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
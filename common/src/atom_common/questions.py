@@ -0,0 +1,98 @@
+import re
+from typing import NamedTuple, Optional
+
+from .semantic_cache import STOPWORDS, normalize
+
+# Phrase -> metric column; two-word phrases are matched first
+METRIC_WORDS = {
+    "error rate": "error_rate", "error rates": "error_rate", "error_rate": "error_rate", "errors": "error_rate",
+    "risk score": "risk_score", "risk_score": "risk_score", "risk": "risk_score",
+    "request time": "request_time", "request_time": "request_time", "response time": "request_time",
+    "latency": "latency", "latencies": "latency",
+    "cpu": "cpu", "memory": "memory", "mem": "memory", "ram": "memory",
+}
+AGGREGATE_WORDS = {
+    "latest": "latest", "current": "latest", "currently": "latest", "now": "latest",
+    "average": "avg", "avg": "avg", "mean": "avg", "typical": "avg",
+    "max": "max", "maximum": "max", "highest": "max", "peak": "max",
+    "biggest": "max", "largest": "max", "worst": "max",
+    "min": "min", "minimum": "min", "lowest": "min",
+    "p95": "p95", "95th percentile": "p95",
+}
+SPIKE_WORDS = {"spike", "spikes", "peaks"}
+FILLER = STOPWORDS - {"and", "current", "currently", "now"} | {
+    "during", "level", "over", "reading", "readings", "recorded", "system", "usage", "utilization",
+    "value", "values", "were", "has", "been",
+}
+
+NUMBER_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "six": 6, "twelve": 12}
+_WINDOW = re.compile(
+    r"\b(?:last|past|previous)\s+(\d+|" + "|".join(NUMBER_WORDS) + r")?\s*"
+    r"(minute|min|hour|hr|h|day|week)s?\b"
+)
+_TOP = re.compile(r"\btop\s+(\d+)\b|\b(\d+)\s+(?:biggest|largest|highest|worst)\b")
+WINDOW_UNITS = {"minute": 60, "min": 60, "hour": 3600, "hr": 3600, "h": 3600, "day": 86400, "week": 604800}
+UNIT_NAMES = {60: "minute", 3600: "hour", 86400: "day", 604800: "week"}
+DEFAULT_TOP = 5
+MAX_TOP = 50
+
+
+class Intent(NamedTuple):
+    kind: str  # latest, avg, max, min, p95 or spikes
+    metric: str
+    window: Optional[int] = None  # Seconds back from the newest point; None for all data
+    window_label: str = ""
+    top: int = DEFAULT_TOP
+
+
+def parse_question(question: str) -> Optional[Intent]:
+    """
+    The stock question `question` asks, or None. Deliberately strict: every
+    word must be understood, with exactly one metric and one aggregate, so
+    anything more nuanced is left to the LLM.
+    """
+    text = normalize(question)
+
+    window, window_label = None, ""
+    match = _WINDOW.search(text)
+    if match:
+        count = match.group(1) or "1"
+        count = int(count) if count.isdigit() else NUMBER_WORDS[count]
+        seconds = WINDOW_UNITS[match.group(2)]
+        window = count * seconds
+        unit = UNIT_NAMES[seconds]
+        window_label = f"last {unit}" if count == 1 else f"last {count} {unit}s"
+        text = text[:match.start()] + " " + text[match.end():]
+
+    top = None
+    match = _TOP.search(text)
+    if match:
+        top = int(match.group(1) or match.group(2))
+        text = text[:match.start()] + " " + text[match.end():]
+
+    metrics, aggregates, spikes = set(), set(), False
+    words = text.split()
+    i = 0
+    while i < len(words):
+        two = " ".join(words[i:i + 2]) if i + 1 < len(words) else None
+        phrase, size = (two, 2) if two in METRIC_WORDS or two in AGGREGATE_WORDS else (words[i], 1)
+        if phrase in METRIC_WORDS:
+            metrics.add(METRIC_WORDS[phrase])
+        elif phrase in AGGREGATE_WORDS:
+            aggregates.add(AGGREGATE_WORDS[phrase])
+        elif phrase in SPIKE_WORDS:
+            spikes = True
+        elif phrase not in FILLER:
+            return None  # A word we don't understand
+        i += size
+
+    if len(metrics) != 1:
+        return None
+    metric = metrics.pop()
+    if spikes or top is not None:
+        if aggregates - {"max"}:
+            return None
+        return Intent("spikes", metric, window, window_label, min(top or DEFAULT_TOP, MAX_TOP))
+    if len(aggregates) != 1:
+        return None
+    return Intent(aggregates.pop(), metric, window, window_label)
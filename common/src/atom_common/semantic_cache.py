@@ -0,0 +1,156 @@
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+# Filler words that don't change what a question asks for
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'at', 'be', 'can', 'current', 'currently', 'do', 'does', 'for',
+    'get', 'give', 'how', 'i', 'in', 'is', 'it', 'its', 'me', 'my', 'now', 'of', 'on', 'our',
+    'please', 'right', 's', 'show', 'tell', 'the', 'there', 'to', 'was', 'what', 'whats', 'you',
+}
+
+
+# Words that change the answer even when the rest of a question is the same.
+# A similarity match must agree on all of them (after mapping synonyms) and
+# on every number; e.g. "max ... last 7 days" never matches "min ... last 3 days".
+KEY_TERMS = {
+    # Aggregates
+    'max': 'max', 'maximum': 'max', 'highest': 'max', 'peak': 'max', 'biggest': 'max',
+    'largest': 'max', 'worst': 'max', 'top': 'max',
+    'min': 'min', 'minimum': 'min', 'lowest': 'min', 'smallest': 'min', 'best': 'min',
+    'avg': 'avg', 'average': 'avg', 'mean': 'avg', 'typical': 'avg', 'median': 'median',
+    'p50': 'p50', 'p90': 'p90', 'p95': 'p95', 'p99': 'p99', 'percentile': 'percentile',
+    'latest': 'latest', 'current': 'latest', 'currently': 'latest', 'now': 'latest', 'recent': 'latest',
+    'total': 'sum', 'sum': 'sum', 'count': 'count', 'many': 'count', 'number': 'count',
+    # Comparisons
+    'above': 'above', 'over': 'above', 'more': 'above', 'greater': 'above', 'higher': 'above', 'exceed': 'above',
+    'exceeds': 'above', 'exceeded': 'above',
+    'below': 'below', 'under': 'below', 'less': 'below', 'fewer': 'below', 'lower': 'below',
+    # Negations ("didn't" normalizes to "didn t")
+    'not': 'not', 'no': 'not', 'never': 'not', 'none': 'not', 'without': 'not', 'except': 'not',
+    'excluding': 'not', 't': 'not', 'cannot': 'not', 'nothing': 'not',
+    # Metrics
+    'latency': 'latency', 'latencies': 'latency', 'error': 'error', 'errors': 'error', 'error_rate': 'error',
+    'cpu': 'cpu', 'memory': 'memory', 'mem': 'memory', 'ram': 'memory', 'request': 'request',
+    'requests': 'request', 'request_time': 'request', 'response': 'request', 'risk': 'risk', 'risk_score': 'risk',
+    'anomaly': 'anomaly', 'anomalies': 'anomaly', 'anomalous': 'anomaly',
+    # Time units
+    'second': 'second', 'seconds': 'second', 'sec': 'second', 'secs': 'second',
+    'minute': 'minute', 'minutes': 'minute', 'mins': 'minute',
+    'hour': 'hour', 'hours': 'hour', 'hr': 'hour', 'hrs': 'hour', 'h': 'hour', 'hourly': 'hour',
+    'day': 'day', 'days': 'day', 'daily': 'day', 'today': 'today', 'yesterday': 'yesterday',
+    'week': 'week', 'weeks': 'week', 'weekly': 'week', 'month': 'month', 'months': 'month', 'monthly': 'month',
+    'year': 'year', 'years': 'year',
+}
+NUMBER_TERMS = {
+    'one': '1', 'two': '2', 'three': '3', 'four': '4', 'five': '5', 'six': '6', 'seven': '7',
+    'eight': '8', 'nine': '9', 'ten': '10', 'eleven': '11', 'twelve': '12', 'fifteen': '15',
+    'twenty': '20', 'thirty': '30', 'hundred': '100', 'thousand': '1000',
+}
+
+
+def key_terms(text: str) -> Tuple[str, ...]:
+    """Sorted key terms and numbers of a normalized question."""
+    terms = []
+    for word in text.split():
+        if word in KEY_TERMS:
+            terms.append(KEY_TERMS[word])
+        elif word in NUMBER_TERMS:
+            terms.append(NUMBER_TERMS[word])
+        elif any(c.isdigit() for c in word):
+            terms.append(word)
+    return tuple(sorted(terms))
+
+
+def embed(text: str, dim: int = 512) -> np.ndarray:
+    """
+    Hashed bag-of-features embedding of a normalized question: content words,
+    word pairs and in-word character trigrams, L2-normalized.
+    """
+    words = [w for w in text.split() if w not in STOPWORDS] or text.split()
+    features = [(w, 1.0) for w in words]
+    features += [(f"{a} {b}", 0.5) for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f" {word} "
+        features += [(padded[i:i + 3], 0.25) for i in range(len(padded) - 2)]
+
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature, weight in features:
+        vector[zlib.crc32(feature.encode()) % dim] += weight
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """
+    LLM answers keyed by normalized question and a fingerprint of the data
+    they were built from (the chat digest version, the database's data
+    version). Answers expire after `ttl` seconds or as soon as the
+    fingerprint changes; with `semantic` on, paraphrased questions
+    (cosine >= threshold) also hit when they ask for the same key terms
+    and numbers.
+    """
+
+    def __init__(self, ttl: float = 300, max_entries: int = 256,
+                 threshold: float = 0.9, semantic: bool = True):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.semantic = semantic
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[Any, float, Optional[np.ndarray], Optional[Tuple[str, ...]]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, question: str, fingerprint: Hashable) -> Optional[Any]:
+        question = normalize(question)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            key: Optional[Tuple[str, Hashable]] = (question, fingerprint)
+            if key not in self._entries and self.semantic:
+                key = self._nearest(question, fingerprint)
+            if key is None or key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def put(self, question: str, fingerprint: Hashable, answer: Any) -> None:
+        question = normalize(question)
+        vector, terms = (embed(question), key_terms(question)) if self.semantic else (None, None)
+        with self._lock:
+            self._entries[(question, fingerprint)] = (answer, time.monotonic() + self.ttl, vector, terms)
+            self._entries.move_to_end((question, fingerprint))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _nearest(self, question: str, fingerprint: Hashable) -> Optional[Tuple[str, Hashable]]:
+        terms = key_terms(question)
+        keys = [key for key in self._entries if key[1] == fingerprint and self._entries[key][3] == terms]
+        if not keys:
+            return None
+        vectors = np.stack([self._entries[key][2] for key in keys])
+        scores = vectors @ embed(question)
+        best = int(scores.argmax())
+        return keys[best] if scores[best] >= self.threshold else None
+
+    def _expire(self, now: float) -> None:
+        for key in [k for k, (_, expires, _, _) in self._entries.items() if expires <= now]:
+            del self._entries[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,33 @@
+import pytest
+
+from atom_common.questions import parse_question
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("What's the current CPU?", ('latest', 'cpu', None, '', 5)),
+    ("average latency", ('avg', 'latency', None, '', 5)),
+    ("Peak memory usage over the last 24 hours", ('max', 'memory', 86400, 'last 24 hours', 5)),
+    ("lowest error rate in the past hour", ('min', 'error_rate', 3600, 'last hour', 5)),
+    ("p95 response time for the last two days", ('p95', 'request_time', 172800, 'last 2 days', 5)),
+    ("95th percentile latency past 30 minutes", ('p95', 'latency', 1800, 'last 30 minutes', 5)),
+    ("show me latency spikes", ('spikes', 'latency', None, '', 5)),
+    ("top 3 cpu readings in the last week", ('spikes', 'cpu', 604800, 'last week', 3)),
+    ("10 highest risk score readings", ('spikes', 'risk_score', None, '', 10)),
+    ("top 500 latency readings", ('spikes', 'latency', None, '', 50)),
+])
+def test_routed_questions(question, expected):
+    assert tuple(parse_question(question)) == expected
+
+
+@pytest.mark.parametrize("question", [
+    "What is the average CPU and memory?",
+    "Why is latency high?",
+    "max min latency",
+    "latency",
+    "average latency when cpu is high",
+    "lowest latency spikes",
+    "average latency for the checkout service",
+    "",
+])
+def test_questions_left_to_the_llm(question):
+    assert parse_question(question) is None
@@ -0,0 +1,62 @@
+import time
+
+import pytest
+
+from atom_common.semantic_cache import SemanticCache, key_terms, normalize
+
+QUESTION = "What was the maximum memory usage on the checkout service during the last 7 days?"
+
+
+@pytest.fixture
+def cache():
+    return SemanticCache()
+
+
+@pytest.mark.parametrize("question", [
+    "what was the maximum memory usage on the checkout service during the last 7 days",
+    "What's the maximum memory usage on checkout service during the last 7 days?",
+    "Whats the maximum memory usage on the checkout service during last 7 days",
+])
+def test_paraphrase_hits(cache, question):
+    cache.put(QUESTION, "v1", "MAX ANSWER")
+    assert cache.get(question, "v1") == "MAX ANSWER"
+
+
+@pytest.mark.parametrize("question", [
+    "What was the minimum memory usage on the checkout service during the last 7 days?",
+    "What was the average memory usage on the checkout service during the last 7 days?",
+    "What was the maximum memory usage on the checkout service during the last 3 days?",
+    "What was the maximum memory usage on the checkout service during the last seven hours?",
+    "What was the maximum cpu usage on the checkout service during the last 7 days?",
+    "What was the maximum memory usage on the checkout service during the last 7 days, not counting deploys?",
+    "What wasn't the maximum memory usage on the checkout service during the last 7 days?",
+])
+def test_different_question_misses(cache, question):
+    cache.put(QUESTION, "v1", "MAX ANSWER")
+    assert cache.get(question, "v1") is None
+
+
+def test_key_terms_map_synonyms_and_number_words():
+    assert key_terms(normalize(QUESTION)) == ("7", "day", "max", "memory")
+    assert key_terms("highest ram over the past seven days") == ("7", "above", "day", "max", "memory")
+
+
+def test_new_data_misses(cache):
+    cache.put(QUESTION, "v1", "MAX ANSWER")
+    assert cache.get(QUESTION, "v2") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_exact_match_without_semantic_lookup():
+    cache = SemanticCache(semantic=False)
+    cache.put(QUESTION, "v1", "MAX ANSWER")
+    assert cache.get(QUESTION.upper(), "v1") == "MAX ANSWER"
+    assert cache.get(QUESTION.replace("the last", "last"), "v1") is None
+
+
+def test_expired_answer_misses(cache, monkeypatch):
+    cache.put(QUESTION, "v1", "MAX ANSWER")
+    later = time.monotonic() + cache.ttl + 1
+    monkeypatch.setattr("atom_common.semantic_cache.time.monotonic", lambda: later)
+    assert cache.get(QUESTION, "v1") is None
+    assert cache.stats()["entries"] == 0
@@ -1,8 +1,21 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from groq import Groq
 from metrics_collector import MetricsCollector
 from forecast_pipeline import ForecastPipeline
+from response_cache import ResponseCache
+from event_stream import EventBroker
+from chat_sessions import ChatSessionStore, estimate_tokens
+from chat_digest import DigestBuilder
+from atom_common.semantic_cache import SemanticCache
+from intent_router import IntentRouter
+from storage import create_storage
+from rollups import TIERS
+from instrumentation import (
+    chat_answers, end_request, exposition, http_seconds, llm_first_token_seconds, llm_seconds,
+    llm_tokens, server_timing, start_request, timed
+)
+from prometheus_client import CONTENT_TYPE_LATEST
 import os
 import time
 from datetime import datetime
@@ -10,8 +23,6 @@ from prometheus_client import CollectorRegistry, Gauge, Counter, Histogram
 import numpy as np
 from collections import deque
 import requests
-import firebase_admin
-from firebase_admin import credentials, firestore
 import os
 
 app = Flask(__name__)
@@ -19,7 +30,31 @@ CORS(app)
 
 # Configure your Groq API key
 API_KEY = "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"
-client = Groq(api_key=API_KEY)
+CHAT_MODEL = "llama-3.3-70b-versatile"
+SUMMARY_MODEL = "llama-3.1-8b-instant"
+
+# Set ATOM_SERVER_TIMING=1 to add a Server-Timing header (storage, llm, total) to every response
+SERVER_TIMING = os.getenv("ATOM_SERVER_TIMING", "").lower() in ("1", "true", "yes")
+
+@app.before_request
+def begin_timing():
+    start_request()
+
+@app.after_request
+def finish_timing(response):
+    total, timings = end_request()
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    http_seconds.labels(endpoint=endpoint, method=request.method, status=response.status_code).observe(total)
+    if SERVER_TIMING:
+        response.headers['Server-Timing'] = server_timing(total, timings)
+    return response
+
+def count_llm_tokens(model, messages, answer, usage=None):
+    """Token counters from the API's reported usage, or estimated from the text."""
+    prompt = getattr(usage, 'prompt_tokens', None) or sum(estimate_tokens(m['content']) for m in messages)
+    completion = getattr(usage, 'completion_tokens', None) or estimate_tokens(answer)
+    llm_tokens.labels(model=model, kind='prompt').inc(prompt)
+    llm_tokens.labels(model=model, kind='completion').inc(completion)
 
 # System prompt for pre-incident forecasting assistant
 SYSTEM_PROMPT = """You are an AI-powered pre-incident detection assistant specializing in:
@@ -37,40 +72,180 @@ SYSTEM_PROMPT = """You are an AI-powered pre-incident detection assistant specia
 
 Help ML Engineers, SREs, Backend Architects, and Platform Engineers shift from reactive alerting to predictive reliability intelligence. Provide actionable insights, reduce false positives, and detect slow degradation patterns early."""
 
-# Conversation history
-history = [{"role": "system", "content": SYSTEM_PROMPT}]
 
-# Initialize Firestore MetricsCollector with service account key
-metrics_service = MetricsCollector(
-    credentials_path="key.json",
-    prometheus_url='http://localhost:9090'
-)
+# Services, wired by create_app(). Importing this module has no side effects,
+# so spawned worker processes (which re-import the main script) stay cheap.
+client = None
+storage = metrics_service = forecast_pipeline = None
+response_cache = event_broker = digest = None
+chat_sessions = chat_cache = intent_router = None
 
-# Initialize Forecast Pipeline
-forecast_pipeline = ForecastPipeline(
-    credentials_path="key.json",
-    models_dir="../models"
-)
+def summarize_history(summary, messages):
+    """Fold older turns into the running conversation summary with a small model."""
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    prompt = [
+        {"role": "system", "content": "Summarize this conversation for later context in under 150 words. Keep metric values, incidents, decisions and open questions."},
+        {"role": "user", "content": f"Earlier summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"}
+    ]
+    with timed(llm_seconds, 'llm', model=SUMMARY_MODEL, stream='false'):
+        response = client.chat.completions.create(
+            model=SUMMARY_MODEL,
+            messages=prompt,
+            temperature=0.2,
+            max_tokens=256
+        )
+    folded = response.choices[0].message.content
+    count_llm_tokens(SUMMARY_MODEL, prompt, folded, getattr(response, 'usage', None))
+    return folded
 
-def chat_with_groq(user_input):
-    """Send a message to Groq and get a response."""
-    history.append({"role": "user", "content": user_input})
+def create_app():
+    """Create the storage, collector, pipeline and chat services (once) and return the app."""
+    global client, storage, metrics_service, forecast_pipeline, response_cache, event_broker, digest
+    global chat_sessions, chat_cache, intent_router
+    if metrics_service is not None:
+        return app
     
-    response = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=history,
-        temperature=0.7,
-        max_tokens=2048
+    client = Groq(api_key=API_KEY)
+    
+    # Storage shared by the collector and the pipeline (ATOM_STORAGE=firestore|sqlite)
+    storage = create_storage(credentials_path="key.json")
+
+    # Initialize MetricsCollector
+    metrics_service = MetricsCollector(
+        credentials_path="key.json",
+        storage=storage,
+        prometheus_url='http://localhost:9090',
+        # e.g. TARGET_LABELS=job,instance to also score every service separately
+        target_labels=[label for label in os.getenv("TARGET_LABELS", "").split(",") if label]
     )
+
+    # Initialize Forecast Pipeline
+    forecast_pipeline = ForecastPipeline(
+        credentials_path="key.json",
+        storage=storage,
+        models_dir="../models"
+    )
+
+    # Encoded /metrics and /forecast responses, dropped when new data is written
+    response_cache = ResponseCache(dumps=app.json.dumps)
+    metrics_service.add_listener(lambda doc: response_cache.invalidate('metrics'))
+    forecast_pipeline.add_listener(lambda doc: response_cache.invalidate('forecast'))
+
+    # Live updates pushed to /stream subscribers
+    event_broker = EventBroker(dumps=app.json.dumps)
+    metrics_service.add_listener(lambda doc: event_broker.publish('metrics', doc))
+    forecast_pipeline.add_listener(lambda doc: event_broker.publish('forecast', doc))
+
+    # Current system state for the chat prompt, rebuilt only when new data lands
+    digest = DigestBuilder(
+        cache=metrics_service.cache,
+        features=metrics_service.features,
+        latest_forecast=forecast_pipeline.get_latest_forecast
+    )
+    metrics_service.add_listener(lambda doc: digest.mark_dirty())
+    forecast_pipeline.add_listener(digest.mark_dirty)
+    
+    # Conversation history per session, trimmed to a token budget
+    chat_sessions = ChatSessionStore(summarize=summarize_history)
+
+    # Answers to opening questions, reused while the digest they were grounded in is unchanged
+    chat_cache = SemanticCache()
+
+    # Stock questions ("average cpu over the last 6 hours") answered from the metrics cache
+    intent_router = IntentRouter(metrics_service.cache)
+    
+    return app
+
+def routed_chat_turn(session, user_input):
+    """Answer from the intent router without calling Groq, or None."""
+    answer = intent_router.answer(user_input)
+    if answer is not None:
+        with session.lock:
+            chat_sessions.add_turn(session, user_input, answer)
+    return answer
+
+def start_chat_turn(session, user_input):
+    """
+    The messages to send. The user's message is recorded only with its reply
+    (finish_chat_turn), so a failed or abandoned call leaves no dangling turn.
+    """
+    with session.lock:
+        chat_sessions.trim(session)
+        messages = chat_sessions.context(session, SYSTEM_PROMPT)
+    messages.append({"role": "user", "content": user_input})
+    # Ground the answer in live data: one system message with the current digest
+    messages.insert(1, {"role": "system", "content": digest.get()})
+    return messages
+
+def finish_chat_turn(session, user_input, assistant_message, fingerprint=None):
+    with session.lock:
+        chat_sessions.add_turn(session, user_input, assistant_message)
+    if fingerprint is not None:
+        chat_cache.put(user_input, fingerprint, assistant_message)
+
+def cached_chat_turn(session, user_input):
+    """
+    Cached answer for a conversation's opening question, or None.
+    Follow-ups depend on the history, so only first turns are cached;
+    the returned fingerprint (None for follow-ups) keys the new answer.
+    """
+    if session.messages:
+        return None, None
+    fingerprint = digest.version
+    answer = chat_cache.get(user_input, fingerprint)
+    if answer is not None:
+        with session.lock:
+            chat_sessions.add_turn(session, user_input, answer)
+    return answer, fingerprint
+
+def chat_with_groq(session, user_input, fingerprint=None):
+    """Send a message to Groq and get a response."""
+    messages = start_chat_turn(session, user_input)
+    with timed(llm_seconds, 'llm', model=CHAT_MODEL, stream='false'):
+        response = client.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=messages,
+            temperature=0.7,
+            max_tokens=2048
+        )
     
     assistant_message = response.choices[0].message.content
-    history.append({"role": "assistant", "content": assistant_message})
+    count_llm_tokens(CHAT_MODEL, messages, assistant_message, getattr(response, 'usage', None))
+    finish_chat_turn(session, user_input, assistant_message, fingerprint)
     
     return assistant_message
 
+def stream_chat_with_groq(session, user_input, fingerprint=None):
+    """Yield the response as tokens arrive from Groq."""
+    messages = start_chat_turn(session, user_input)
+    start = time.perf_counter()
+    stream = client.chat.completions.create(
+        model=CHAT_MODEL,
+        messages=messages,
+        temperature=0.7,
+        max_tokens=2048,
+        stream=True
+    )
+    
+    parts = []
+    usage = None
+    for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            if not parts:
+                llm_first_token_seconds.labels(model=CHAT_MODEL).observe(time.perf_counter() - start)
+            parts.append(delta)
+            yield delta
+        # Groq reports usage on the final chunk
+        usage = getattr(getattr(chunk, 'x_groq', None), 'usage', None) or usage
+    llm_seconds.labels(model=CHAT_MODEL, stream='true').observe(time.perf_counter() - start)
+    answer = "".join(parts)
+    count_llm_tokens(CHAT_MODEL, messages, answer, usage)
+    finish_chat_turn(session, user_input, answer, fingerprint)
+
 @app.route('/chat', methods=['POST'])
 def chat():
-    """Single endpoint for chat interactions."""
+    """Single endpoint for chat interactions. Pass session_id (or X-Session-Id) to continue a conversation."""
     try:
         data = request.get_json()
         user_input = data.get('message', '').strip()
@@ -78,19 +253,77 @@ def chat():
         if not user_input:
             return jsonify({'error': 'Message is required'}), 400
         
-        response = chat_with_groq(user_input)
-        return jsonify({'response': response})
+        session = chat_sessions.get(data.get('session_id') or request.headers.get('X-Session-Id'))
+        headers = {'X-Session-Id': session.session_id}
+        
+        source = 'router'
+        cached, fingerprint = routed_chat_turn(session, user_input), None
+        if cached is None:
+            source = 'cache'
+            cached, fingerprint = cached_chat_turn(session, user_input)
+        chat_answers.labels(source=source if cached is not None else 'llm').inc()
+        if data.get('stream'):
+            chunks = [cached] if cached is not None else stream_chat_with_groq(session, user_input, fingerprint)
+            return Response(
+                chunks,
+                mimetype='text/plain',
+                headers={**headers, 'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+        
+        response = cached if cached is not None else chat_with_groq(session, user_input, fingerprint)
+        return jsonify({'response': response, 'session_id': session.session_id}), 200, headers
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/internal/metrics', methods=['GET'])
+def internal_metrics():
+    """Atom's own timings and the collector's gauges in Prometheus text format."""
+    return Response(exposition(metrics_service.registry), content_type=CONTENT_TYPE_LATEST)
+
+@app.route('/chat/stats', methods=['GET'])
+def chat_stats():
+    """Intent router hit rate and chat answer cache counters."""
+    return jsonify({'router': intent_router.stats(), 'cache': chat_cache.stats()})
+
+RESOLUTIONS = ['raw', 'auto', *TIERS]
+
+def parse_time(value):
+    """Datetime from an ISO-8601 string or epoch seconds."""
+    try:
+        return datetime.fromtimestamp(float(value))
+    except ValueError:
+        return datetime.fromisoformat(value)
+
 @app.route('/metrics', methods=['GET'])
 def get_metrics():
-    """Get latest metrics from Firestore."""
+    """Get latest metrics, or a time range with ?start=&end=&resolution=&max_points=."""
     try:
+        start = request.args.get('start')
+        if start:
+            end = request.args.get('end')
+            resolution = request.args.get('resolution', 'auto')
+            max_points = request.args.get('max_points', 500, type=int)
+            if resolution not in RESOLUTIONS:
+                return jsonify({'error': f"resolution must be one of {', '.join(RESOLUTIONS)}"}), 400
+            try:
+                start, end = parse_time(start), parse_time(end) if end else datetime.now()
+            except ValueError:
+                return jsonify({'error': 'start/end must be ISO-8601 or epoch seconds'}), 400
+            
+            def build():
+                tier, points = metrics_service.get_metrics_range(start, end, resolution, max_points)
+                return {'resolution': tier, 'metrics': points}
+            
+            cached = response_cache.get('metrics', request.query_string.decode(), build)
+            return cached.to_response(request)
+        
         limit = request.args.get('limit', 100, type=int)
-        metrics = metrics_service.get_latest_metrics(limit)
-        return jsonify({'metrics': metrics})
+        cached = response_cache.get(
+            'metrics', f"limit={limit}",
+            lambda: {'metrics': metrics_service.get_latest_metrics(limit)}
+        )
+        return cached.to_response(request)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -98,13 +331,34 @@ def get_metrics():
 def get_forecast():
     """Get latest forecast."""
     try:
-        forecast = forecast_pipeline.get_latest_forecast()
-        if forecast:
-            return jsonify({'forecast': forecast})
+        def build():
+            forecast = forecast_pipeline.get_latest_forecast()
+            return {'forecast': forecast} if forecast else None
+        
+        cached = response_cache.get('forecast', 'latest', build)
+        if cached:
+            return cached.to_response(request)
         return jsonify({'error': 'No forecast available'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/stream', methods=['GET'])
+def stream():
+    """Server-sent events: 'metrics' for each new point, 'forecast' for each new forecast."""
+    # Browsers resend Last-Event-ID on reconnect; ?last_event_id= covers the first connect
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({'error': 'Invalid Last-Event-ID'}), 400
+    
+    subscription = event_broker.subscribe(last_event_id)
+    return Response(
+        event_broker.stream(subscription),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/forecast/run', methods=['POST'])
 def run_forecast():
     """Manually trigger forecast."""
@@ -117,6 +371,7 @@ def run_forecast():
         return jsonify({'error': str(e)}), 500
 
 if __name__ == "__main__":
+    create_app()
     metrics_service.start_collector()  # Start the background collector
     forecast_pipeline.start_scheduled_pipeline()  # Add this line
     app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
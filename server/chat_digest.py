@@ -0,0 +1,112 @@
+import threading
+from datetime import datetime
+import numpy as np
+
+# (label, unit, warning threshold) per metric; risk_score is 0-1
+DIGEST_METRICS = {
+    'latency': ('latency', 'ms', 500),
+    'error_rate': ('error rate', '%', 5),
+    'cpu': ('cpu', '%', 90),
+    'memory': ('memory', '%', 90),
+    'risk_score': ('risk', '', 0.7),
+}
+
+
+def fmt(value):
+    return f"{value:.3g}" if abs(value) < 1000 else f"{value:.0f}"
+
+
+class DigestBuilder:
+    """
+    Compact plain-text summary of the current system state for the chat prompt:
+    recent stats and trend per metric, anomaly flags, forecast extremes and
+    when the forecast crosses each warning threshold. Rebuilt only after the
+    collector or the pipeline reports new data (see mark_dirty).
+    """
+
+    WINDOW = 36  # Recent points summarized (6 hours at the default 10-minute interval)
+
+    def __init__(self, cache, features, latest_forecast, metrics=DIGEST_METRICS, window=WINDOW):
+        self.cache = cache
+        self.features = features  # FeatureEngine, for anomaly flags
+        self.latest_forecast = latest_forecast  # Callable returning the forecast document
+        self.metrics = metrics
+        self.window = window
+        self.lock = threading.Lock()
+        self.forecast = None
+        self.forecast_dirty = True
+        self.digest = None
+        self.version = 0  # Bumped whenever the underlying data changes
+
+    def mark_dirty(self, forecast=None):
+        """Listener callback: drop the cached digest (and the forecast, if a new one arrived)."""
+        with self.lock:
+            self.digest = None
+            self.version += 1
+            if forecast is not None:
+                self.forecast = forecast
+                self.forecast_dirty = False
+
+    def get(self):
+        with self.lock:
+            if self.digest is None:
+                self.digest = self.build()
+            return self.digest
+
+    def build(self):
+        if self.forecast_dirty:
+            try:
+                self.forecast = self.latest_forecast()
+            except Exception as e:
+                print(f"Digest forecast error: {e}")
+            self.forecast_dirty = False
+
+        lines = [f"Live system state at {datetime.now().isoformat(timespec='minutes')}:"]
+        for metric, (label, unit, threshold) in self.metrics.items():
+            line = self.metric_line(metric, label, unit)
+            if line:
+                lines.append(line)
+
+        forecast_lines = self.forecast_lines()
+        if forecast_lines:
+            lines.append("Forecast:")
+            lines.extend(forecast_lines)
+        if len(lines) == 1:
+            lines.append("No metrics collected yet.")
+        return "\n".join(lines)
+
+    def metric_line(self, metric, label, unit):
+        values, timestamps = self.cache.series(metric, self.window)
+        if len(values) == 0:
+            return None
+
+        line = (f"- {label}: now {fmt(values[-1])}{unit}, "
+                f"last {len(values)} pts mean {fmt(values.mean())} min {fmt(values.min())} max {fmt(values.max())}")
+        hours = np.array([datetime.fromisoformat(ts).timestamp() for ts in timestamps]) / 3600
+        if len(values) >= 3 and hours[-1] > hours[0]:
+            slope = np.polyfit(hours - hours[-1], values, 1)[0]
+            line += f", trend {slope:+.3g}{unit}/h"
+        features = self.features.latest.get(metric)
+        if features and features['anomaly']:
+            line += f", ANOMALY (z={features['zscore']:.1f})"
+        return line
+
+    def forecast_lines(self):
+        metrics = (self.forecast or {}).get('metrics') or {}
+        lines = []
+        for metric, (label, unit, threshold) in self.metrics.items():
+            forecast = (metrics.get(metric) or {}).get('forecast')
+            if not forecast or not forecast.get('values'):
+                continue
+            values = np.asarray(forecast['values'], dtype=float)
+            timestamps = forecast['timestamps']
+            peak = int(values.argmax())
+            line = (f"- {label}: {fmt(values.min())}-{fmt(values.max())}{unit} "
+                    f"over next {len(values)} steps, peak at {timestamps[peak][:16]}")
+            crossing = np.flatnonzero(values >= threshold)
+            if len(crossing):
+                eta = datetime.fromisoformat(timestamps[crossing[0]]) - datetime.now()
+                minutes = max(int(eta.total_seconds() // 60), 0)
+                line += f"; crosses {fmt(threshold)}{unit} in ~{minutes} min"
+            lines.append(line)
+        return lines
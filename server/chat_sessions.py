@@ -0,0 +1,106 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token), good enough for budgeting."""
+    return len(text) // 4 + 4
+
+
+class ChatSession:
+    """One conversation: recent turns verbatim, older ones folded into a summary."""
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.messages = []
+        self.summary = ""
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+    def tokens(self):
+        return estimate_tokens(self.summary) + sum(estimate_tokens(m['content']) for m in self.messages)
+
+
+class ChatSessionStore:
+    """
+    Per-session chat histories kept within a token budget.
+    When a session outgrows the budget its oldest turns are summarized
+    (by `summarize(previous_summary, messages)`) and dropped. Idle sessions
+    expire after `ttl` seconds and the least recently used are evicted
+    beyond `max_sessions`.
+    """
+
+    MAX_SESSIONS = 1000
+    TTL = 3600  # Seconds a session may sit idle
+    TOKEN_BUDGET = 6000  # History tokens sent with each request
+    KEEP_RECENT = 6  # Messages never folded into the summary
+
+    def __init__(self, summarize=None, max_sessions=MAX_SESSIONS, ttl=TTL,
+                 token_budget=TOKEN_BUDGET, keep_recent=KEEP_RECENT):
+        self.summarize = summarize
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.lock = threading.Lock()
+        self.sessions = OrderedDict()  # session_id -> ChatSession, least recently used first
+
+    def get(self, session_id=None):
+        """The session for session_id, creating it (with a new ID if none is given)."""
+        session_id = session_id or uuid.uuid4().hex
+        now = time.monotonic()
+        with self.lock:
+            self.evict(now)
+            session = self.sessions.get(session_id)
+            if session is None:
+                while len(self.sessions) >= self.max_sessions:
+                    self.sessions.popitem(last=False)
+                session = self.sessions[session_id] = ChatSession(session_id)
+            self.sessions.move_to_end(session_id)
+            session.last_used = now
+            return session
+
+    def evict(self, now):
+        """Drop idle sessions (oldest first); the cap is enforced when one is created."""
+        while self.sessions:
+            session_id, session = next(iter(self.sessions.items()))
+            if now - session.last_used < self.ttl:
+                break
+            del self.sessions[session_id]
+
+    def context(self, session, system_prompt):
+        """Messages to send: system prompt, summary of older turns, recent turns."""
+        messages = [{"role": "system", "content": system_prompt}]
+        if session.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{session.summary}"})
+        return messages + session.messages
+
+    def append(self, session, role, content):
+        session.messages.append({"role": role, "content": content})
+
+    def add_turn(self, session, user_input, answer):
+        """Record a finished exchange. trim() folds messages in pairs, so turns go in whole."""
+        self.append(session, "user", user_input)
+        self.append(session, "assistant", answer)
+
+    def trim(self, session):
+        """Fold the oldest turns into the summary until the session fits the budget."""
+        folded = []
+        while session.tokens() > self.token_budget and len(session.messages) > self.keep_recent:
+            folded.extend(session.messages[:2])  # A user turn and its reply
+            del session.messages[:2]
+        if not folded:
+            return
+
+        if self.summarize is not None:
+            try:
+                session.summary = self.summarize(session.summary, folded)
+                return
+            except Exception as e:
+                print(f"Chat summary error: {e}")
+
+        # Keep something rather than nothing: the folded turns, clipped to ~1/4 of the budget
+        clipped = " | ".join(f"{m['role']}: {m['content'][:200]}" for m in folded)
+        session.summary = f"{session.summary}\n{clipped}".strip()[-self.token_budget:]
@@ -0,0 +1,82 @@
+import queue
+import threading
+import time
+from collections import deque
+
+
+class Subscription:
+    """One client's bounded queue of encoded events."""
+
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+
+class EventBroker:
+    """
+    Fans published events out to server-sent-event subscribers.
+    Events are encoded once, numbered with increasing IDs and kept in a short
+    replay buffer so a reconnecting client resumes from its Last-Event-ID.
+    A subscriber whose queue fills up is disconnected rather than buffered
+    without bound; it catches up from the replay buffer when it reconnects.
+    """
+
+    QUEUE_SIZE = 100  # Events buffered per subscriber
+    REPLAY_SIZE = 500  # Events kept for resume
+    HEARTBEAT = 15  # Seconds between keep-alive comments
+
+    def __init__(self, dumps, queue_size=QUEUE_SIZE, replay_size=REPLAY_SIZE, heartbeat=HEARTBEAT):
+        self.dumps = dumps  # JSON encoder, e.g. app.json.dumps
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.replay = deque(maxlen=replay_size)  # (id, encoded event)
+        # Millisecond-based start keeps IDs increasing across server restarts
+        self.next_id = int(time.time() * 1000)
+
+    def publish(self, event, data):
+        with self.lock:
+            event_id = self.next_id
+            self.next_id += 1
+            message = f"id: {event_id}\nevent: {event}\ndata: {self.dumps(data)}\n\n"
+            self.replay.append((event_id, message))
+
+            for subscription in list(self.subscribers):
+                try:
+                    subscription.queue.put_nowait(message)
+                except queue.Full:
+                    subscription.overflowed = True
+                    self.subscribers.discard(subscription)
+
+    def subscribe(self, last_event_id=None):
+        """New subscription, pre-filled with the events after last_event_id."""
+        subscription = Subscription(self.queue_size)
+        with self.lock:
+            if last_event_id is not None:
+                missed = [message for event_id, message in self.replay if event_id > last_event_id]
+                for message in missed[-self.queue_size:]:
+                    subscription.queue.put_nowait(message)
+            self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+    def stream(self, subscription):
+        """Yield encoded events (and keep-alives) until the client goes away."""
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    yield subscription.queue.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    if subscription.overflowed:
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                if subscription.overflowed and subscription.queue.empty():
+                    return  # Client fell behind; it resumes via Last-Event-ID
+        finally:
+            self.unsubscribe(subscription)
@@ -0,0 +1,151 @@
+import math
+import numpy as np
+
+
+class RingBuffer:
+    """Fixed-size float ring buffer backed by a NumPy array."""
+
+    __slots__ = ('values', 'size', 'count', 'pos')
+
+    def __init__(self, size):
+        self.values = np.zeros(size)
+        self.size = size
+        self.count = 0
+        self.pos = 0
+
+    def push(self, value):
+        """Append a value and return the one it evicted (None while filling)."""
+        evicted = self.values[self.pos] if self.count == self.size else None
+        self.values[self.pos] = value
+        self.pos = (self.pos + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+        return evicted
+
+    def to_array(self):
+        """Values in chronological order."""
+        if self.count < self.size:
+            return self.values[:self.count].copy()
+        return np.roll(self.values, -self.pos)
+
+
+class RollingSlope:
+    """Least-squares slope over the last `window` samples, updated in O(1)."""
+
+    REBASE_EVERY = 10000  # Recompute sums from the buffer to bound float drift
+
+    def __init__(self, window):
+        self.window = window
+        self.buffer = RingBuffer(window)
+        self.t = 0  # Index of the next sample
+        self.sum_y = 0.0
+        self.sum_ty = 0.0
+
+    def update(self, y):
+        evicted = self.buffer.push(y)
+        self.sum_y += y
+        self.sum_ty += self.t * y
+        if evicted is not None:
+            self.sum_y -= evicted
+            self.sum_ty -= (self.t - self.window) * evicted
+        self.t += 1
+
+        if self.t - self.window >= self.REBASE_EVERY:
+            values = self.buffer.to_array()
+            self.t = len(values)
+            self.sum_y = float(values.sum())
+            self.sum_ty = float(np.arange(self.t) @ values)
+
+        return self.slope
+
+    @property
+    def slope(self):
+        n = self.buffer.count
+        if n < 2:
+            return 0.0
+        # Shift sums so x runs 0..n-1, as np.polyfit on the window would
+        sxy = self.sum_ty - (self.t - n) * self.sum_y
+        sx = n * (n - 1) / 2
+        sxx = (n - 1) * n * (2 * n - 1) / 6
+        return (n * sxy - sx * self.sum_y) / (n * sxx - sx ** 2)
+
+
+class EwmaBaseline:
+    """Exponentially weighted mean and variance of a series."""
+
+    def __init__(self, span):
+        self.alpha = 2 / (span + 1)
+        self.mean = 0.0
+        self.var = 0.0
+        self.count = 0
+
+    def zscore(self, x):
+        """Distance of x from the current baseline in standard deviations."""
+        if self.count < 2 or self.var <= 0:
+            return 0.0
+        return (x - self.mean) / math.sqrt(self.var)
+
+    def update(self, x):
+        if self.count == 0:
+            self.mean = x
+        else:
+            diff = x - self.mean
+            incr = self.alpha * diff
+            self.mean += incr
+            self.var = (1 - self.alpha) * (self.var + diff * incr)
+        self.count += 1
+
+
+class SeriesFeatures:
+    """Slopes over several windows plus an EWMA baseline for one series."""
+
+    WARMUP = 10  # Samples before the baseline is trusted for anomaly flags
+
+    def __init__(self, windows, span):
+        self.slopes = {w: RollingSlope(w) for w in windows}
+        self.baseline = EwmaBaseline(span)
+
+    def update(self, x):
+        # Score against the baseline before the sample moves it
+        z = self.baseline.zscore(x)
+        self.baseline.update(x)
+        return {
+            'slopes': {w: s.update(x) for w, s in self.slopes.items()},
+            'mean': self.baseline.mean,
+            'std': math.sqrt(self.baseline.var),
+            'zscore': z,
+            'warm': self.baseline.count > self.WARMUP,
+        }
+
+
+class FeatureEngine:
+    """
+    Streaming per-metric features: rolling least-squares slopes over configurable
+    windows, EWMA mean/variance baselines and z-score anomaly flags.
+    Each sample costs O(1) per window regardless of window length.
+    """
+
+    DEFAULT_WINDOWS = {'latency': (10,), 'memory': (10,), 'error_rate': (10,)}
+    EWMA_SPAN = 30  # Samples, roughly 5 hours at the default 10-minute interval
+    Z_THRESHOLD = 3.0
+
+    def __init__(self, windows=None, span=EWMA_SPAN, z_threshold=Z_THRESHOLD):
+        self.windows = windows or self.DEFAULT_WINDOWS
+        self.z_threshold = z_threshold
+        self.series = {
+            metric: SeriesFeatures(metric_windows, span)
+            for metric, metric_windows in self.windows.items()
+        }
+        self.latest = {}
+
+    def update(self, sample):
+        """Feed one sample (dict of metric -> value) and return the features per metric."""
+        features = {}
+        for metric, series in self.series.items():
+            value = sample.get(metric)
+            if value is None:
+                continue
+            f = series.update(float(value))
+            f['anomaly'] = f['warm'] and f['zscore'] > self.z_threshold  # Upward deviations only
+            features[metric] = f
+        self.latest = features
+        return features
@@ -0,0 +1,128 @@
+import math
+import multiprocessing
+import pickle
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+# Worker processes are spawned and import only this module (plus the pickled
+# models' packages), so it must stay free of app wiring and heavy imports.
+
+# Models loaded once per worker process by init_worker()
+_worker_models = {}
+
+
+def init_worker(model_blobs):
+    global _worker_models
+    _worker_models = {metric: pickle.loads(blob) for metric, blob in model_blobs.items()}
+
+
+def _raise_timeout(signum, frame):
+    raise TimeoutError("series forecast exceeded its time budget")
+
+
+def forecast_series(metric, values, n_periods, timeout):
+    """Forecast one series with its metric's fitted parameters (runs in a worker process)."""
+    start = time.perf_counter()
+
+    # Bound the series' time inside the worker where SIGALRM exists (not on Windows)
+    use_alarm = hasattr(signal, 'setitimer')
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        # Condition the model on this series' own history without refitting
+        results = _worker_models[metric].arima_res_.apply(values)
+        forecast = results.forecast(steps=n_periods)
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+    return list(map(float, forecast)), time.perf_counter() - start
+
+
+def refit_model(metric, model_bytes, values, until):
+    """Refit a model's parameters on fresh data (runs in a worker process)."""
+    model = pickle.loads(model_bytes)
+    model.fit(values)
+    return metric, model, until
+
+
+class ForecastExecutor:
+    """
+    Fans (target, metric) series out across a process pool.
+    Each series gets a time budget; failed or late series are reported
+    without holding back the results of the others. A late series' worker
+    may be stuck, so the pool is torn down and started afresh after a timeout.
+    """
+
+    SERIES_TIMEOUT = 30  # Seconds per series
+
+    def __init__(self, max_workers=None, series_timeout=SERIES_TIMEOUT):
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+        self.series_timeout = series_timeout
+        self.pool = None
+        self.blobs = {}
+        self.restarts = 0
+
+    def load_models(self, models):
+        """(Re)start the pool with the given metric -> model mapping."""
+        self.shutdown()
+        self.blobs = {metric: pickle.dumps(model) for metric, model in models.items()}
+        self.start()
+
+    def start(self):
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+            initargs=(self.blobs,)
+        )
+
+    def run(self, series, n_periods):
+        """
+        Forecast every series in `series` (key -> (metric, values)).
+        Returns (forecasts, failures, timings) keyed like the input.
+        """
+        futures = {
+            self.pool.submit(forecast_series, metric, values, n_periods, self.series_timeout): key
+            for key, (metric, values) in series.items()
+        }
+
+        # Backstop for workers that can't interrupt themselves: one budget per scheduling round
+        rounds = math.ceil(len(futures) / self.max_workers) if futures else 0
+        done, not_done = wait(futures, timeout=self.series_timeout * (rounds + 1))
+
+        forecasts, failures, timings = {}, {}, {}
+        for future in done:
+            key = futures[future]
+            try:
+                forecasts[key], timings[key] = future.result()
+            except Exception as e:
+                failures[key] = str(e) or type(e).__name__
+        for future in not_done:
+            failures[futures[future]] = "timed out"
+        if not_done:
+            # cancel() can't stop a series that is already running
+            self.terminate()
+            self.restarts += 1
+            self.start()
+
+        return forecasts, failures, timings
+
+    def terminate(self):
+        """Stop the pool without waiting, killing workers mid-series."""
+        if self.pool is None:
+            return
+        processes = list((self.pool._processes or {}).values())
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.pool = None
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join(5)
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
@@ -5,50 +5,71 @@ from datetime import datetime, timedelta
 import threading
 import time
 import os
-import firebase_admin
-from firebase_admin import credentials, firestore
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from storage import create_storage
+from metrics_cache import shared_cache, target_caches as shared_target_caches
+from forecast_executor import ForecastExecutor, refit_model
+from instrumentation import forecast_seconds, pipeline_seconds, timed
+
 
 class ForecastPipeline:
     """
     AI Pipeline to forecast next 50 values of server metrics.
-    Runs every hour using pre-trained ARIMA models (no model updates).
+    Runs every hour using pre-trained ARIMA models whose state is extended with
+    each new observation; parameters are refit periodically in the background.
     """
     
     TARGET_METRICS = ["latency", "cpu", "memory", "error_rate", "risk_score"]
     FORECAST_STEPS = 50
     ACTUAL_STEPS = 50  # Number of recent actual values to fetch
     PIPELINE_INTERVAL = 3600  # 1 hour in seconds
+    REFIT_INTERVAL = 24 * 3600  # Full refit once a day
+    MIN_REFIT_POINTS = 200  # Don't refit on less data than this
+    MIN_SERIES_POINTS = 10  # Target series shorter than this are not forecast
     
-    def __init__(self, credentials_path="key.json", models_dir="../models"):
+    def __init__(self, credentials_path="key.json", models_dir="../models", cache=None,
+                 target_caches=None, max_workers=None, storage=None):
         self.credentials_path = credentials_path
         self.models_dir = models_dir
         self.models = {}
-        self.db = None
+        self.storage = storage
         self.is_running = False
+        self.cache = shared_cache if cache is None else cache
+        
+        # Online model state
+        self.models_lock = threading.Lock()
+        self.model_until = {}  # Epoch of the last observation in each model's state
+        self.last_refit = time.time()
+        self.refit_executor = None
+        self.refit_futures = []
+        
+        # Per-target series are forecast in a process pool
+        self.target_caches = shared_target_caches if target_caches is None else target_caches
+        self.executor = ForecastExecutor(max_workers=max_workers)
+        self.executor_stale = True  # Workers need the current models
+        self.last_target_forecasts = {}
+        self.last_series_timings = {}
         
-        self.init_firestore()
+        # Callbacks run with each saved forecast document
+        self.listeners = []
+        
+        if self.storage is None:
+            self.storage = create_storage(credentials_path=credentials_path)
+        self.cache.warm(self.storage)
         self.load_models()
     
-    def init_firestore(self):
-        """Initialize Firestore connection"""
-        try:
-            if not firebase_admin._apps:
-                cred = credentials.Certificate(self.credentials_path)
-                firebase_admin.initialize_app(cred)
-            self.db = firestore.client()
-            print("✅ Firestore initialized")
-        except Exception as e:
-            print(f"❌ Firestore error: {e}")
-            raise
+    def add_listener(self, callback):
+        """Call callback(doc) whenever a new forecast is saved."""
+        self.listeners.append(callback)
     
     def load_models(self):
         """Load pre-trained ARIMA models"""
         print("\n📦 Loading ARIMA models...")
         
         for metric in self.TARGET_METRICS:
-            model_path = os.path.join(os.path.dirname(__file__), "models", f"{metric}_arima_model.pkl")
             try:
-                with open(model_path, 'rb') as f:
+                with open(self.model_path(metric), 'rb') as f:
                     self.models[metric] = pickle.load(f)
                 print(f"   ✅ Loaded {metric.upper()}")
             except Exception as e:
@@ -56,34 +77,82 @@ class ForecastPipeline:
         
         print(f"📊 Loaded {len(self.models)}/{len(self.TARGET_METRICS)} models")
     
+    def model_path(self, metric):
+        return os.path.join(os.path.dirname(__file__), "models", f"{metric}_arima_model.pkl")
+    
+    def update_models(self):
+        """Append observations collected since the last run to each model's state (no refit)."""
+        with self.models_lock:
+            for metric, model in self.models.items():
+                since = self.model_until.get(metric)
+                values, epochs = self.cache.series_since(metric, since)
+                if since is None:
+                    # First update: bring the model from its training data to the live series
+                    values, epochs = values[-self.ACTUAL_STEPS:], epochs[-self.ACTUAL_STEPS:]
+                if not len(values):
+                    continue
+                try:
+                    model.arima_res_ = model.arima_res_.extend(values)
+                    self.model_until[metric] = float(epochs[-1])
+                    print(f"   🔄 {metric.upper()}: +{len(values)} observations")
+                except Exception as e:
+                    print(f"   ⚠️ Could not update {metric}: {e}")
+    
+    def schedule_refit(self):
+        """Start full refits in a background process unless one is still running."""
+        if any(not f.done() for f in self.refit_futures):
+            print("⏳ Refit still running, skipping")
+            return False
+        
+        if self.refit_executor is None:
+            self.refit_executor = ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context('spawn')
+            )
+        
+        self.refit_futures = []
+        with self.models_lock:
+            for metric, model in self.models.items():
+                values, epochs = self.cache.series_since(metric)
+                if len(values) < self.MIN_REFIT_POINTS:
+                    continue
+                future = self.refit_executor.submit(
+                    refit_model, metric, pickle.dumps(model), values, float(epochs[-1])
+                )
+                future.add_done_callback(self.swap_model)
+                self.refit_futures.append(future)
+        
+        self.last_refit = time.time()
+        print(f"🔧 Refitting {len(self.refit_futures)} models in the background")
+        return True
+    
+    def swap_model(self, future):
+        """Hot-swap a refit model in and persist it."""
+        try:
+            metric, model, until = future.result()
+        except Exception as e:
+            print(f"   ❌ Refit failed: {e}")
+            return
+        
+        with self.models_lock:
+            self.models[metric] = model
+            self.model_until[metric] = until
+            self.executor_stale = True
+        
+        # Write to a temp file first so a crash never leaves a partial pickle
+        try:
+            path = self.model_path(metric)
+            with open(path + ".tmp", 'wb') as f:
+                pickle.dump(model, f)
+            os.replace(path + ".tmp", path)
+        except Exception as e:
+            print(f"   ⚠️ Could not save refit {metric}: {e}")
+        print(f"   ♻️ {metric.upper()} refit swapped in")
+    
     def fetch_actual_values(self, metric, limit=50):
-        """Fetch recent actual metric values from Firestore."""
+        """Fetch recent actual metric values from the shared metrics cache."""
         try:
-            # Query the metrics collection for recent values
-            docs = (self.db.collection('metrics')
-                    .order_by('timestamp', direction=firestore.Query.DESCENDING)
-                    .limit(limit)
-                    .stream())
-            
-            values = []
-            timestamps = []
-            
-            for doc in docs:
-                data = doc.to_dict()
-                if metric in data:
-                    values.append(data[metric])
-                    # Handle both datetime and string timestamps
-                    ts = data.get('timestamp')
-                    if hasattr(ts, 'isoformat'):
-                        timestamps.append(ts.isoformat())
-                    else:
-                        timestamps.append(str(ts))
-            
-            # Reverse to get chronological order
-            values.reverse()
-            timestamps.reverse()
-            
-            return {'values': values, 'timestamps': timestamps}
+            values, timestamps = self.cache.series(metric, limit)
+            return {'values': values.tolist(), 'timestamps': timestamps}
         except Exception as e:
             print(f"   ⚠️ Could not fetch actual {metric}: {e}")
             return {'values': [], 'timestamps': []}
@@ -94,6 +163,7 @@ class ForecastPipeline:
         forecast_time = datetime.now()
         
         print(f"\n🔮 Generating forecasts - {forecast_time.isoformat()}")
+        self.update_models()
         
         for metric in self.TARGET_METRICS:
             if metric not in self.models:
@@ -103,8 +173,9 @@ class ForecastPipeline:
                 # Fetch actual values
                 actual_data = self.fetch_actual_values(metric, self.ACTUAL_STEPS)
                 
-                # Forecast using pre-trained model
-                forecast_values = self.models[metric].predict(n_periods=self.FORECAST_STEPS)
+                # Forecast from the model's live state
+                with self.models_lock, timed(forecast_seconds, metric=metric, scope='system'):
+                    forecast_values = self.models[metric].predict(n_periods=self.FORECAST_STEPS)
                 
                 # Generate future timestamps (10-min intervals)
                 future_timestamps = [
@@ -134,8 +205,79 @@ class ForecastPipeline:
         
         return forecasts
     
+    def forecast_targets(self, forecast_time):
+        """Forecast every (target, metric) series in parallel across the process pool."""
+        series = {}
+        for target, cache in self.target_caches.items():
+            for metric in self.TARGET_METRICS:
+                if metric not in self.models:
+                    continue
+                values, timestamps = cache.series(metric, cache.capacity)
+                if len(values) >= self.MIN_SERIES_POINTS:
+                    series[(target, metric)] = (metric, values, timestamps)
+        
+        if not series:
+            return {}
+        
+        print(f"\n🎯 Forecasting {len(series)} target series")
+        with self.models_lock:
+            if self.executor_stale:
+                self.executor.load_models(self.models)
+                self.executor_stale = False
+        
+        start = time.perf_counter()
+        forecasts, failures, timings = self.executor.run(
+            {key: (metric, values) for key, (metric, values, _) in series.items()},
+            self.FORECAST_STEPS
+        )
+        elapsed = time.perf_counter() - start
+        
+        future_timestamps = [
+            (forecast_time + timedelta(minutes=10 * (i + 1))).isoformat()
+            for i in range(self.FORECAST_STEPS)
+        ]
+        results = {}
+        for (target, metric), values in forecasts.items():
+            _, actual_values, actual_timestamps = series[(target, metric)]
+            results.setdefault(target, {})[metric] = {
+                'actual': {
+                    'values': actual_values[-self.ACTUAL_STEPS:].tolist(),
+                    'timestamps': actual_timestamps[-self.ACTUAL_STEPS:]
+                },
+                'forecast': {
+                    'values': values,
+                    'timestamps': future_timestamps
+                }
+            }
+        
+        self.last_series_timings = {f"{target}/{metric}": t for (target, metric), t in timings.items()}
+        for (target, metric), t in timings.items():
+            forecast_seconds.labels(metric=metric, scope='target').observe(t)
+        slowest = max(timings.values()) if timings else 0
+        print(f"   ✅ {len(forecasts)}/{len(series)} series in {elapsed:.1f}s (slowest {slowest:.2f}s)")
+        for (target, metric), reason in failures.items():
+            print(f"   ❌ {target}/{metric}: {reason}")
+        
+        return results
+    
+    def save_target_forecasts(self, target_forecasts):
+        """Save per-target forecasts, one document per target."""
+        try:
+            generated_at = datetime.now()
+            self.storage.save_documents('target_forecasts', {
+                target: {
+                    'generated_at': generated_at,
+                    'forecast_steps': self.FORECAST_STEPS,
+                    'metrics': metrics
+                }
+                for target, metrics in target_forecasts.items()
+            })
+            print(f"💾 Forecasts for {len(target_forecasts)} targets saved")
+        except Exception as e:
+            print(f"❌ Target save error: {e}")
+    
     def save_forecasts(self, forecasts):
-        """Save forecasts to Firestore."""
+        """Save forecasts to storage."""
         try:
             doc = {
                 'generated_at': datetime.now(),
@@ -144,8 +286,11 @@ class ForecastPipeline:
             }
             
             # Update only latest
-            self.db.collection('forecasts').document('latest').set(doc)
-            print("💾 Latest forecast saved to Firestore")
+            self.storage.save_document('forecasts', 'latest', doc)
+            print("💾 Latest forecast saved")
+            
+            for callback in self.listeners:
+                callback(doc)
             
         except Exception as e:
             print(f"❌ Save error: {e}")
@@ -156,14 +301,23 @@ class ForecastPipeline:
         print(f"🚀 FORECAST PIPELINE - {datetime.now().isoformat()}")
         print("=" * 50)
         
+        start = time.perf_counter()
         forecasts = self.generate_forecasts()
         
+        target_forecasts = self.forecast_targets(datetime.now())
+        if target_forecasts:
+            self.last_target_forecasts = target_forecasts
+            self.save_target_forecasts(target_forecasts)
+        
+        if time.time() - self.last_refit >= self.REFIT_INTERVAL:
+            self.schedule_refit()
+        
         if forecasts:
             self.save_forecasts(forecasts)
             print("✅ Pipeline completed")
-            return forecasts
+        pipeline_seconds.observe(time.perf_counter() - start)
         
-        return None
+        return forecasts or None
     
     def start_scheduled_pipeline(self):
         """Start hourly forecast pipeline."""
@@ -184,12 +338,14 @@ class ForecastPipeline:
     
     def stop_pipeline(self):
         self.is_running = False
+        if self.refit_executor is not None:
+            self.refit_executor.shutdown(wait=False)
+        self.executor.shutdown()
     
     def get_latest_forecast(self):
-        """Get latest forecast from Firestore."""
+        """Get latest forecast from storage."""
         try:
-            doc = self.db.collection('forecasts').document('latest').get()
-            return doc.to_dict() if doc.exists else None
+            return self.storage.get_document('forecasts', 'latest')
         except:
             return None
 
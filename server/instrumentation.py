@@ -0,0 +1,128 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest
+
+# Atom's own timings, exposed at /internal/metrics next to each collector's registry
+registry = CollectorRegistry()
+
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BATCH_BUCKETS = (1, 5, 10, 50, 100, 250, 500, 1000, 5000)
+
+collector_tick_seconds = Histogram(
+    'atom_collector_tick_seconds', 'Time to collect, score and queue one metric point',
+    buckets=FAST_BUCKETS + (30,), registry=registry
+)
+storage_seconds = Histogram(
+    'atom_storage_operation_seconds', 'Storage backend call latency',
+    ['backend', 'operation'], buckets=FAST_BUCKETS, registry=registry
+)
+storage_batch_size = Histogram(
+    'atom_storage_batch_size', 'Documents per storage write',
+    ['backend', 'operation'], buckets=BATCH_BUCKETS, registry=registry
+)
+forecast_seconds = Histogram(
+    'atom_forecast_seconds', 'Time to forecast one series',
+    ['metric', 'scope'], buckets=FAST_BUCKETS + (30,), registry=registry
+)
+pipeline_seconds = Histogram(
+    'atom_forecast_pipeline_seconds', 'Duration of a full forecast pipeline run',
+    buckets=SLOW_BUCKETS, registry=registry
+)
+llm_seconds = Histogram(
+    'atom_llm_request_seconds', 'LLM call latency (until the last token when streaming)',
+    ['model', 'stream'], buckets=SLOW_BUCKETS, registry=registry
+)
+llm_first_token_seconds = Histogram(
+    'atom_llm_first_token_seconds', 'Time to the first streamed token',
+    ['model'], buckets=SLOW_BUCKETS, registry=registry
+)
+llm_tokens = Counter(
+    'atom_llm_tokens', 'LLM tokens used (estimated when the API does not report usage)',
+    ['model', 'kind'], registry=registry
+)
+chat_answers = Counter(
+    'atom_chat_answers', 'Chat answers by source (router, cache or llm)',
+    ['source'], registry=registry
+)
+http_seconds = Histogram(
+    'atom_http_request_seconds', 'API request latency until the response starts',
+    ['endpoint', 'method', 'status'], buckets=FAST_BUCKETS, registry=registry
+)
+
+# Per-request time by component, for Server-Timing headers
+_request = threading.local()
+
+
+def start_request():
+    _request.timings = {}
+    _request.started = time.perf_counter()
+
+
+def end_request():
+    """(total seconds, component -> seconds) of the current request, clearing it."""
+    timings = getattr(_request, 'timings', None)
+    if timings is None:
+        return 0.0, {}
+    total = time.perf_counter() - _request.started
+    _request.timings = None
+    return total, timings
+
+
+def add_timing(component, seconds):
+    timings = getattr(_request, 'timings', None)
+    if timings is not None:
+        timings[component] = timings.get(component, 0.0) + seconds
+
+
+def server_timing(total, timings):
+    """Server-Timing header value, e.g. 'storage;dur=1.2, llm;dur=840.0, total;dur=845.3'."""
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+    return ", ".join(parts + [f"total;dur={total * 1000:.1f}"])
+
+
+@contextmanager
+def timed(histogram, component=None, **labels):
+    """Observe the block's duration (and add it to the request's Server-Timing component)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        (histogram.labels(**labels) if labels else histogram).observe(elapsed)
+        if component:
+            add_timing(component, elapsed)
+
+
+_storage_calls = threading.local()
+
+
+def storage_operation(operation):
+    """
+    Decorator timing a StorageBackend method; writes also record their batch
+    size. Calls made from inside another timed method (e.g. write_rollups
+    going through save_documents) are not counted again.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if getattr(_storage_calls, 'active', False):
+                return method(self, *args, **kwargs)
+            batch = args[1] if len(args) > 1 else None
+            if operation.startswith(('write', 'save')) and isinstance(batch, (list, dict)):
+                storage_batch_size.labels(backend=self.name, operation=operation).observe(len(batch))
+            _storage_calls.active = True
+            try:
+                with timed(storage_seconds, 'storage', backend=self.name, operation=operation):
+                    return method(self, *args, **kwargs)
+            finally:
+                _storage_calls.active = False
+        return wrapper
+    return decorator
+
+
+def exposition(*registries):
+    """Prometheus text format of Atom's registry plus any others (e.g. the collector's gauges)."""
+    return b"".join(generate_latest(r) for r in (registry, *registries))
@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+import numpy as np
+from chat_digest import DIGEST_METRICS, fmt
+from atom_common.questions import parse_question
+
+# (label, unit, warning threshold), as in the chat digest
+METRIC_INFO = {**DIGEST_METRICS, 'request_time': ('request time', 'ms', None)}
+
+
+def timestamp_text(epoch):
+    return datetime.fromtimestamp(epoch).isoformat(sep=' ', timespec='seconds')
+
+
+class IntentRouter:
+    """
+    Answers stock chat questions (latest/avg/max/min/p95 of one metric over a
+    window, top-N readings) straight from the metrics cache, skipping Groq.
+    Windows end at the newest cached point.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.lock = threading.Lock()
+        self.questions = 0
+        self.routed = 0
+        self.total_seconds = 0.0
+        self.by_kind = Counter()
+
+    def answer(self, question):
+        """Formatted answer, or None when the question needs the LLM."""
+        started = time.perf_counter()
+        intent = parse_question(question)
+        answer = self.build(intent) if intent else None
+        with self.lock:
+            self.questions += 1
+            if answer is not None:
+                self.routed += 1
+                self.by_kind[intent.kind] += 1
+                self.total_seconds += time.perf_counter() - started
+        return answer
+
+    def value_text(self, metric, value):
+        label, unit, threshold = METRIC_INFO[metric]
+        text = f"{fmt(value)}{unit}"
+        if threshold is not None and value >= threshold:
+            text += f" (above the {fmt(threshold)}{unit} warning level)"
+        return text
+
+    def build(self, intent):
+        label = METRIC_INFO[intent.metric][0]
+        values, epochs = self.cache.series_since(intent.metric)
+        if len(values) and intent.window:
+            keep = epochs >= epochs[-1] - intent.window
+            values, epochs = values[keep], epochs[keep]
+        span = f" over the {intent.window_label}" if intent.window else " over the cached history"
+        if len(values) == 0:
+            return f"No {label} data{span}."
+
+        if intent.kind == 'latest':
+            return f"Latest {label}: {self.value_text(intent.metric, values[-1])} at {timestamp_text(epochs[-1])}."
+
+        span += f" ({timestamp_text(epochs[0])} to {timestamp_text(epochs[-1])})"
+        if intent.kind in ('max', 'min'):
+            i = int(values.argmax() if intent.kind == 'max' else values.argmin())
+            word = 'Highest' if intent.kind == 'max' else 'Lowest'
+            return f"{word} {label}{span}: {self.value_text(intent.metric, values[i])} at {timestamp_text(epochs[i])}."
+        if intent.kind == 'spikes':
+            order = np.argsort(-values, kind='stable')[:intent.top]
+            lines = [f"Top {len(order)} {label} readings{span}:"]
+            lines += [f"{n}. {self.value_text(intent.metric, values[i])} at {timestamp_text(epochs[i])}"
+                      for n, i in enumerate(order, 1)]
+            return "\n".join(lines)
+        if intent.kind == 'avg':
+            return f"Average {label}{span}: {self.value_text(intent.metric, values.mean())} from {len(values)} points."
+        p95 = np.sort(values)[int(0.95 * (len(values) - 1))]  # Nearest rank, as in the SQL agent
+        return f"95th percentile {label}{span}: {self.value_text(intent.metric, p95)} from {len(values)} points."
+
+    def stats(self):
+        with self.lock:
+            return {
+                'questions': self.questions,
+                'routed': self.routed,
+                'hit_rate': self.routed / self.questions if self.questions else 0.0,
+                'avg_routed_ms': 1000 * self.total_seconds / self.routed if self.routed else 0.0,
+                'by_kind': dict(self.by_kind),
+            }
@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+
+class MetricWriter:
+    """
+    Buffers metric points and commits them to the storage backend in batches.
+    Every point is appended to an on-disk spool before it is buffered, so points
+    survive outages and restarts and are replayed once the backend is reachable.
+    """
+
+    BATCH_SIZE = 500  # Firestore limit of writes per batch
+    FLUSH_INTERVAL = 5  # Seconds between background flushes
+
+    def __init__(self, storage, collection='metrics', spool_path='metrics_spool.jsonl',
+                 batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.storage = storage
+        self.collection = collection
+        self.spool_path = spool_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.is_running = False
+
+        # Each entry is [doc, replayed]; replayed points keep their own time as created_at
+        self.buffer = []
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+
+        self.load_spool()
+
+    def load_spool(self):
+        """Re-queue points left in the spool by a previous run."""
+        if not os.path.exists(self.spool_path):
+            return
+        try:
+            with open(self.spool_path) as f:
+                for line in f:
+                    if line.strip():
+                        self.buffer.append([self.decode(line), True])
+        except Exception as e:
+            print(f"Spool read error: {e}")
+        if self.buffer:
+            print(f"Replaying {len(self.buffer)} spooled metric points")
+
+    def encode(self, doc):
+        record = {k: v for k, v in doc.items() if k != 'created_at'}
+        if isinstance(doc.get('created_at'), datetime):
+            record['created_at'] = doc['created_at'].isoformat()
+        return json.dumps(record) + "\n"
+
+    def decode(self, line):
+        doc = json.loads(line)
+        if 'created_at' in doc:
+            doc['created_at'] = datetime.fromisoformat(doc['created_at'])
+        return doc
+
+    def write(self, doc):
+        """Queue a single point."""
+        self.write_many([doc])
+
+    def write_many(self, docs):
+        """Spool and queue points; they are committed on the next flush."""
+        with self.lock:
+            try:
+                with open(self.spool_path, 'a') as f:
+                    f.writelines(self.encode(doc) for doc in docs)
+                    f.flush()
+                    os.fsync(f.fileno())
+            except Exception as e:
+                print(f"Spool write error: {e}")
+            self.buffer.extend([doc, False] for doc in docs)
+            pending = len(self.buffer)
+
+        if not self.is_running:
+            self.flush()
+        elif pending >= self.batch_size:
+            self.wake.set()
+
+    def flush(self):
+        """Commit buffered points in batches; returns the number written."""
+        with self.flush_lock:
+            with self.lock:
+                pending = list(self.buffer)
+
+            committed = 0
+            for i in range(0, len(pending), self.batch_size):
+                chunk = pending[i:i + self.batch_size]
+                docs = []
+                for doc, replayed in chunk:
+                    if replayed and 'created_at' not in doc:
+                        doc = {**doc, 'created_at': datetime.fromisoformat(doc['timestamp']).astimezone()}
+                    docs.append(doc)
+                try:
+                    self.storage.write_points(self.collection, docs)
+                    committed += len(chunk)
+                except Exception as e:
+                    print(f"Storage write error ({len(pending) - committed} points spooled): {e}")
+                    break
+
+            with self.lock:
+                del self.buffer[:committed]
+                for entry in self.buffer:
+                    entry[1] = True
+                if committed:
+                    self.compact_spool()  # Nothing committed means the spool is already exact
+
+            return committed
+
+    def pending(self, docs):
+        """How many of `docs` are still buffered, i.e. not yet committed."""
+        queued = {id(doc) for doc in docs}
+        with self.lock:
+            return sum(id(doc) in queued for doc, _ in self.buffer)
+
+    def compact_spool(self):
+        """Rewrite the spool so it only holds uncommitted points (caller holds the lock)."""
+        try:
+            if not self.buffer:
+                if os.path.exists(self.spool_path):
+                    os.remove(self.spool_path)
+                return
+            tmp_path = self.spool_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                f.writelines(self.encode(doc) for doc, _ in self.buffer)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.spool_path)
+        except Exception as e:
+            print(f"Spool compaction error: {e}")
+
+    def start(self):
+        """Flush in the background every flush_interval seconds."""
+        if self.is_running:
+            return
+
+        self.is_running = True
+
+        def loop():
+            while self.is_running:
+                self.wake.wait(self.flush_interval)
+                self.wake.clear()
+                if self.buffer:
+                    self.flush()
+
+        threading.Thread(target=loop, daemon=True).start()
+
+    def stop(self):
+        self.is_running = False
+        self.wake.set()
+        self.flush()
@@ -0,0 +1,157 @@
+import threading
+from datetime import datetime
+import numpy as np
+from storage import to_epoch
+
+
+class MetricsCache:
+    """
+    Process-wide columnar cache of recent metric points.
+    One NumPy array per field plus a timestamp array, kept up to date by the
+    collector and warmed from storage once, so readers never hit the backend.
+    """
+
+    FIELDS = [
+        "latency", "error_rate", "cpu", "memory", "request_time",
+        "latency_anomaly", "latency_slope", "memory_slope", "error_trend", "risk_score",
+    ]
+    BOOL_FIELDS = {"latency_anomaly"}
+    CAPACITY = 1000  # Most recent points kept in memory
+
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.warmed = False
+        self.version = 0  # Bumped on every change
+
+        # Points live in [0, size); arrays are 2x capacity so appends only
+        # compact (copy the newest half to the front) once per `capacity` points
+        self.size = 0
+        self.timestamps = np.zeros(2 * capacity)  # Epoch seconds
+        self.timestamp_strings = np.empty(2 * capacity, dtype=object)
+        # Storage bookkeeping, passed through so /metrics keeps its shape
+        self.ids = np.empty(2 * capacity, dtype=object)
+        self.created = np.empty(2 * capacity, dtype=object)
+        self.columns = {field: np.full(2 * capacity, np.nan) for field in self.FIELDS}
+
+    def __len__(self):
+        return min(self.size, self.capacity)
+
+    @staticmethod
+    def created_at(value):
+        """created_at as a datetime: SQLite hands it back as an ISO string."""
+        if isinstance(value, datetime):
+            return value
+        if isinstance(value, str):
+            return datetime.fromisoformat(value)
+        return None
+
+    def _append(self, doc):
+        if self.size == len(self.timestamps):
+            keep = slice(self.size - self.capacity, self.size)
+            self.timestamps[:self.capacity] = self.timestamps[keep]
+            self.timestamp_strings[:self.capacity] = self.timestamp_strings[keep]
+            self.ids[:self.capacity] = self.ids[keep]
+            self.created[:self.capacity] = self.created[keep]
+            for column in self.columns.values():
+                column[:self.capacity] = column[keep]
+            self.size = self.capacity
+
+        ts = doc['timestamp']
+        self.timestamps[self.size] = to_epoch(ts)
+        self.timestamp_strings[self.size] = ts.isoformat() if hasattr(ts, 'isoformat') else str(ts)
+        self.ids[self.size] = doc.get('id')
+        self.created[self.size] = self.created_at(doc.get('created_at'))
+        for field, column in self.columns.items():
+            value = doc.get(field)
+            column[self.size] = np.nan if value is None else float(value)
+        self.size += 1
+
+    def append(self, doc):
+        """Add one point (expected to be the newest)."""
+        self.extend([doc])
+
+    def extend(self, docs):
+        """Add points, keeping the cache in timestamp order."""
+        docs = [d for d in docs if d.get('timestamp') is not None]
+        if not docs:
+            return
+        with self.lock:
+            in_order = all(
+                to_epoch(b['timestamp']) >= to_epoch(a['timestamp'])
+                for a, b in zip(docs, docs[1:])
+            )
+            if in_order and (self.size == 0 or to_epoch(docs[0]['timestamp']) >= self.timestamps[self.size - 1]):
+                for doc in docs:
+                    self._append(doc)
+            else:
+                # Out-of-order data (e.g. a backfill): rebuild from the merged points
+                merged = self._docs(0, self.size) + docs
+                merged.sort(key=lambda d: to_epoch(d['timestamp']))
+                self.size = 0
+                for doc in merged[-self.capacity:]:
+                    self._append(doc)
+            self.version += 1
+
+    def warm(self, storage, collection='metrics'):
+        """Load the newest points from storage; a no-op once warmed."""
+        if self.warmed:
+            return
+        try:
+            points = storage.latest_points(collection, self.capacity)
+            points.reverse()
+            self.extend(points)
+            self.warmed = True
+            print(f"Metrics cache warmed with {len(points)} points")
+        except Exception as e:
+            print(f"Metrics cache warm-up error: {e}")
+
+    def _docs(self, start, end):
+        docs = []
+        for i in range(start, end):
+            doc = {'timestamp': self.timestamp_strings[i]}
+            if self.ids[i] is not None:
+                doc['id'] = self.ids[i]
+            if self.created[i] is not None:
+                doc['created_at'] = self.created[i]
+            for field, column in self.columns.items():
+                value = column[i]
+                if not np.isnan(value):
+                    doc[field] = bool(value) if field in self.BOOL_FIELDS else float(value)
+            docs.append(doc)
+        return docs
+
+    def latest(self, limit=100):
+        """Newest points first, as dicts (same shape as the Firestore documents)."""
+        with self.lock:
+            start = max(self.size - min(limit, self.capacity), 0)
+            docs = self._docs(start, self.size)
+        docs.reverse()
+        return docs
+
+    def series(self, field, limit=50):
+        """Chronological (values, timestamps) of one field over the newest points."""
+        with self.lock:
+            start = max(self.size - min(limit, self.capacity), 0)
+            values = self.columns[field][start:self.size].copy()
+            timestamps = self.timestamp_strings[start:self.size].tolist()
+        present = ~np.isnan(values)
+        return values[present], [ts for ts, keep in zip(timestamps, present) if keep]
+
+    def series_since(self, field, since=None):
+        """Chronological (values, epoch timestamps) of one field newer than `since`."""
+        with self.lock:
+            start = max(self.size - self.capacity, 0)
+            if since is not None:
+                start += int(np.searchsorted(self.timestamps[start:self.size], since, side='right'))
+            values = self.columns[field][start:self.size].copy()
+            epochs = self.timestamps[start:self.size].copy()
+        present = ~np.isnan(values)
+        return values[present], epochs[present]
+
+
+# Shared by the collector, the forecast pipeline and the API in one process
+shared_cache = MetricsCache()
+
+# Per-target caches (target name -> MetricsCache) for multi-target collection
+target_caches = {}
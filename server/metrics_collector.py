@@ -1,19 +1,78 @@
 import time
-from datetime import datetime
+import uuid
+from datetime import datetime, timezone
 from prometheus_client import CollectorRegistry, Gauge, Counter, Histogram
 import threading
 import numpy as np
-from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
 import requests
-import firebase_admin
-from firebase_admin import credentials, firestore
+from requests.adapters import HTTPAdapter
 import os
+from storage import create_storage, to_epoch
+from metric_writer import MetricWriter
+from rollups import RollupAggregator, select_tier
+from feature_engine import FeatureEngine
+from metrics_cache import MetricsCache, shared_cache, target_caches
+from instrumentation import collector_tick_seconds
+
 
 class MetricsCollector:
-    def __init__(self, credentials_path="serviceAccountKey.json", prometheus_url="http://localhost:9090"):
+    # PromQL per collected field; all of them are issued concurrently each tick
+    METRIC_QUERIES = {
+        'latency': 'histogram_quantile(0.95, rate(http_request_duration_seconds_bucket[5m])) * 1000',
+        'error_rate': 'rate(http_requests_total{status=~"5.."}[5m]) / rate(http_requests_total[5m]) * 100',
+        'cpu': '100 - (avg(irate(node_cpu_seconds_total{mode="idle"}[5m])) * 100)',
+        'memory': '(1 - (node_memory_MemAvailable_bytes / node_memory_MemTotal_bytes)) * 100',
+        'request_time': 'rate(http_request_duration_seconds_sum[5m]) / rate(http_request_duration_seconds_count[5m]) * 1000',
+    }
+    # Same metrics aggregated per target; {by} becomes the target label list
+    TARGET_METRIC_QUERIES = {
+        'latency': 'histogram_quantile(0.95, sum by (le, {by}) (rate(http_request_duration_seconds_bucket[5m]))) * 1000',
+        'error_rate': 'sum by ({by}) (rate(http_requests_total{status=~"5.."}[5m])) / sum by ({by}) (rate(http_requests_total[5m])) * 100',
+        'cpu': '100 - (avg by ({by}) (irate(node_cpu_seconds_total{mode="idle"}[5m])) * 100)',
+        'memory': '(1 - (sum by ({by}) (node_memory_MemAvailable_bytes) / sum by ({by}) (node_memory_MemTotal_bytes))) * 100',
+        'request_time': 'sum by ({by}) (rate(http_request_duration_seconds_sum[5m])) / sum by ({by}) (rate(http_request_duration_seconds_count[5m])) * 1000',
+    }
+    TICK_DEADLINE = 8  # Total seconds one collection tick may spend on Prometheus
+    HISTORY_SIZE = 10  # Points used for slope calculation
+    MAX_RANGE_POINTS = 10000  # Prometheus caps range queries at 11,000 points per series
+    TARGET_CACHE_CAPACITY = 200  # Recent points kept in memory per target
+
+    def __init__(self, credentials_path="serviceAccountKey.json", prometheus_url="http://localhost:9090",
+                 tick_deadline=TICK_DEADLINE, spool_path="metrics_spool.jsonl", cache=None,
+                 target_labels=None, storage=None):
         self.prometheus_url = prometheus_url
         self.credentials_path = credentials_path
-        self.init_firestore()
+        self.tick_deadline = tick_deadline
+        self.storage = storage or create_storage(credentials_path=credentials_path)
+        self.writer = MetricWriter(self.storage, collection='metrics', spool_path=spool_path)
+        
+        # Recent points served from memory; warmed from storage once
+        self.cache = shared_cache if cache is None else cache
+        self.cache.warm(self.storage)
+        
+        # Downsampled tiers for long-range queries
+        self.rollups = RollupAggregator(self.storage)
+        self.rollups.warm()
+        
+        # Per-target collection: labels identifying a target, e.g. ('job', 'instance')
+        self.target_labels = tuple(target_labels or ())
+        self.target_features = {}
+        self.target_caches = target_caches
+        self.target_writer = None
+        if self.target_labels:
+            self.target_writer = MetricWriter(
+                self.storage, collection='target_metrics', spool_path=spool_path.replace('.jsonl', '_targets.jsonl')
+            )
+        
+        # Keep-alive connection pool shared by all query threads
+        pool_size = len(self.METRIC_QUERIES) * (2 if self.target_labels else 1)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.query_executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='prometheus-query')
+        self.query_timings = {}  # Seconds per query in the last tick (None = missed deadline)
         
         # Prometheus metrics
         self.registry = CollectorRegistry()
@@ -29,59 +88,150 @@ class MetricsCollector:
         )
         self.cpu = Gauge('cpu_usage_percent', 'CPU usage', registry=self.registry)
         self.memory = Gauge('memory_usage_percent', 'Memory usage', registry=self.registry)
+        self.query_duration = Histogram(
+            'prometheus_query_duration_seconds',
+            'Prometheus query latency per collected metric',
+            ['metric'],
+            registry=self.registry
+        )
+        
+        # Streaming slopes and baselines, updated in O(1) per sample
+        self.features = self.new_feature_engine()
         
-        # History for slope calculation
-        self.history = deque(maxlen=10)
+        # Callbacks run with each new point after it is written
+        self.listeners = []
+        
+        # Epoch of the newest point this collector produced (live or backfilled)
+        self.last_epoch = None
+    
+    def new_feature_engine(self):
+        return FeatureEngine(windows={
+            'latency': (self.HISTORY_SIZE,),
+            'memory': (self.HISTORY_SIZE,),
+            'error_rate': (self.HISTORY_SIZE,),
+        })
+    
+    def add_listener(self, callback):
+        """Call callback(doc) for every new metric point."""
+        self.listeners.append(callback)
+    
+    def notify(self, doc):
+        for callback in self.listeners:
+            try:
+                callback(doc)
+            except Exception as e:
+                print(f"Metrics listener error: {e}")
+    
+    def _query(self, query, timeout):
+        """Run an instant query and return the raw result vector."""
+        response = self.session.get(
+            f"{self.prometheus_url}/api/v1/query",
+            # Let Prometheus abandon evaluation once we stop waiting
+            params={"query": query, "timeout": f"{timeout}s"},
+            timeout=timeout
+        )
+        data = response.json()
+        if data["status"] == "success":
+            return data["data"]["result"]
+        return []
+    
+    def query_prometheus(self, query, timeout=10):
+        """Query Prometheus and return the result value."""
+        try:
+            result = self._query(query, timeout)
+            if result:
+                return float(result[0]["value"][1])
+            return None
+        except Exception as e:
+            print(f"Prometheus query error: {e}")
+            return None
+    
+    def target_key(self, labels):
+        """Stable target name from a series' labels, e.g. 'job=api,instance=10.0.0.5:8080'."""
+        key = ",".join(f"{label}={labels.get(label, '')}" for label in self.target_labels)
+        return key.replace("/", "%2F")  # Usable as a Firestore document ID
     
-    def init_firestore(self):
-        """Initialize Firebase and Firestore connection"""
+    def query_prometheus_vector(self, query, timeout=10):
+        """Query Prometheus and return every series' value keyed by target."""
         try:
-            # Check if Firebase app is already initialized
-            if not firebase_admin._apps:
-                cred = credentials.Certificate(self.credentials_path)
-                firebase_admin.initialize_app(cred)
-            
-            self.db = firestore.client()
+            values = {}
+            for series in self._query(query, timeout):
+                value = float(series["value"][1])
+                if np.isfinite(value):
+                    values[self.target_key(series["metric"])] = value
+            return values
         except Exception as e:
-            print(f"Firestore initialization error: {e}")
-            raise
+            print(f"Prometheus query error: {e}")
+            return {}
     
-    def query_prometheus(self, query):
-        """Query Prometheus and return the result value."""
+    def query_prometheus_range(self, query, start, end, step, timeout=60):
+        """Query Prometheus over a time range and return (timestamps, values) arrays."""
         try:
-            response = requests.get(
-                f"{self.prometheus_url}/api/v1/query",
-                params={"query": query},
-                timeout=10
+            response = self.session.get(
+                f"{self.prometheus_url}/api/v1/query_range",
+                params={"query": query, "start": start, "end": end, "step": step, "timeout": f"{timeout}s"},
+                timeout=timeout
             )
             data = response.json()
             if data["status"] == "success" and data["data"]["result"]:
-                return float(data["data"]["result"][0]["value"][1])
-            return None
+                samples = np.array(data["data"]["result"][0]["values"], dtype=float)
+                return samples[:, 0], samples[:, 1]
         except Exception as e:
-            print(f"Prometheus query error: {e}")
-            return None
+            print(f"Prometheus range query error: {e}")
+        return np.array([]), np.array([])
+    
+    def _timed_query(self, name, query_fn, query, timeout):
+        """Run one query; returns (result, seconds taken)."""
+        start = time.perf_counter()
+        try:
+            return query_fn(query, timeout=timeout), time.perf_counter() - start
+        finally:
+            self.query_duration.labels(metric=name).observe(time.perf_counter() - start)
     
     def collect_metrics(self):
         """Collect current metrics from Prometheus"""
-        # Query real metrics from Prometheus
-        latency = self.query_prometheus(
-            'histogram_quantile(0.95, rate(http_request_duration_seconds_bucket[5m])) * 1000'
-        )
-        error_rate = self.query_prometheus(
-            'rate(http_requests_total{status=~"5.."}[5m]) / rate(http_requests_total[5m]) * 100'
-        )
-        cpu = self.query_prometheus(
-            '100 - (avg(irate(node_cpu_seconds_total{mode="idle"}[5m])) * 100)'
-        )
-        memory = self.query_prometheus(
-            '(1 - (node_memory_MemAvailable_bytes / node_memory_MemTotal_bytes)) * 100'
-        )
-        request_time = self.query_prometheus(
-            'rate(http_request_duration_seconds_sum[5m]) / rate(http_request_duration_seconds_count[5m]) * 1000'
-        )
+        jobs = {
+            metric: (self.query_prometheus, query)
+            for metric, query in self.METRIC_QUERIES.items()
+        }
+        if self.target_labels:
+            by = ", ".join(self.target_labels)
+            jobs.update({
+                f"{metric}_by_target": (self.query_prometheus_vector, query.replace("{by}", by))
+                for metric, query in self.TARGET_METRIC_QUERIES.items()
+            })
+        
+        # Fire all queries at once; the tick never waits longer than the deadline
+        deadline = time.monotonic() + self.tick_deadline
+        futures = {
+            name: self.query_executor.submit(self._timed_query, name, query_fn, query, self.tick_deadline)
+            for name, (query_fn, query) in jobs.items()
+        }
+        
+        values, timings = {}, {}
+        for name, future in futures.items():
+            try:
+                values[name], timings[name] = future.result(timeout=max(0, deadline - time.monotonic()))
+            except FuturesTimeout:
+                # Recorded here: the query may still finish after the tick has moved on
+                print(f"Prometheus query timed out: {name}")
+                values[name], timings[name] = None, None
+        self.query_timings = timings
+        
+        latency = values['latency']
+        error_rate = values['error_rate']
+        cpu = values['cpu']
+        memory = values['memory']
+        request_time = values['request_time']
+        
+        # One query per metric covers every target; regroup as target -> metric -> value
+        targets = {}
+        for metric in self.TARGET_METRIC_QUERIES if self.target_labels else ():
+            for target, value in (values[f"{metric}_by_target"] or {}).items():
+                targets.setdefault(target, {})[metric] = value
         
         return {
+            'targets': targets,
             'timestamp': datetime.now().isoformat(),
             'latency': latency if latency is not None else np.random.uniform(50, 200),
             'error_rate': error_rate if error_rate is not None else np.random.uniform(0, 5),
@@ -90,93 +240,205 @@ class MetricsCollector:
             'request_time': request_time if request_time is not None else np.random.uniform(100, 300)
         }
     
-    def calculate_slope(self, values):
-        """Calculate slope using linear regression"""
-        if len(values) < 2:
-            return 0
-        x = np.arange(len(values))
-        z = np.polyfit(x, values, 1)
-        return z[0]
-    
     def detect_anomaly(self, latency, baseline=100):
         """Detect latency anomaly"""
         return latency > baseline * 1.5
     
     def calculate_risk_score(self, latency_anomaly, error_rate, memory, memory_slope):
-        """Calculate overall risk score (0-100)"""
-        score = 0
-        score += 30 if latency_anomaly else 0
-        score += min(error_rate * 10, 30)
-        score += min((memory / 100) * 20, 20)
-        score += min(abs(memory_slope) * 10, 20)
-        return min(score, 100)
+        """Calculate overall risk score (0-100); also accepts arrays"""
+        score = np.where(latency_anomaly, 30, 0)
+        score = score + np.minimum(np.asarray(error_rate) * 10, 30)
+        score = score + np.minimum((np.asarray(memory) / 100) * 20, 20)
+        score = score + np.minimum(np.abs(memory_slope) * 10, 20)
+        score = np.minimum(score, 100)
+        return float(score) if score.ndim == 0 else score
     
-    def add_data_point(self):
-        """Collect metrics and add to Firestore"""
-        metrics = self.collect_metrics()
+    def score_point(self, metrics, features):
+        """Derive slopes, latency anomaly and risk score for one sample."""
+        f = features.update(metrics)
         
-        # Add to history
-        self.history.append({
-            'latency': metrics['latency'],
-            'memory': metrics['memory'],
-            'error_rate': metrics['error_rate']
-        })
+        def slope(metric):
+            return f[metric]['slopes'][self.HISTORY_SIZE] if metric in f else 0.0
         
-        # Calculate derived metrics
-        latencies = [m['latency'] for m in self.history]
-        memories = [m['memory'] for m in self.history]
-        error_rates = [m['error_rate'] for m in self.history]
+        memory_slope = slope('memory')
+        
+        # Score latency against its learned baseline once it has warmed up
+        if 'latency' in f and f['latency']['warm']:
+            latency_anomaly = f['latency']['anomaly']
+        else:
+            latency_anomaly = bool(self.detect_anomaly(metrics.get('latency') or 0))
         
-        latency_anomaly = self.detect_anomaly(metrics['latency'])
-        latency_slope = self.calculate_slope(latencies)
-        memory_slope = self.calculate_slope(memories)
-        error_trend = self.calculate_slope(error_rates)
         risk_score = self.calculate_risk_score(
-            latency_anomaly, 
-            metrics['error_rate'], 
-            metrics['memory'],
+            latency_anomaly,
+            metrics.get('error_rate') or 0,
+            metrics.get('memory') or 0,
             memory_slope
         )
+        return {
+            'latency_anomaly': latency_anomaly,
+            'latency_slope': slope('latency'),
+            'memory_slope': memory_slope,
+            'error_trend': slope('error_rate'),
+            'risk_score': risk_score / 100  # Normalize to 0-1
+        }
+    
+    def add_target_points(self, timestamp, targets):
+        """Score every target independently and queue one compact document for the tick."""
+        scored = {}
+        for target, values in targets.items():
+            if target not in self.target_features:
+                self.target_features[target] = self.new_feature_engine()
+                self.target_caches[target] = MetricsCache(capacity=self.TARGET_CACHE_CAPACITY)
+            point = {**values, **self.score_point(values, self.target_features[target])}
+            self.target_caches[target].append({'timestamp': timestamp, **point})
+            scored[target] = point
+        
+        self.target_writer.write({'timestamp': timestamp, 'targets': scored})
+    
+    def observe(self, metrics):
+        """Export the latest values through the collector's own registry."""
+        self.latency.observe(metrics['latency'] / 1000)
+        self.error_rate.set(metrics['error_rate'])
+        self.cpu.set(metrics['cpu'])
+        self.memory.set(metrics['memory'])
+    
+    def add_data_point(self):
+        """Collect metrics and add to storage"""
+        start = time.perf_counter()
+        metrics = self.collect_metrics()
+        derived = self.score_point(metrics, self.features)
+        self.observe(metrics)
+        
+        # Queue document for the batched storage writer
+        doc_data = {
+            'id': uuid.uuid4().hex,  # Document ID in storage, assigned here so the cache knows it
+            'created_at': datetime.now(timezone.utc),
+            'timestamp': metrics['timestamp'],
+            'latency': metrics['latency'],
+            'error_rate': metrics['error_rate'],
+            'cpu': metrics['cpu'],
+            'memory': metrics['memory'],
+            'request_time': metrics['request_time'],
+            **derived
+        }
+        self.writer.write(doc_data)
+        self.last_epoch = to_epoch(doc_data['timestamp'])
+        self.cache.append(doc_data)
+        self.rollups.add(doc_data)
         
-        # Create document in Firestore
+        if metrics['targets']:
+            self.add_target_points(metrics['timestamp'], metrics['targets'])
+        collector_tick_seconds.observe(time.perf_counter() - start)
+        
+        self.notify(doc_data)
+    
+    def newest_point_epoch(self):
+        """Epoch of the newest point stored, spooled or collected so far, or None."""
+        candidates = [self.last_epoch] if self.last_epoch is not None else []
+        with self.writer.lock:
+            candidates += [to_epoch(doc['timestamp']) for doc, _ in self.writer.buffer]
+        latest = self.storage.latest_points('metrics', 1)
+        if latest:
+            candidates.append(to_epoch(latest[0]['timestamp']))
+        return max(candidates, default=None)
+    
+    def backfill(self, hours=24, step=600):
+        """
+        Fill the gap between the newest known point and now (at most `hours`
+        back) from Prometheus range queries and bulk-load it. Points already
+        stored are never fetched again, and backfilled points are scored by
+        the live feature engine in time order, so run it before collection starts.
+        """
+        end = int(time.time()) // step * step
+        start = end - int(hours * 3600)
         try:
-            doc_data = {
-                'timestamp': metrics['timestamp'],
-                'latency': metrics['latency'],
-                'error_rate': metrics['error_rate'],
-                'cpu': metrics['cpu'],
-                'memory': metrics['memory'],
-                'request_time': metrics['request_time'],
-                'latency_anomaly': latency_anomaly,
-                'latency_slope': latency_slope,
-                'memory_slope': memory_slope,
-                'error_trend': error_trend,
-                'risk_score': risk_score / 100,  # Normalize to 0-1
-                'created_at': firestore.SERVER_TIMESTAMP  # Use server timestamp for sorting
-            }
-            
-            # Add document with auto-generated ID
-            self.db.collection('metrics').add(doc_data)
+            newest = self.newest_point_epoch()
         except Exception as e:
-            print(f"Firestore write error: {e}")
+            print(f"Backfill skipped, newest stored point unknown: {e}")
+            return 0
+        if newest is not None:
+            start = max(start, (int(newest) // step + 1) * step)
+        if start > end:
+            print("Backfill: history is already up to date")
+            return 0
+        grid = np.arange(start, end + step, step)
+        print(f"Backfilling {len(grid)} points ({(end - start) / 3600:g}h @ {step}s)")
+        
+        # Split into chunks Prometheus accepts and fetch every (metric, chunk) concurrently
+        chunk = step * self.MAX_RANGE_POINTS
+        futures = []
+        for metric, query in self.METRIC_QUERIES.items():
+            for chunk_start in range(start, end + 1, chunk):
+                chunk_end = min(chunk_start + chunk - step, end)
+                futures.append((metric, self.query_executor.submit(
+                    self.query_prometheus_range, query, chunk_start, chunk_end, step
+                )))
+        
+        # Align every series on the common step grid; gaps stay NaN
+        columns = {metric: np.full(len(grid), np.nan) for metric in self.METRIC_QUERIES}
+        for metric, future in futures:
+            timestamps, values = future.result()
+            if len(timestamps):
+                slots = np.rint((timestamps - start) / step).astype(int)
+                keep = (slots >= 0) & (slots < len(grid))
+                columns[metric][slots[keep]] = values[keep]
+        
+        complete = np.all([~np.isnan(col) for col in columns.values()], axis=0)
+        grid = grid[complete]
+        columns = {metric: col[complete] for metric, col in columns.items()}
+        if not len(grid):
+            print("Backfill found no complete points")
+            return 0
+        
+        # Score oldest first through the same engine as live points
+        docs = []
+        for i, epoch in enumerate(grid.tolist()):
+            point = {metric: float(col[i]) for metric, col in columns.items()}
+            point.update(self.score_point(point, self.features))
+            ts = datetime.fromtimestamp(epoch)
+            docs.append({
+                'id': uuid.uuid4().hex,
+                'timestamp': ts.isoformat(),
+                **point,
+                'created_at': ts.astimezone()  # Historical time so ordering matches live points
+            })
+        self.last_epoch = float(grid[-1])
+        
+        # Bulk-load through the batched writer; anything not committed stays spooled
+        self.writer.write_many(docs)
+        self.writer.flush()
+        self.cache.extend(docs)
+        self.rollups.add_many(docs)
+        for doc in docs:
+            self.notify(doc)
+        written = len(docs) - self.writer.pending(docs)  # Older spooled points may share the buffer
+        
+        print(f"Backfilled {written}/{len(docs)} points")
+        return written
     
     def get_latest_metrics(self, limit=100):
-        """Get latest metrics from Firestore."""
+        """Get latest metrics, from the cache when it holds enough points."""
+        if self.cache.warmed and limit <= self.cache.capacity:
+            return self.cache.latest(limit)
+        return self.fetch_latest_metrics(limit)
+    
+    def get_metrics_range(self, start, end, resolution='auto', max_points=500):
+        """
+        Metrics between start and end (datetimes) as (resolution, points).
+        'raw' returns stored points; otherwise rollup rows of the chosen tier
+        (the finest one that fits in max_points when resolution is 'auto').
+        """
+        if resolution == 'raw':
+            return 'raw', self.storage.range_points('metrics', start, end)[-max_points:]
+        tier = select_tier(start, end, max_points, resolution)
+        return tier, self.storage.range_rollups(tier, start, end)
+    
+    def fetch_latest_metrics(self, limit=100):
+        """Get latest metrics from storage."""
         try:
-            query = self.db.collection('metrics').order_by(
-                'created_at', direction=firestore.Query.DESCENDING
-            ).limit(limit)
-            
-            docs = query.stream()
-            metrics = []
-            for doc in docs:
-                metric = doc.to_dict()
-                metric['id'] = doc.id
-                metrics.append(metric)
-            
-            return metrics
+            return self.storage.latest_points('metrics', limit)
         except Exception as e:
-            print(f"Firestore retrieval error: {e}")
+            print(f"Storage retrieval error: {e}")
             return []
 
     def start_collector(self):
@@ -186,6 +448,27 @@ class MetricsCollector:
                 time.sleep(600)  # 10 minutes
                 self.add_data_point()
         
+        self.writer.start()
+        if self.target_writer:
+            self.target_writer.start()
         thread = threading.Thread(target=collector_loop, daemon=True)
         thread.start()
 
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Backfill metric history from Prometheus")
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--step", type=int, default=600, help="Seconds between points")
+    parser.add_argument("--credentials", default="key.json")
+    parser.add_argument("--storage", help="firestore or sqlite (default: $ATOM_STORAGE)")
+    parser.add_argument("--prometheus-url", default=os.getenv("PROMETHEUS_URL", "http://localhost:9090"))
+    args = parser.parse_args()
+    
+    collector = MetricsCollector(
+        credentials_path=args.credentials,
+        prometheus_url=args.prometheus_url,
+        storage=create_storage(args.storage, credentials_path=args.credentials)
+    )
+    collector.backfill(hours=args.hours, step=args.step)
@@ -0,0 +1,78 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from flask import Response
+
+
+class CachedResponse:
+    """A pre-serialized JSON body with its validators."""
+
+    __slots__ = ('body', 'etag', 'last_modified')
+
+    def __init__(self, body, last_modified):
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.last_modified = last_modified
+
+    def to_response(self, request):
+        """Build the response, answering conditional requests with 304."""
+        response = Response(self.body, mimetype='application/json')
+        response.set_etag(self.etag)
+        response.last_modified = self.last_modified
+        response.headers['Cache-Control'] = 'no-cache'  # Clients revalidate on every poll
+        return response.make_conditional(request)
+
+
+class ResponseCache:
+    """
+    Server-side cache of encoded JSON responses, keyed by data source and
+    request parameters. A source's entries are dropped when it changes
+    (the collector writes a point or the pipeline saves a forecast).
+    """
+
+    MAX_ENTRIES = 64
+
+    def __init__(self, dumps, max_entries=MAX_ENTRIES):
+        self.dumps = dumps  # JSON encoder, e.g. app.json.dumps
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # (source, key) -> CachedResponse
+        self.versions = {}
+        self.modified = {}
+
+    def invalidate(self, source):
+        with self.lock:
+            self.versions[source] = self.versions.get(source, 0) + 1
+            self.modified[source] = datetime.now(timezone.utc).replace(microsecond=0)
+            for cache_key in [k for k in self.entries if k[0] == source]:
+                del self.entries[cache_key]
+
+    def get(self, source, key, build):
+        """
+        Return the cached response for (source, key), building and encoding it
+        with build() on a miss. Returns None when build() has nothing to serve.
+        """
+        cache_key = (source, key)
+        with self.lock:
+            entry = self.entries.get(cache_key)
+            if entry is not None:
+                self.entries.move_to_end(cache_key)
+                return entry
+            version = self.versions.get(source, 0)
+            last_modified = self.modified.setdefault(
+                source, datetime.now(timezone.utc).replace(microsecond=0)
+            )
+
+        data = build()
+        if data is None:
+            return None
+        entry = CachedResponse(self.dumps(data).encode(), last_modified)
+
+        with self.lock:
+            # Don't keep a body built from data that changed underneath it
+            if self.versions.get(source, 0) == version:
+                self.entries[cache_key] = entry
+                if len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return entry
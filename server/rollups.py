@@ -0,0 +1,136 @@
+from bisect import bisect_left
+from datetime import datetime, timedelta
+import numpy as np
+from storage import to_epoch
+
+# Tier name -> bucket width in seconds, finest first
+TIERS = {'1m': 60, '10m': 600, '1h': 3600, '1d': 86400}
+ROLLUP_FIELDS = ['latency', 'error_rate', 'cpu', 'memory', 'request_time', 'risk_score']
+
+
+def select_tier(start, end, max_points, resolution='auto'):
+    """Finest tier whose bucket count over [start, end] fits in max_points."""
+    if resolution in TIERS:
+        return resolution
+    span = to_epoch(end) - to_epoch(start)
+    for tier, width in TIERS.items():
+        if span / width <= max_points:
+            return tier
+    return list(TIERS)[-1]
+
+
+def summarize(values):
+    values = np.asarray(values, dtype=float)
+    return {
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'mean': float(values.mean()),
+        'p95': float(np.percentile(values, 95)),
+    }
+
+
+class RollupAggregator:
+    """
+    Maintains downsampled tiers of the metric stream (min/max/mean/p95 per
+    field per bucket). Each tier keeps its open bucket's raw values in memory
+    and upserts that bucket's row in storage as points arrive. Older buckets
+    (backfills) are recomputed from the stored raw points.
+    """
+
+    def __init__(self, storage, tiers=TIERS, fields=ROLLUP_FIELDS):
+        self.storage = storage
+        self.tiers = tiers
+        self.fields = fields
+        self.open = {}  # tier -> (bucket start, {field: [values]})
+
+    def warm(self):
+        """Rebuild the open buckets from raw points after a restart."""
+        try:
+            widest = max(self.tiers.values())
+            start = datetime.fromtimestamp(to_epoch(datetime.now()) // widest * widest)
+            points = self.storage.range_points('metrics', start, datetime.now() + timedelta(minutes=1))
+            self.add_many(points, write=False)
+        except Exception as e:
+            print(f"Rollup warm-up error: {e}")
+
+    def add(self, doc):
+        self.add_many([doc])
+
+    def add_many(self, docs, write=True):
+        """Fold points into every tier and upsert each touched bucket once."""
+        dirty = {tier: {} for tier in self.tiers}
+        stale = []  # (tier, bucket) that storage may already hold points for
+        for tier, width in self.tiers.items():
+            for doc in docs:
+                bucket = to_epoch(doc['timestamp']) // width * width
+                open_bucket, values = self.open.get(tier, (None, None))
+                if open_bucket is None or bucket > open_bucket:
+                    values = {field: [] for field in self.fields}
+                    self.open[tier] = (bucket, values)
+                    if open_bucket is None and write:
+                        stale.append((tier, bucket))
+                elif bucket < open_bucket:
+                    # Older than the open bucket (e.g. a backfill)
+                    values = dirty[tier].get(bucket)
+                    if values is None:
+                        values = {field: [] for field in self.fields}
+                        stale.append((tier, bucket))
+                for field in self.fields:
+                    if doc.get(field) is not None:
+                        values[field].append(doc[field])
+                dirty[tier][bucket] = values
+
+        if not write:
+            return
+        if stale:
+            self.merge_stored(stale, dirty, docs)
+        for tier, buckets in dirty.items():
+            rows = [self.row(bucket, values) for bucket, values in buckets.items()]
+            rows = [row for row in rows if row['count']]
+            if rows:
+                try:
+                    self.storage.write_rollups(tier, rows)
+                except Exception as e:
+                    print(f"Rollup write error ({tier}): {e}")
+
+    def merge_stored(self, stale, dirty, docs):
+        """
+        Recompute buckets the aggregator hasn't seen in full from the stored
+        raw points plus the new ones, so upserting them never replaces a
+        complete bucket with a partial one. Buckets that can't be read are not written.
+        """
+        start = min(bucket for _, bucket in stale)
+        end = max(bucket + self.tiers[tier] for tier, bucket in stale)
+        try:
+            stored = self.storage.range_points('metrics', datetime.fromtimestamp(start), datetime.fromtimestamp(end))
+        except Exception as e:
+            print(f"Rollup merge error, skipping {len(stale)} buckets: {e}")
+            for tier, bucket in stale:
+                dirty[tier].pop(bucket, None)
+            return
+
+        # The new points may already be stored; count every timestamp once
+        points = {to_epoch(p['timestamp']): p for p in stored}
+        points.update((to_epoch(doc['timestamp']), doc) for doc in docs)
+        epochs = sorted(points)
+        for tier, bucket in stale:
+            values = dirty[tier][bucket]
+            first = bisect_left(epochs, bucket)
+            last = bisect_left(epochs, bucket + self.tiers[tier])
+            for field in self.fields:
+                # In place: the open bucket's lists keep collecting live points
+                values[field][:] = [
+                    points[epoch][field] for epoch in epochs[first:last]
+                    if points[epoch].get(field) is not None
+                ]
+
+    def row(self, bucket, values):
+        row = {
+            'bucket': bucket,
+            'timestamp': datetime.fromtimestamp(bucket).isoformat(),
+            'count': max((len(v) for v in values.values()), default=0),
+        }
+        for field, field_values in values.items():
+            if field_values:
+                row[field] = summarize(field_values)
+        return row
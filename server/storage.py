@@ -0,0 +1,250 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from instrumentation import storage_operation
+
+
+def to_epoch(ts):
+    """Epoch seconds from a datetime or ISO-8601 string."""
+    if hasattr(ts, 'timestamp'):
+        return ts.timestamp()
+    return datetime.fromisoformat(str(ts)).timestamp()
+
+
+class StorageBackend:
+    """
+    Where metric points and forecast documents live.
+    Points are time-ordered documents in a collection ('metrics',
+    'target_metrics'); documents are keyed records ('forecasts/latest').
+    """
+
+    name = 'storage'  # Backend label in the storage latency metrics
+
+    def write_points(self, collection, docs):
+        """Store points; raise on failure so callers can retry."""
+        raise NotImplementedError
+
+    def latest_points(self, collection, limit=100):
+        """Newest points first."""
+        raise NotImplementedError
+
+    def range_points(self, collection, start, end):
+        """Points with start <= timestamp <= end (datetimes), oldest first."""
+        raise NotImplementedError
+
+    def save_documents(self, collection, docs):
+        """Store documents keyed by ID (dict of doc_id -> doc), replacing existing ones."""
+        raise NotImplementedError
+
+    def save_document(self, collection, doc_id, doc):
+        self.save_documents(collection, {doc_id: doc})
+
+    def get_document(self, collection, doc_id):
+        """The document's data, or None."""
+        raise NotImplementedError
+
+    def write_rollups(self, tier, rows):
+        """Upsert rollup rows, keyed by their 'bucket' start (epoch seconds)."""
+        raise NotImplementedError
+
+    def range_rollups(self, tier, start, end):
+        """Rollup rows with buckets in [start, end] (datetimes), oldest first."""
+        raise NotImplementedError
+
+
+class FirestoreBackend(StorageBackend):
+    """Cloud Firestore through firebase_admin."""
+
+    name = 'firestore'
+    BATCH_SIZE = 500  # Firestore limit of writes per batch
+
+    def __init__(self, credentials_path="key.json"):
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+
+        self.firestore = firestore
+        try:
+            # Check if Firebase app is already initialized
+            if not firebase_admin._apps:
+                cred = credentials.Certificate(credentials_path)
+                firebase_admin.initialize_app(cred)
+            self.db = firestore.client()
+            print("✅ Firestore initialized")
+        except Exception as e:
+            print(f"❌ Firestore error: {e}")
+            raise
+
+    @storage_operation('write_points')
+    def write_points(self, collection, docs):
+        for i in range(0, len(docs), self.BATCH_SIZE):
+            batch = self.db.batch()
+            for doc in docs[i:i + self.BATCH_SIZE]:
+                data = dict(doc)
+                data.setdefault('created_at', self.firestore.SERVER_TIMESTAMP)  # Use server timestamp for sorting
+                # The collector's point ID, so cached points and stored documents share one
+                batch.set(self.db.collection(collection).document(data.pop('id', None)), data)
+            batch.commit()
+
+    @storage_operation('latest_points')
+    def latest_points(self, collection, limit=100):
+        docs = (self.db.collection(collection)
+                .order_by('created_at', direction=self.firestore.Query.DESCENDING)
+                .limit(limit)
+                .stream())
+        points = []
+        for doc in docs:
+            point = doc.to_dict()
+            point['id'] = doc.id
+            points.append(point)
+        return points
+
+    @storage_operation('range_points')
+    def range_points(self, collection, start, end):
+        docs = (self.db.collection(collection)
+                .where('timestamp', '>=', start.isoformat())
+                .where('timestamp', '<=', end.isoformat())
+                .order_by('timestamp')
+                .stream())
+        return [doc.to_dict() for doc in docs]
+
+    @storage_operation('save_documents')
+    def save_documents(self, collection, docs):
+        items = list(docs.items())
+        for i in range(0, len(items), self.BATCH_SIZE):
+            batch = self.db.batch()
+            for doc_id, doc in items[i:i + self.BATCH_SIZE]:
+                batch.set(self.db.collection(collection).document(doc_id), doc)
+            batch.commit()
+
+    @storage_operation('get_document')
+    def get_document(self, collection, doc_id):
+        doc = self.db.collection(collection).document(doc_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    @storage_operation('write_rollups')
+    def write_rollups(self, tier, rows):
+        self.save_documents(f'rollups_{tier}', {str(int(row['bucket'])): row for row in rows})
+
+    @storage_operation('range_rollups')
+    def range_rollups(self, tier, start, end):
+        docs = (self.db.collection(f'rollups_{tier}')
+                .where('bucket', '>=', to_epoch(start))
+                .where('bucket', '<=', to_epoch(end))
+                .order_by('bucket')
+                .stream())
+        return [doc.to_dict() for doc in docs]
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Local embedded storage: a SQLite database in WAL mode, so readers never
+    block the writer. Points are indexed by (collection, timestamp) for range scans.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path="atom.db"):
+        self.path = path
+        self.local = threading.local()  # One connection per thread
+        self.write_lock = threading.Lock()
+
+        conn = self.connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS points (
+                id INTEGER PRIMARY KEY,
+                collection TEXT NOT NULL,
+                ts REAL NOT NULL,
+                doc TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS points_collection_ts ON points (collection, ts);
+            CREATE TABLE IF NOT EXISTS documents (
+                collection TEXT NOT NULL,
+                id TEXT NOT NULL,
+                doc TEXT NOT NULL,
+                PRIMARY KEY (collection, id)
+            );
+            CREATE TABLE IF NOT EXISTS rollups (
+                tier TEXT NOT NULL,
+                bucket REAL NOT NULL,
+                doc TEXT NOT NULL,
+                PRIMARY KEY (tier, bucket)
+            );
+        """)
+        print(f"✅ SQLite storage at {os.path.abspath(path)}")
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL, far fewer fsyncs
+            self.local.conn = conn
+        return conn
+
+    @staticmethod
+    def encode(doc):
+        return json.dumps(doc, default=lambda v: v.isoformat() if hasattr(v, 'isoformat') else str(v))
+
+    @storage_operation('write_points')
+    def write_points(self, collection, docs):
+        rows = [(collection, to_epoch(doc['timestamp']), self.encode(doc)) for doc in docs]
+        conn = self.connection()
+        with self.write_lock, conn:
+            conn.executemany("INSERT INTO points (collection, ts, doc) VALUES (?, ?, ?)", rows)
+
+    @storage_operation('latest_points')
+    def latest_points(self, collection, limit=100):
+        rows = self.connection().execute(
+            "SELECT id, doc FROM points WHERE collection = ? ORDER BY ts DESC LIMIT ?",
+            (collection, limit)
+        )
+        return [{'id': str(row_id), **json.loads(doc)} for row_id, doc in rows]  # The collector's ID wins
+
+    @storage_operation('range_points')
+    def range_points(self, collection, start, end):
+        rows = self.connection().execute(
+            "SELECT doc FROM points WHERE collection = ? AND ts BETWEEN ? AND ? ORDER BY ts",
+            (collection, to_epoch(start), to_epoch(end))
+        )
+        return [json.loads(doc) for (doc,) in rows]
+
+    @storage_operation('save_documents')
+    def save_documents(self, collection, docs):
+        rows = [(collection, doc_id, self.encode(doc)) for doc_id, doc in docs.items()]
+        conn = self.connection()
+        with self.write_lock, conn:
+            conn.executemany("INSERT OR REPLACE INTO documents (collection, id, doc) VALUES (?, ?, ?)", rows)
+
+    @storage_operation('get_document')
+    def get_document(self, collection, doc_id):
+        row = self.connection().execute(
+            "SELECT doc FROM documents WHERE collection = ? AND id = ?", (collection, doc_id)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    @storage_operation('write_rollups')
+    def write_rollups(self, tier, rows):
+        rows = [(tier, row['bucket'], self.encode(row)) for row in rows]
+        conn = self.connection()
+        with self.write_lock, conn:
+            conn.executemany("INSERT OR REPLACE INTO rollups (tier, bucket, doc) VALUES (?, ?, ?)", rows)
+
+    @storage_operation('range_rollups')
+    def range_rollups(self, tier, start, end):
+        rows = self.connection().execute(
+            "SELECT doc FROM rollups WHERE tier = ? AND bucket BETWEEN ? AND ? ORDER BY bucket",
+            (tier, to_epoch(start), to_epoch(end))
+        )
+        return [json.loads(doc) for (doc,) in rows]
+
+
+def create_storage(kind=None, credentials_path="key.json", sqlite_path=None):
+    """Backend selected by `kind` or the ATOM_STORAGE env var ('firestore' or 'sqlite')."""
+    kind = (kind or os.getenv("ATOM_STORAGE", "firestore")).lower()
+    if kind == "sqlite":
+        return SQLiteBackend(sqlite_path or os.getenv("ATOM_SQLITE_PATH", "atom.db"))
+    if kind == "firestore":
+        return FirestoreBackend(credentials_path)
+    raise ValueError(f"Unknown storage backend: {kind}")
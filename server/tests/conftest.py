@@ -0,0 +1,7 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The server's modules are imported flat, as app.py does
+sys.path.insert(0, os.path.join(ROOT, "server"))
@@ -0,0 +1,106 @@
+import time
+from datetime import datetime
+import numpy as np
+import pytest
+from metrics_cache import MetricsCache
+from metrics_collector import MetricsCollector
+from storage import SQLiteBackend, to_epoch
+
+STEP = 600
+
+
+@pytest.fixture
+def collector(tmp_path):
+    collector = MetricsCollector(
+        storage=SQLiteBackend(str(tmp_path / "atom.db")),
+        cache=MetricsCache(),
+        spool_path=str(tmp_path / "spool.jsonl"),
+    )
+
+    # Prometheus stand-in: flat series, with latency spiking on the newest point
+    def query_range(query, start, end, step, timeout=60):
+        timestamps = np.arange(start, end + step, step, dtype=float)
+        values = np.full(len(timestamps), 50.0)
+        if query == MetricsCollector.METRIC_QUERIES['latency']:
+            values = 100 + np.sin(timestamps / 3600)
+            values[-1] = 400
+        return timestamps, values
+
+    collector.query_prometheus_range = query_range
+    yield collector
+    collector.query_executor.shutdown()
+
+
+def stored_timestamps(storage):
+    points = storage.range_points('metrics', datetime(2000, 1, 1), datetime(2100, 1, 1))
+    return [to_epoch(p['timestamp']) for p in points]
+
+
+def test_second_backfill_writes_nothing(collector):
+    written = collector.backfill(hours=6, step=STEP)
+    assert written == 37
+    assert collector.backfill(hours=6, step=STEP) == 0
+
+    timestamps = stored_timestamps(collector.storage)
+    assert len(timestamps) == written
+    assert len(set(timestamps)) == written
+
+
+def test_backfill_starts_after_newest_stored_point(collector):
+    # One point stored 3 hours ago, before an outage
+    outage = (int(time.time()) // STEP - 18) * STEP + 30
+    collector.storage.write_points('metrics', [{
+        'timestamp': datetime.fromtimestamp(outage).isoformat(), 'latency': 100.0,
+    }])
+
+    written = collector.backfill(hours=24, step=STEP)
+
+    timestamps = stored_timestamps(collector.storage)
+    assert written == 18
+    assert len(timestamps) == 19
+    assert min(timestamps[1:]) == outage - 30 + STEP
+
+
+def test_backfill_scores_through_the_feature_engine(collector):
+    collector.backfill(hours=6, step=STEP)
+    newest = collector.cache.latest(2)
+
+    # The spike is judged against the learned baseline, as a live point would be
+    assert collector.features.series['latency'].baseline.count == 37
+    assert newest[0]['latency_anomaly'] is True
+    assert newest[1]['latency_anomaly'] is False
+    assert collector.last_epoch == to_epoch(newest[0]['timestamp'])
+
+
+class FlakyStorage(SQLiteBackend):
+    down = False
+
+    def write_points(self, collection, docs):
+        if self.down:
+            raise ConnectionError("backend down")
+        super().write_points(collection, docs)
+
+
+def test_backfill_counts_its_own_committed_points(tmp_path):
+    storage = FlakyStorage(str(tmp_path / "atom.db"))
+    storage.down = True
+    collector = MetricsCollector(storage=storage, cache=MetricsCache(), spool_path=str(tmp_path / "spool.jsonl"))
+    collector.query_prometheus_range = lambda query, start, end, step, timeout=60: (
+        np.arange(start, end + step, step, dtype=float), np.full((end - start) // step + 1, 50.0)
+    )
+    received = []
+    collector.add_listener(received.append)
+    try:
+        # A live point spooled before the outage is still in the writer's buffer
+        outage = (int(time.time()) // STEP - 18) * STEP + 30
+        collector.writer.write({'timestamp': datetime.fromtimestamp(outage).isoformat(), 'latency': 100.0})
+
+        assert collector.backfill(hours=24, step=STEP) == 0
+        assert len(received) == 18  # Every backfilled point reaches the listeners, committed or not
+        assert len(collector.writer.buffer) == 19
+
+        storage.down = False
+        assert collector.writer.flush() == 19
+        assert collector.writer.pending(received) == 0
+    finally:
+        collector.query_executor.shutdown()
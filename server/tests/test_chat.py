@@ -0,0 +1,86 @@
+import types
+
+import pytest
+
+import app as server_app
+from atom_common.semantic_cache import SemanticCache
+from chat_sessions import ChatSessionStore
+
+
+class FakeGroq:
+    """Answers "ok" in two chunks, or raises `error` once `fail_after` chunks have been sent."""
+
+    def __init__(self, error=None, fail_after=0):
+        self.error = error
+        self.fail_after = fail_after
+        self.sent = []
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, stream=False, **kwargs):
+        self.sent.append(messages)
+        if not stream:
+            if self.error:
+                raise self.error
+            message = types.SimpleNamespace(content="ok")
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+        return self.stream()
+
+    def stream(self):
+        for i, text in enumerate(["o", "k"]):
+            if self.error and i == self.fail_after:
+                raise self.error
+            yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=text))])
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    monkeypatch.setattr(server_app, "chat_sessions", ChatSessionStore())
+    monkeypatch.setattr(server_app, "chat_cache", SemanticCache())
+    monkeypatch.setattr(server_app, "digest", types.SimpleNamespace(get=lambda: "digest", version=1))
+    session = server_app.chat_sessions.get()
+    server_app.chat_sessions.add_turn(session, "hello", "hi")
+    return session
+
+
+def roles(session):
+    return [m['role'] for m in session.messages]
+
+
+def test_turn_is_recorded_with_its_answer(monkeypatch, chat):
+    groq = FakeGroq()
+    monkeypatch.setattr(server_app, "client", groq)
+
+    assert server_app.chat_with_groq(chat, "how is latency?") == "ok"
+    assert "".join(server_app.stream_chat_with_groq(chat, "and cpu?")) == "ok"
+
+    assert groq.sent[0][-1] == {"role": "user", "content": "how is latency?"}
+    assert [m['content'] for m in chat.messages] == ["hello", "hi", "how is latency?", "ok", "and cpu?", "ok"]
+
+
+def test_failed_call_leaves_no_dangling_turn(monkeypatch, chat):
+    monkeypatch.setattr(server_app, "client", FakeGroq(error=TimeoutError("groq timed out")))
+
+    with pytest.raises(TimeoutError):
+        server_app.chat_with_groq(chat, "how is latency?")
+    assert roles(chat) == ["user", "assistant"]
+
+
+@pytest.mark.parametrize("fail_after", [0, 1])
+def test_failed_stream_leaves_no_dangling_turn(monkeypatch, chat, fail_after):
+    monkeypatch.setattr(server_app, "client", FakeGroq(error=ConnectionError("reset"), fail_after=fail_after))
+
+    with pytest.raises(ConnectionError):
+        list(server_app.stream_chat_with_groq(chat, "how is latency?"))
+    assert roles(chat) == ["user", "assistant"]
+
+
+def test_disconnected_stream_leaves_no_dangling_turn(monkeypatch, chat):
+    monkeypatch.setattr(server_app, "client", FakeGroq())
+
+    chunks = server_app.stream_chat_with_groq(chat, "how is latency?")
+    assert next(chunks) == "o"
+    chunks.close()  # What the WSGI server does when the client goes away
+
+    assert roles(chat) == ["user", "assistant"]
+    assert server_app.chat_with_groq(chat, "how is latency?") == "ok"
+    assert roles(chat) == ["user", "assistant"] * 2
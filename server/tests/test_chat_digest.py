@@ -0,0 +1,76 @@
+import types
+from datetime import datetime, timedelta
+from chat_digest import DigestBuilder
+from metrics_cache import MetricsCache
+
+NOW = datetime.now().replace(second=0, microsecond=0)
+
+
+def forecast(metric, values, step=timedelta(minutes=10)):
+    timestamps = [(NOW + step * (i + 1)).isoformat() for i in range(len(values))]
+    return {'metrics': {metric: {'forecast': {'values': values, 'timestamps': timestamps}}}}
+
+
+def make_digest(points=(), latest=None, anomaly=None):
+    cache = MetricsCache()
+    cache.extend(points)
+    features = types.SimpleNamespace(latest=anomaly or {})
+    calls = []
+
+    def latest_forecast():
+        calls.append(1)
+        return latest
+
+    return DigestBuilder(cache, features, latest_forecast), calls
+
+
+def latency_points(values):
+    start = NOW - timedelta(minutes=10 * (len(values) - 1))
+    return [{'timestamp': (start + timedelta(minutes=10 * i)).isoformat(), 'latency': v} for i, v in enumerate(values)]
+
+
+def test_metric_lines_summarize_the_window():
+    digest, _ = make_digest(
+        latency_points([100.0, 110.0, 120.0, 130.0]),
+        anomaly={'latency': {'anomaly': True, 'zscore': 4.26}},
+    )
+
+    lines = digest.get().split("\n")
+    assert lines[0].startswith("Live system state at ")
+    assert lines[1] == "- latency: now 130ms, last 4 pts mean 115 min 100 max 130, trend +60ms/h, ANOMALY (z=4.3)"
+    assert len(lines) == 2  # Metrics with no points are left out
+
+
+def test_forecast_lines_report_the_threshold_crossing():
+    digest, _ = make_digest(latency_points([100.0]), latest=forecast('latency', [200.0, 450.0, 600.0, 300.0]))
+
+    text = digest.get()
+    assert "Forecast:\n- latency: 200-600ms over next 4 steps, peak at " + (NOW + timedelta(minutes=30)).isoformat()[:16] in text
+    minutes = int(text.split("; crosses 500ms in ~")[1].split(" min")[0])
+    assert 28 <= minutes <= 30  # The third step, 30 minutes after NOW
+
+
+def test_digest_is_rebuilt_only_when_marked_dirty():
+    digest, calls = make_digest()
+    text = digest.get()
+    assert text.endswith("No metrics collected yet.")
+    assert digest.get() is text
+    assert len(calls) == 1
+
+    digest.cache.extend(latency_points([100.0]))
+    digest.mark_dirty()  # A new point: the forecast is still current
+    assert "- latency: now 100ms" in digest.get()
+    assert len(calls) == 1 and digest.version == 1
+
+    digest.mark_dirty(forecast('latency', [90.0]))  # The pipeline pushed a new forecast
+    assert "- latency: 90-90ms over next 1 steps" in digest.get()
+    assert len(calls) == 1 and digest.version == 2
+
+
+def test_forecast_errors_leave_the_metrics():
+    digest, _ = make_digest(latency_points([100.0]))
+    digest.latest_forecast = lambda: 1 / 0
+
+    text = digest.get()
+    assert "- latency: now 100ms" in text
+    assert "Forecast:" not in text
@@ -0,0 +1,69 @@
+from chat_sessions import ChatSessionStore
+
+
+def chat(store, session, turns, size=400):
+    for i in range(turns):
+        store.add_turn(session, f"question {i} " + "q" * size, f"answer {i} " + "a" * size)
+        store.trim(session)
+
+
+def test_history_is_folded_to_the_budget_in_whole_turns():
+    calls = []
+
+    def summarize(previous, messages):
+        calls.append(messages)
+        return f"{previous} {len(messages)}".strip()
+
+    store = ChatSessionStore(summarize=summarize, token_budget=1000, keep_recent=4)
+    session = store.get()
+    chat(store, session, 10)
+
+    assert session.tokens() <= 1000
+    assert len(session.messages) >= 4
+    assert [m['role'] for m in session.messages] == ['user', 'assistant'] * (len(session.messages) // 2)
+    assert session.messages[-1]['content'].startswith("answer 9")
+    for folded in calls:
+        assert [m['role'] for m in folded] == ['user', 'assistant'] * (len(folded) // 2)
+    assert sum(len(folded) for folded in calls) == 20 - len(session.messages)
+
+
+def test_recent_turns_are_kept_over_budget():
+    store = ChatSessionStore(summarize=lambda previous, messages: "summary", token_budget=100, keep_recent=4)
+    session = store.get()
+    chat(store, session, 3, size=1000)
+
+    assert len(session.messages) == 4
+    assert session.summary == "summary"
+    assert store.context(session, "prompt")[:2] == [
+        {"role": "system", "content": "prompt"},
+        {"role": "system", "content": "Summary of the earlier conversation:\nsummary"},
+    ]
+
+
+def test_failed_summary_keeps_clipped_turns():
+    def summarize(previous, messages):
+        raise RuntimeError("rate limited")
+
+    store = ChatSessionStore(summarize=summarize, token_budget=500, keep_recent=2)
+    session = store.get()
+    chat(store, session, 4)
+
+    # Without a summary the newest folded turns are kept, clipped to the budget
+    assert "user: question 2" in session.summary
+    assert "question 0" not in session.summary
+    assert len(session.summary) <= 500
+
+
+def test_sessions_expire_and_are_evicted():
+    store = ChatSessionStore(max_sessions=2, ttl=3600)
+    first = store.get("a")
+    store.get("b")
+    assert store.get("a") is first
+
+    store.get("c")  # Evicts "b", the least recently used
+    assert set(store.sessions) == {"a", "c"}
+    assert store.get("c") is store.sessions["c"] and set(store.sessions) == {"a", "c"}
+
+    store.ttl = 0
+    store.get("d")
+    assert set(store.sessions) == {"d"}
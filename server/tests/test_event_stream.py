@@ -0,0 +1,73 @@
+import json
+from event_stream import EventBroker
+
+
+def parse(message):
+    """(id, event, data) of one encoded event."""
+    fields = dict(line.split(": ", 1) for line in message.strip().split("\n"))
+    return int(fields['id']), fields['event'], json.loads(fields['data'])
+
+
+def drain(subscription):
+    messages = []
+    while not subscription.queue.empty():
+        messages.append(parse(subscription.queue.get_nowait()))
+    return messages
+
+
+def test_reconnect_resumes_after_last_event_id():
+    broker = EventBroker(dumps=json.dumps)
+    live = broker.subscribe()
+    for i in range(5):
+        broker.publish('metrics', {'n': i})
+
+    received = drain(live)
+    assert [data['n'] for _, _, data in received] == [0, 1, 2, 3, 4]
+    assert [event_id for event_id, _, _ in received] == list(range(received[0][0], received[0][0] + 5))
+
+    # Dropped after the second event: the rest are replayed, then live events follow
+    resumed = broker.subscribe(last_event_id=received[1][0])
+    broker.publish('forecast', {'n': 5})
+    assert [(event, data['n']) for _, event, data in drain(resumed)] == [
+        ('metrics', 2), ('metrics', 3), ('metrics', 4), ('forecast', 5)
+    ]
+
+    assert drain(broker.subscribe()) == []  # No Last-Event-ID: live events only
+    assert drain(broker.subscribe(last_event_id=received[-1][0] + 1)) == []
+
+
+def test_replay_is_bounded():
+    broker = EventBroker(dumps=json.dumps, queue_size=3, replay_size=5)
+    first_id = broker.next_id
+    for i in range(8):
+        broker.publish('metrics', {'n': i})
+
+    # Events 0-2 left the replay buffer; the queue takes the newest 3 of the rest
+    resumed = broker.subscribe(last_event_id=first_id - 1)
+    assert [data['n'] for _, _, data in drain(resumed)] == [5, 6, 7]
+
+
+def test_slow_subscriber_is_disconnected():
+    broker = EventBroker(dumps=json.dumps, queue_size=2, heartbeat=0.01)
+    slow = broker.subscribe()
+    for i in range(3):
+        broker.publish('metrics', {'n': i})
+
+    assert slow.overflowed and slow not in broker.subscribers
+    messages = list(broker.stream(slow))  # Ends once the queued events are sent
+    assert messages[0] == "retry: 3000\n\n"
+    assert [parse(m)[2]['n'] for m in messages[1:]] == [0, 1]
+
+
+def test_stream_sends_keep_alives_and_unsubscribes_on_close():
+    broker = EventBroker(dumps=json.dumps, heartbeat=0.01)
+    subscription = broker.subscribe()
+    stream = broker.stream(subscription)
+
+    assert next(stream) == "retry: 3000\n\n"
+    assert next(stream) == ": keep-alive\n\n"
+    broker.publish('metrics', {'n': 1})
+    assert parse(next(stream))[2] == {'n': 1}
+
+    stream.close()  # The client went away
+    assert subscription not in broker.subscribers
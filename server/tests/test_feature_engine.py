@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from feature_engine import FeatureEngine, RingBuffer, RollingSlope
+
+
+def polyfit_slope(values):
+    if len(values) < 2:
+        return 0.0
+    return np.polyfit(np.arange(len(values)), values, 1)[0]
+
+
+@pytest.mark.parametrize("window", [2, 5, 10])
+def test_rolling_slope_matches_polyfit(window):
+    values = np.random.default_rng(7).normal(100, 15, 60) + np.arange(60) * 0.8
+    slope = RollingSlope(window)
+
+    # Filling the window, then evicting one sample per update
+    for i, value in enumerate(values):
+        got = slope.update(value)
+        assert got == pytest.approx(polyfit_slope(values[max(0, i + 1 - window):i + 1]), abs=1e-9)
+
+
+def test_rolling_slope_survives_rebasing():
+    values = np.random.default_rng(3).uniform(0, 1000, 500)
+    slope = RollingSlope(10)
+    slope.REBASE_EVERY = 25
+
+    for i, value in enumerate(values):
+        got = slope.update(value)
+        assert got == pytest.approx(polyfit_slope(values[max(0, i - 9):i + 1]), abs=1e-6)
+    assert slope.t < 50
+
+
+def test_ring_buffer_is_chronological():
+    buffer = RingBuffer(3)
+    assert [buffer.push(v) for v in range(5)] == [None, None, None, 0, 1]
+    assert buffer.to_array().tolist() == [2, 3, 4]
+
+
+def test_anomalies_need_a_warm_baseline():
+    engine = FeatureEngine(windows={'latency': (10,)})
+    flags = [engine.update({'latency': 100.0 + i % 3})['latency']['anomaly'] for i in range(30)]
+    assert not any(flags)
+
+    spike = engine.update({'latency': 400.0})['latency']
+    assert spike['anomaly'] and spike['zscore'] > 3
+    assert engine.update({'cpu': 1.0}) == {}
+
+    cold = FeatureEngine(windows={'latency': (10,)})
+    cold.update({'latency': 100.0})
+    assert not cold.update({'latency': 400.0})['latency']['anomaly']
@@ -0,0 +1,66 @@
+import os
+import time
+import pytest
+from forecast_executor import ForecastExecutor
+
+
+class EchoModel:
+    """Stands in for a fitted pmdarima model: forecasts the last value."""
+
+    def __init__(self):
+        self.arima_res_ = self
+
+    def apply(self, values):
+        self.last = float(values[-1])
+        return self
+
+    def forecast(self, steps):
+        return [self.last] * steps
+
+
+class HungModel(EchoModel):
+    """Never returns, and swallows the worker's own SIGALRM timeout."""
+
+    def apply(self, values):
+        with open(values[0], 'w') as f:
+            f.write(str(os.getpid()))
+        while True:
+            try:
+                time.sleep(60)
+            except TimeoutError:
+                pass
+
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+@pytest.fixture
+def executor():
+    executor = ForecastExecutor(max_workers=1, series_timeout=1)
+    executor.load_models({'latency': EchoModel(), 'hung': HungModel()})
+    yield executor
+    executor.terminate()
+
+
+def test_hung_series_does_not_block_the_pool(executor, tmp_path):
+    pid_path = str(tmp_path / "worker.pid")
+    forecasts, failures, _ = executor.run({
+        'ok': ('latency', [1.0, 2.0]),
+        'stuck': ('hung', [pid_path]),
+    }, n_periods=2)
+
+    assert forecasts == {'ok': [2.0, 2.0]}
+    assert failures == {'stuck': "timed out"}
+    assert executor.restarts == 1
+    with open(pid_path) as f:
+        assert not alive(int(f.read()))
+
+    # The only worker was the hung one: without a restart this would time out too
+    forecasts, failures, _ = executor.run({'ok': ('latency', [3.0])}, n_periods=1)
+    assert forecasts == {'ok': [3.0]} and failures == {}
+    assert executor.restarts == 1
@@ -0,0 +1,98 @@
+import pickle
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from forecast_pipeline import ForecastPipeline
+from metrics_cache import MetricsCache
+from storage import SQLiteBackend, to_epoch
+
+pm = pytest.importorskip("pmdarima")
+
+START = datetime(2025, 1, 1)
+
+
+def series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    values = np.zeros(n)
+    for i in range(1, n):
+        values[i] = 0.7 * values[i - 1] + rng.normal()
+    return 100 + values
+
+
+TRAINING = series(120, seed=1)
+
+
+def points(values, offset=0):
+    return [
+        {'timestamp': (START + timedelta(minutes=10 * (offset + i))).isoformat(), 'latency': float(v)}
+        for i, v in enumerate(values)
+    ]
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    monkeypatch.setattr(ForecastPipeline, 'model_path', lambda self, metric: str(tmp_path / f"{metric}.pkl"))
+    pipeline = ForecastPipeline(
+        storage=SQLiteBackend(str(tmp_path / "atom.db")), cache=MetricsCache(), target_caches={}, max_workers=1
+    )
+    pipeline.models = {'latency': pm.ARIMA(order=(1, 0, 0)).fit(TRAINING)}
+    yield pipeline
+    pipeline.stop_pipeline()
+
+
+def test_new_observations_extend_the_model_state(pipeline):
+    live = series(80, seed=2)
+    pipeline.cache.extend(points(live))
+    state = pipeline.models['latency'].arima_res_
+
+    pipeline.update_models()
+
+    # The first update brings in only the newest ACTUAL_STEPS points
+    updated = pipeline.models['latency'].arima_res_
+    assert updated.nobs == ForecastPipeline.ACTUAL_STEPS  # Observations added to the state
+    assert pipeline.model_until['latency'] == to_epoch(points(live)[-1]['timestamp'])
+    assert updated.params.tolist() == state.params.tolist()  # No refit
+
+    more = series(5, seed=3)
+    pipeline.cache.extend(points(more, offset=80))
+    pipeline.update_models()
+    pipeline.update_models()  # Nothing new
+
+    assert pipeline.models['latency'].arima_res_.nobs == 5
+    # Same as conditioning the fitted parameters on the whole history at once
+    history = np.concatenate([TRAINING, live[-ForecastPipeline.ACTUAL_STEPS:], more])
+    assert np.allclose(pipeline.models['latency'].arima_res_.forecast(3), state.apply(history).forecast(3))
+
+
+def test_refit_model_is_swapped_in_and_saved(pipeline):
+    refit = pm.ARIMA(order=(1, 0, 0)).fit(series(200, seed=4))
+    future = Future()
+    future.set_result(('latency', refit, 1234.0))
+    pipeline.executor_stale = False
+
+    pipeline.swap_model(future)
+
+    assert pipeline.models['latency'] is refit
+    assert pipeline.model_until['latency'] == 1234.0
+    assert pipeline.executor_stale
+    with open(pipeline.model_path('latency'), 'rb') as f:
+        assert pickle.load(f).arima_res_.params.tolist() == refit.arima_res_.params.tolist()
+
+
+def test_failed_refit_keeps_the_current_model(pipeline):
+    model = pipeline.models['latency']
+    future = Future()
+    future.set_exception(ValueError("did not converge"))
+
+    pipeline.swap_model(future)
+
+    assert pipeline.models['latency'] is model
+    assert 'latency' not in pipeline.model_until
+
+
+def test_refit_needs_enough_points(pipeline):
+    pipeline.cache.extend(points(series(ForecastPipeline.MIN_REFIT_POINTS - 1)))
+
+    assert pipeline.schedule_refit()
+    assert pipeline.refit_futures == []
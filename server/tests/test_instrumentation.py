@@ -0,0 +1,64 @@
+import types
+from prometheus_client import CollectorRegistry, Gauge
+import app as server_app
+import instrumentation
+from instrumentation import end_request, server_timing, start_request, storage_operation, timed
+from storage import SQLiteBackend
+
+
+def sample(name, **labels):
+    return instrumentation.registry.get_sample_value(name, labels) or 0
+
+
+def test_timed_blocks_add_to_the_request():
+    start_request()
+    with timed(instrumentation.llm_seconds, 'llm', model='m', stream='false'):
+        pass
+    with timed(instrumentation.pipeline_seconds):
+        pass
+    total, timings = end_request()
+
+    assert list(timings) == ['llm']
+    assert 0 <= timings['llm'] <= total
+    assert end_request() == (0.0, {})  # Cleared
+    assert server_timing(0.8453, {'storage': 0.0012, 'llm': 0.84}) == "storage;dur=1.2, llm;dur=840.0, total;dur=845.3"
+
+
+def test_storage_calls_are_counted_once(tmp_path):
+    class Backend(SQLiteBackend):
+        name = 'test'
+
+        # Nested call to another timed method
+        @storage_operation('write_rollups')
+        def write_rollups(self, tier, rows):
+            self.save_documents('rollups_' + tier, {str(row['bucket']): row for row in rows})
+
+    storage = Backend(str(tmp_path / "atom.db"))
+    count = sample('atom_storage_operation_seconds_count', backend='test', operation='save_documents')
+
+    storage.write_rollups('1h', [{'bucket': 0}, {'bucket': 3600}, {'bucket': 7200}])
+
+    assert sample('atom_storage_operation_seconds_count', backend='test', operation='write_rollups') == 1
+    assert sample('atom_storage_operation_seconds_count', backend='test', operation='save_documents') == count
+    assert sample('atom_storage_batch_size_sum', backend='test', operation='write_rollups') == 3
+
+
+def test_internal_metrics_endpoint(monkeypatch):
+    collector_registry = CollectorRegistry()
+    Gauge('cpu_usage_percent', 'CPU usage', registry=collector_registry).set(42)
+    monkeypatch.setattr(server_app, 'metrics_service', types.SimpleNamespace(registry=collector_registry))
+    monkeypatch.setattr(server_app, 'SERVER_TIMING', True)
+    client = server_app.app.test_client()
+
+    response = client.get('/internal/metrics')
+    body = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    assert 'cpu_usage_percent 42.0' in body
+    assert 'atom_collector_tick_seconds_bucket' in body
+    assert response.headers['Server-Timing'].startswith('total;dur=')
+
+    assert 'atom_http_request_seconds_count{endpoint="/internal/metrics",method="GET",status="200"}' in (
+        client.get('/internal/metrics').get_data(as_text=True)
+    )
@@ -0,0 +1,38 @@
+import os
+from metric_writer import MetricWriter
+
+
+class FailingStorage:
+    def write_points(self, collection, docs):
+        raise ConnectionError("backend down")
+
+
+class ListStorage:
+    def __init__(self):
+        self.points = []
+
+    def write_points(self, collection, docs):
+        self.points.extend(docs)
+
+
+def test_failed_flush_leaves_the_spool_untouched(tmp_path):
+    spool = str(tmp_path / "spool.jsonl")
+    writer = MetricWriter(FailingStorage(), spool_path=spool)
+    writer.write({'timestamp': '2025-01-01T00:00:00', 'latency': 100.0})
+    mtime = os.stat(spool).st_mtime_ns
+    os.utime(spool, ns=(mtime - 10**9, mtime - 10**9))
+
+    assert writer.flush() == 0
+    assert os.stat(spool).st_mtime_ns == mtime - 10**9
+    assert not os.path.exists(spool + ".tmp")
+
+
+def test_spool_is_replayed_and_removed_once_committed(tmp_path):
+    spool = str(tmp_path / "spool.jsonl")
+    MetricWriter(FailingStorage(), spool_path=spool).write({'timestamp': '2025-01-01T00:00:00', 'latency': 1.0})
+
+    storage = ListStorage()
+    writer = MetricWriter(storage, spool_path=spool)
+    assert writer.flush() == 1
+    assert storage.points[0]['created_at'].isoformat().startswith('2025-01-01T00:00:00')
+    assert not os.path.exists(spool)
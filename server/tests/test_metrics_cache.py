@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta, timezone
+
+from metrics_cache import MetricsCache
+from storage import SQLiteBackend
+
+START = datetime(2025, 1, 1)
+
+
+def point(i, **values):
+    return {
+        'id': f"p{i}",
+        'created_at': (START + timedelta(minutes=i)).astimezone(timezone.utc),
+        'timestamp': (START + timedelta(minutes=i)).isoformat(),
+        'latency': 100.0 + i,
+        **values,
+    }
+
+
+def test_points_keep_their_id_and_created_at():
+    cache = MetricsCache(capacity=4)
+    for i in range(7):  # Compacts once
+        cache.append(point(i, latency_anomaly=i == 6))
+
+    assert cache.latest(2) == [point(6, latency_anomaly=True), point(5, latency_anomaly=False)]
+
+    cache.extend([point(3)])  # Out of order: rebuilt from the merged points
+    assert [doc['id'] for doc in cache.latest(10)] == ['p6', 'p5', 'p4', 'p3']
+    assert cache.latest(1)[0]['created_at'] == point(6)['created_at']
+
+
+def test_points_without_bookkeeping_stay_bare():
+    cache = MetricsCache()
+    cache.append({'timestamp': START.isoformat(), 'cpu': 12.5})
+
+    assert cache.latest() == [{'timestamp': START.isoformat(), 'cpu': 12.5}]
+
+
+def test_warm_from_sqlite_keeps_the_stored_fields(tmp_path):
+    storage = SQLiteBackend(str(tmp_path / "atom.db"))
+    storage.write_points('metrics', [point(i) for i in range(3)])
+    storage.write_points('metrics', [{'timestamp': point(3)['timestamp'], 'latency': 103.0}])
+
+    cache = MetricsCache()
+    cache.warm(storage)
+    latest = cache.latest()
+
+    assert [doc['id'] for doc in latest] == ['4', 'p2', 'p1', 'p0']  # Row ID when the point has none
+    assert latest[1]['created_at'] == point(2)['created_at']
+    assert 'created_at' not in latest[0]
@@ -0,0 +1,110 @@
+import threading
+import time
+import pytest
+import metrics_collector
+from metrics_cache import MetricsCache
+from metrics_collector import MetricsCollector
+from storage import SQLiteBackend
+
+VALUES = {'latency': 120.0, 'error_rate': 1.5, 'cpu': 40.0, 'memory': 55.0, 'request_time': 180.0}
+QUERY_METRICS = {query: metric for metric, query in MetricsCollector.METRIC_QUERIES.items()}
+TARGET_QUERY_METRICS = {
+    query.replace('{by}', 'job'): metric for metric, query in MetricsCollector.TARGET_METRIC_QUERIES.items()
+}
+
+
+class FakePrometheus:
+    """Instant-query results for the collector's _query, optionally slow or hung per metric."""
+
+    def __init__(self, targets=(), delay=0.0, hung=()):
+        self.targets = targets  # Label dicts of the series a by-target query returns
+        self.delay = delay
+        self.hung = hung
+        self.release = threading.Event()
+        self.queries = []
+
+    def __call__(self, query, timeout):
+        self.queries.append(query)
+        metric = QUERY_METRICS.get(query)
+        if metric is None:  # Per-target query
+            metric = TARGET_QUERY_METRICS[query]
+            return [{'metric': labels, 'value': [0, str(VALUES[metric] + i)]} for i, labels in enumerate(self.targets)]
+        if metric in self.hung:
+            self.release.wait(timeout)
+        time.sleep(self.delay)
+        return [{'metric': {}, 'value': [0, str(VALUES[metric])]}]
+
+
+@pytest.fixture
+def make_collector(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics_collector, 'target_caches', {})
+    collectors = []
+
+    def make(prometheus, **kwargs):
+        collector = MetricsCollector(
+            storage=SQLiteBackend(str(tmp_path / "atom.db")),
+            cache=MetricsCache(),
+            spool_path=str(tmp_path / "spool.jsonl"),
+            **kwargs
+        )
+        collector._query = prometheus
+        collectors.append((collector, prometheus))
+        return collector
+
+    yield make
+    for collector, prometheus in collectors:
+        prometheus.release.set()
+        collector.query_executor.shutdown()
+
+
+def test_queries_run_concurrently(make_collector):
+    collector = make_collector(FakePrometheus(delay=0.2))
+
+    start = time.perf_counter()
+    metrics = collector.collect_metrics()
+
+    assert time.perf_counter() - start < 0.2 * len(VALUES) / 2
+    assert {metric: metrics[metric] for metric in VALUES} == VALUES
+    assert set(collector.query_timings) == set(VALUES)
+
+
+def test_slow_query_is_cut_off_at_the_tick_deadline(make_collector):
+    collector = make_collector(FakePrometheus(hung={'cpu'}), tick_deadline=0.3)
+
+    start = time.perf_counter()
+    metrics = collector.collect_metrics()
+
+    assert time.perf_counter() - start < 1
+    assert collector.query_timings['cpu'] is None
+    assert 20 <= metrics['cpu'] <= 80  # Placeholder value for the missed query
+    assert metrics['latency'] == VALUES['latency']
+
+
+def test_points_are_scored_per_target(make_collector):
+    targets = [{'job': 'api'}, {'job': 'worker/1'}]
+    collector = make_collector(FakePrometheus(targets=targets), target_labels=['job'])
+
+    metrics = collector.collect_metrics()
+    assert metrics['targets'] == {
+        'job=api': VALUES,
+        'job=worker%2F1': {metric: value + 1 for metric, value in VALUES.items()},
+    }
+    assert any('sum by (job)' in query for query in collector._query.queries)
+
+    collector.add_data_point()
+    assert set(collector.target_caches) == {'job=api', 'job=worker%2F1'}
+    assert collector.target_caches['job=api'].latest(1)[0]['latency'] == VALUES['latency']
+    assert collector.target_writer.flush() == 0  # Written as the tick's one document
+
+    stored = collector.storage.latest_points('target_metrics')
+    assert len(stored) == 1
+    assert stored[0]['targets']['job=worker%2F1']['cpu'] == VALUES['cpu'] + 1
+    assert 'risk_score' in stored[0]['targets']['job=api']
+
+
+def test_without_target_labels_only_totals_are_queried(make_collector):
+    collector = make_collector(FakePrometheus())
+
+    assert collector.collect_metrics()['targets'] == {}
+    assert len(collector._query.queries) == len(VALUES)
+    assert collector.target_writer is None
@@ -0,0 +1,79 @@
+import json
+import pytest
+from flask import Flask, request
+from response_cache import ResponseCache
+
+
+@pytest.fixture
+def served():
+    """A /data endpoint served through a ResponseCache, and the build calls it made."""
+    app = Flask(__name__)
+    cache = ResponseCache(dumps=json.dumps, max_entries=2)
+    data = {'value': 1}
+    builds = []
+
+    def build():
+        builds.append(request.args.get('n', ''))
+        return dict(data) if data else None
+
+    @app.route('/data')
+    def endpoint():
+        cached = cache.get('metrics', request.query_string.decode(), build)
+        if cached is None:
+            return {'error': 'no data'}, 404
+        return cached.to_response(request)
+
+    return app.test_client(), cache, data, builds
+
+
+def test_etag_revalidation(served):
+    client, cache, data, builds = served
+
+    first = client.get('/data')
+    assert first.status_code == 200 and first.json == {'value': 1}
+    assert first.headers['Cache-Control'] == 'no-cache'
+    etag = first.headers['ETag']
+
+    again = client.get('/data', headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.data == b''
+    since = client.get('/data', headers={'If-Modified-Since': first.headers['Last-Modified']})
+    assert since.status_code == 304
+    assert builds == ['']
+
+    data['value'] = 2
+    cache.invalidate('metrics')
+    changed = client.get('/data', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.json == {'value': 2}
+    assert changed.headers['ETag'] != etag
+    assert builds == ['', '']
+
+
+def test_entries_are_per_query_and_bounded(served):
+    client, cache, data, builds = served
+
+    for n in ['1', '2', '1', '3', '1', '2']:
+        client.get(f'/data?n={n}')
+
+    # n=1 stays the most recently used; n=2 was evicted by n=3
+    assert builds == ['1', '2', '3', '2']
+    assert len(cache.entries) == 2
+
+
+def test_nothing_to_serve_is_not_cached(served):
+    client, cache, data, builds = served
+    data.clear()
+
+    assert client.get('/data').status_code == 404
+    assert client.get('/data').status_code == 404
+    assert builds == ['', '']
+
+
+def test_body_built_from_changed_data_is_not_kept():
+    cache = ResponseCache(dumps=json.dumps)
+
+    def build():
+        cache.invalidate('metrics')  # A point lands while the body is being built
+        return {'value': 1}
+
+    assert cache.get('metrics', '', build).body == b'{"value": 1}'
+    assert cache.entries == {}
@@ -0,0 +1,83 @@
+import threading
+from datetime import datetime, timedelta, timezone
+import pytest
+from storage import SQLiteBackend, create_storage
+
+START = datetime(2025, 1, 1)
+
+
+def point(i, **values):
+    return {'timestamp': (START + timedelta(minutes=10 * i)).isoformat(), 'latency': 100.0 + i, **values}
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return SQLiteBackend(str(tmp_path / "atom.db"))
+
+
+def test_points_round_trip(storage):
+    created = datetime(2025, 1, 2, tzinfo=timezone.utc)
+    storage.write_points('metrics', [point(i) for i in (2, 0, 1)])
+    storage.write_points('metrics', [point(3, created_at=created, targets={'job=api': {'cpu': 1.5}})])
+    storage.write_points('target_metrics', [point(9)])
+
+    latest = storage.latest_points('metrics', 2)
+    assert [p['latency'] for p in latest] == [103.0, 102.0]
+    assert latest[0]['created_at'] == created.isoformat()
+    assert latest[0]['targets'] == {'job=api': {'cpu': 1.5}}
+
+    in_range = storage.range_points('metrics', START + timedelta(minutes=10), START + timedelta(minutes=20))
+    assert in_range == [point(1), point(2)]
+    assert storage.range_points('target_metrics', START, START + timedelta(days=1)) == [point(9)]
+    assert storage.latest_points('missing') == []
+
+
+def test_documents_round_trip(storage):
+    assert storage.get_document('forecasts', 'latest') is None
+
+    storage.save_document('forecasts', 'latest', {'generated_at': START, 'values': [1.0, 2.0]})
+    assert storage.get_document('forecasts', 'latest') == {'generated_at': START.isoformat(), 'values': [1.0, 2.0]}
+
+    storage.save_documents('forecasts', {'latest': {'values': [3.0]}, 'previous': {'values': [1.0]}})
+    assert storage.get_document('forecasts', 'latest') == {'values': [3.0]}
+    assert storage.get_document('forecasts', 'previous') == {'values': [1.0]}
+
+
+def test_rollups_are_upserted_by_bucket(storage):
+    bucket = START.timestamp()
+    storage.write_rollups('1h', [{'bucket': bucket, 'count': 1}, {'bucket': bucket + 3600, 'count': 2}])
+    storage.write_rollups('1h', [{'bucket': bucket, 'count': 6}])
+    storage.write_rollups('1d', [{'bucket': bucket, 'count': 24}])
+
+    assert storage.range_rollups('1h', START, START + timedelta(hours=1)) == [
+        {'bucket': bucket, 'count': 6}, {'bucket': bucket + 3600, 'count': 2}
+    ]
+    assert storage.range_rollups('1h', START + timedelta(hours=2), START + timedelta(hours=3)) == []
+
+
+def test_data_survives_reopening(tmp_path):
+    path = str(tmp_path / "atom.db")
+    SQLiteBackend(path).write_points('metrics', [point(0)])
+    assert SQLiteBackend(path).range_points('metrics', START, START) == [point(0)]
+
+
+def test_threads_use_their_own_connections(storage):
+    def write(worker):
+        storage.write_points('metrics', [point(worker * 100 + i) for i in range(50)])
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(storage.range_points('metrics', START, START + timedelta(days=30))) == 200
+
+
+def test_create_storage(tmp_path, monkeypatch):
+    monkeypatch.setenv("ATOM_STORAGE", "sqlite")
+    monkeypatch.setenv("ATOM_SQLITE_PATH", str(tmp_path / "env.db"))
+    assert create_storage().path == str(tmp_path / "env.db")
+    assert create_storage("SQLite", sqlite_path=str(tmp_path / "a.db")).path == str(tmp_path / "a.db")
+    with pytest.raises(ValueError):
+        create_storage("postgres")
@@ -1,14 +1,64 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+from typing import List
+
+from atom_common.semantic_cache import SemanticCache
+from fastapi import FastAPI, HTTPException, Request, Response
 from pydantic import BaseModel
 
-from sql_agent.crew import SqlAgentCrew
+from sql_agent.crew_pool import CrewPool, PoolBusyError
+from sql_agent.db import get_data_version, query_context, result_cache_stats
+from sql_agent.instrumentation import exposition, observe_answer, request_timing, server_timing
+from sql_agent.router import IntentRouter
+
+# SQL_AGENT_LOG_LEVEL=DEBUG logs every query the agent runs
+logging.basicConfig(format="%(levelname)s:     %(name)s: %(message)s")
+logging.getLogger("sql_agent").setLevel(os.getenv("SQL_AGENT_LOG_LEVEL", "INFO").upper())
+
+# Pre-built crews; the pool size is also the number of queries run at once
+crew_pool = CrewPool(
+    size=int(os.getenv("CREW_POOL_SIZE", "4")),
+    max_waiting=int(os.getenv("CREW_POOL_MAX_WAITING", "32")),
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await crew_pool.start()
+    yield
+
 
 app = FastAPI(
     title="SRE System Explainer API",
     description="Ask questions about system behavior using historical metrics data",
-    version="1.0"
+    version="1.0",
+    lifespan=lifespan
 )
 
+# Set SQL_AGENT_SERVER_TIMING=1 to add a Server-Timing header (sql, queue, crew, total)
+SERVER_TIMING = os.getenv("SQL_AGENT_SERVER_TIMING", "").lower() in ("1", "true", "yes")
+
+
+@app.middleware("http")
+async def timing_header(request: Request, call_next):
+    started = time.perf_counter()
+    with request_timing() as timings:
+        response = await call_next(request)
+    if SERVER_TIMING:
+        response.headers["Server-Timing"] = server_timing(time.perf_counter() - started, timings)
+    return response
+
+
+# Answers reused until the database changes (or the TTL passes)
+answer_cache = SemanticCache()
+
+# Stock questions (e.g. "average cpu over the last 6 hours") answered with fixed SQL
+router = IntentRouter()
+
 class QueryRequest(BaseModel):
     question: str
 
@@ -16,29 +66,76 @@ class QueryRequest(BaseModel):
 class QueryResponse(BaseModel):
     question: str
     answer: str
+    queries: List[str] = []
+    routed: bool = False
 
 
 @app.post("/query", response_model=QueryResponse)
-def query_system(q: QueryRequest):
+async def query_system(q: QueryRequest):
     """
     Accepts a natural-language SRE question and returns
     a data-backed explanation from the CrewAI system.
     """
+    started = time.perf_counter()
     try:
-        crew = SqlAgentCrew().crew()
+        with query_context() as ctx:
+            answer = await asyncio.to_thread(router.answer, q.question)
+        if answer is not None:
+            observe_answer("router", time.perf_counter() - started)
+            return {"question": q.question, "answer": answer, "queries": ctx["queries"], "routed": True}
 
-        result = crew.kickoff(
-            inputs={
-                "question": q.question
-            }
-        )
+        data_version = get_data_version()
+        answer = answer_cache.get(q.question, data_version)
+        if answer is not None:
+            observe_answer("cache", time.perf_counter() - started)
+            return {"question": q.question, "answer": answer}
 
+        # SQL run for this request only, even with other queries in flight
+        with query_context() as ctx:
+            result = await crew_pool.kickoff(
+                inputs={
+                    "question": q.question
+                }
+            )
+
+        answer_cache.put(q.question, data_version, str(result))
+        observe_answer("crew", time.perf_counter() - started)
         return {
                 "question": q.question,
-              "answer": str(result)
+              "answer": str(result),
+              "queries": ctx["queries"]
         }
+    except PoolBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
               detail=f"Failed to process query: {str(e)}"
         )
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Hit/miss counts of the answer cache and the SQL result cache."""
+    return {"answers": answer_cache.stats(), "sql_results": result_cache_stats()}
+
+
+@app.get("/internal/metrics")
+def internal_metrics():
+    """SQL timings, cache lookups and answer sources in Prometheus text format."""
+    body, content_type = exposition()
+    if body is None:
+        raise HTTPException(status_code=404, detail="Install prometheus-client to enable /internal/metrics")
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/router/stats")
+def router_stats():
+    """Share of questions answered by the intent router, and how fast."""
+    return router.stats()
+
+
+@app.get("/pool/stats")
+def pool_stats():
+    """Crew pool usage: available/in-use crews, queue depth and wait times."""
+    return crew_pool.stats()
@@ -31,6 +31,7 @@ class SqlAgentCrew():
             ],
             verbose=True,
             max_iter=3,
+            cache=False,  # Tool results depend on the data version; run_sql caches them itself
         )
         
     @task
@@ -47,5 +48,8 @@ class SqlAgentCrew():
             agents=self.agents,   
             tasks=self.tasks,     
             process=Process.sequential,
-            verbose=True
+            verbose=True,
+            # Pooled crews outlive ingests: a crew-level tool cache would replay
+            # stale run_sql/get_schema_info output across kickoffs
+            cache=False,
         )
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Optional, Set
+
+from .instrumentation import add_timing
+
+if TYPE_CHECKING:
+    from crewai import Crew
+
+logger = logging.getLogger(__name__)
+
+
+class PoolBusyError(Exception):
+    """Raised when too many requests are already waiting for a crew."""
+
+
+def build_crew() -> "Crew":
+    from .crew import SqlAgentCrew
+
+    return SqlAgentCrew().crew()
+
+
+def reset_crew(crew: "Crew") -> None:
+    """
+    Clear per-run state so the next question starts clean. Crews are built
+    with tool caching off (see SqlAgentCrew.crew), so no tool results carry over.
+    """
+    for task in crew.tasks:
+        task.output = None
+    for agent in crew.agents:
+        if hasattr(agent, "tools_results"):
+            agent.tools_results = []
+
+
+class CrewPool:
+    """
+    Fixed set of pre-built crews, checked out one per request.
+    Building a crew parses the YAML configs and creates the LLM, agent and
+    tools; doing it once at startup takes that off the request path. The
+    pool size is also the concurrency limit: further requests queue (up to
+    `max_waiting`) until a crew is returned.
+
+    A crew whose run fails or is cancelled is never handed out again: its
+    kickoff thread may still be running it. The pool shrinks by one and a
+    replacement is built in the background.
+    """
+
+    REBUILD_DELAY = 5.0  # Seconds before retrying a failed replacement build; doubles each time
+    MAX_REBUILD_DELAY = 300.0
+
+    def __init__(self, size: int = 4, max_waiting: int = 32,
+                 factory: Callable[[], "Crew"] = build_crew, rebuild_delay: float = REBUILD_DELAY):
+        self.size = size
+        self.max_waiting = max_waiting
+        self.factory = factory
+        self.rebuild_delay = rebuild_delay
+        self._crews: Optional[asyncio.Queue] = None
+        self._rebuilds: Set[asyncio.Task] = set()
+
+        self.waiting = 0
+        self.in_use = 0
+        self.checkouts = 0
+        self.served = 0
+        self.rejected = 0
+        self.failed = 0
+        self.rebuilt = 0
+        self.rebuild_failed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+
+    async def start(self) -> None:
+        """Build every crew up front (in worker threads; construction is blocking)."""
+        crews = await asyncio.gather(*(asyncio.to_thread(self.factory) for _ in range(self.size)))
+        self._crews = asyncio.Queue()
+        for crew in crews:
+            self._crews.put_nowait(crew)
+        logger.info("Crew pool ready with %d crews", self.size)
+
+    @asynccontextmanager
+    async def checkout(self) -> AsyncIterator["Crew"]:
+        if self.waiting >= self.max_waiting and self._crews.empty():
+            self.rejected += 1
+            raise PoolBusyError("Too many queued queries, try again shortly.")
+
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            crew = await self._crews.get()
+        finally:
+            self.waiting -= 1
+        waited = time.perf_counter() - started
+        add_timing("queue", waited)
+        self.checkouts += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+        self.in_use += 1
+        healthy = False
+        try:
+            yield crew
+            healthy = True
+        finally:
+            self.in_use -= 1
+            if healthy:
+                reset_crew(crew)
+                self._crews.put_nowait(crew)
+            else:
+                self._replace()
+
+    def _replace(self) -> None:
+        """Build a crew for one that was dropped, off the request path."""
+        task = asyncio.get_running_loop().create_task(self._rebuild())
+        self._rebuilds.add(task)
+        task.add_done_callback(self._rebuilds.discard)
+
+    async def _rebuild(self) -> None:
+        delay = self.rebuild_delay
+        while True:
+            try:
+                crew = await asyncio.to_thread(self.factory)
+                break
+            except Exception as e:
+                self.rebuild_failed += 1
+                logger.warning("Crew rebuild failed, retrying in %gs: %s", delay, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.MAX_REBUILD_DELAY)
+        self.rebuilt += 1
+        self._crews.put_nowait(crew)
+
+    async def kickoff(self, inputs: Dict[str, Any]) -> Any:
+        """Run one question on a pooled crew without blocking the event loop."""
+        async with self.checkout() as crew:
+            started = time.perf_counter()
+            try:
+                result = await asyncio.to_thread(crew.kickoff, inputs=inputs)
+            except BaseException:  # Including cancellation: the crew may still be running
+                self.failed += 1
+                raise
+            finally:
+                add_timing("crew", time.perf_counter() - started)
+                self.total_run += time.perf_counter() - started
+            self.served += 1
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        runs = self.served + self.failed
+        return {
+            "size": self.size,
+            "available": self._crews.qsize() if self._crews else 0,
+            "in_use": self.in_use,
+            "rebuilding": len(self._rebuilds),
+            "waiting": self.waiting,
+            "served": self.served,
+            "failed": self.failed,
+            "rebuilt": self.rebuilt,
+            "rebuild_failed": self.rebuild_failed,
+            "rejected": self.rejected,
+            "avg_wait_seconds": self.total_wait / self.checkouts if self.checkouts else 0.0,
+            "max_wait_seconds": self.max_wait,
+            "avg_run_seconds": self.total_run / runs if runs else 0.0,
+        }
@@ -1,56 +1,469 @@
+import logging
 import sqlite3
 import os
-from typing import Any, Dict, Optional
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 
-# Store the last query result for reference
-_last_query_result: Optional[Dict[str, Any]] = None
+from .instrumentation import observe_query
 
-# Use absolute path - update this to your actual database location
-DATABASE_PATH = os.path.join(os.path.dirname(__file__), "C:\Karan program\Atom\sql_agent\data\metrics.db")
+logger = logging.getLogger(__name__)
 
-MAX_ROWS = 1000 
+# Results of the current request's queries (see query_context)
+_query_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar("sql_agent_query_context", default=None)
+
+# SQL_AGENT_DB overrides the bundled sql_agent/data/metrics.db
+DATABASE_PATH = os.getenv(
+    "SQL_AGENT_DB",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "data", "metrics.db"))
+)
+
+MAX_ROWS = 1000
+QUERY_TIMEOUT = float(os.getenv("SQL_AGENT_QUERY_TIMEOUT", "5"))  # Seconds per query
+POOL_SIZE = int(os.getenv("SQL_AGENT_POOL_SIZE", "4"))
+PROGRESS_STEPS = 10000  # VM instructions between deadline checks
+RESULT_CACHE_SIZE = int(os.getenv("SQL_AGENT_RESULT_CACHE", "256"))  # Cached query results
+# Cost guard: estimated rows a plan may scan, and sort without an index
+MAX_SCAN_ROWS = int(os.getenv("SQL_AGENT_MAX_SCAN_ROWS", "1000000"))
+MAX_SORT_ROWS = int(os.getenv("SQL_AGENT_MAX_SORT_ROWS", "200000"))
+SCAN_TABLE_PASSES = 4  # Whole-table passes always allowed, however large the table grows
+
+# Read-only connections, reused so their page caches stay warm
+_pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+_pool_created = 0
+_pool_lock = threading.Lock()
+
+# Long-lived connection used only to read PRAGMA data_version, which changes
+# when another connection commits to the database
+_version_conn: Optional[sqlite3.Connection] = None
+_version_lock = threading.Lock()
+
+
+class QueryTimeout(Exception):
+    """Raised when a query runs past its time budget and is interrupted."""
+
+
+# Comments, string literals, quoted identifiers, numbers, words, anything else
+_SQL_TOKEN = re.compile(
+    r"(?P<comment>--[^\n]*|/\*.*?\*/)|(?P<string>'(?:[^']|'')*')|(?P<ident>\"(?:[^\"]|\"\")*\")"
+    r"|(?P<number>\b\d+(?:\.\d*)?(?:[eE][+-]?\d+)?\b|\.\d+\b)|(?P<word>\w+)|(?P<space>\s+)|(?P<other>.)",
+    re.DOTALL
+)
+
+
+def sql_fingerprint(query: str) -> Tuple[str, Tuple[str, ...]]:
+    """
+    (template, literals) for a query: comments dropped, whitespace collapsed,
+    keywords and names lowercased and literals replaced by '?' in the
+    template. Queries that differ only in formatting share a fingerprint;
+    the literals stay part of it, so different values never collide.
+    """
+    parts: List[str] = []
+    literals: List[str] = []
+    for match in _SQL_TOKEN.finditer(query):
+        kind, token = match.lastgroup, match.group()
+        if kind in ("comment", "space"):
+            continue
+        if kind in ("string", "number"):
+            literals.append(token)
+            token = "?"
+        elif kind != "ident":
+            token = token.lower()
+        # A space only where it separates two words ("from metrics", not "cpu > ?")
+        if parts and kind != "other" and (parts[-1][-1].isalnum() or parts[-1][-1] in '?"_'):
+            parts.append(" ")
+        parts.append(token)
+    template = "".join(parts).rstrip(";")
+    return template, tuple(literals)
+
+
+class ResultCache:
+    """
+    LRU cache of query results keyed by SQL fingerprint and the database's
+    data version, so every ingest invalidates it without explicit flushing.
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[Any, ...], Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[Any, ...]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(result)
+
+    def put(self, key: Tuple[Any, ...], result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = dict(result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_result_cache = ResultCache()
+
+# (data version, table -> row count) for plan cost estimates
+_table_rows: Tuple[Optional[str], Dict[str, int]] = (None, {})
+
+
+def _connect() -> sqlite3.Connection:
+    """
+    Open a read-only connection: mode=ro at the file level, query_only at
+    the SQL level, with memory-mapped I/O and a larger page cache.
+    """
+    if not os.path.exists(DATABASE_PATH):
+        raise FileNotFoundError(f"Database not found at: {DATABASE_PATH}")
+    conn = sqlite3.connect(f"file:{DATABASE_PATH}?mode=ro", uri=True, check_same_thread=False)
+    conn.execute("PRAGMA query_only = ON")
+    conn.execute("PRAGMA mmap_size = 268435456")  # 256 MB
+    conn.execute("PRAGMA cache_size = -65536")  # 64 MB
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+
+@contextmanager
+def connection() -> Iterator[sqlite3.Connection]:
+    """Borrow a pooled connection, opening one while fewer than POOL_SIZE exist."""
+    global _pool_created
+
+    try:
+        conn = _pool.get_nowait()
+    except queue.Empty:
+        with _pool_lock:
+            create = _pool_created < POOL_SIZE
+            if create:
+                _pool_created += 1
+        if create:
+            try:
+                conn = _connect()
+            except Exception:
+                with _pool_lock:
+                    _pool_created -= 1
+                raise
+        else:
+            conn = _pool.get()
+
+    try:
+        yield conn
+    finally:
+        conn.set_progress_handler(None, 0)
+        _pool.put(conn)
+
+
+def _check_read_only(query: str) -> Optional[str]:
+    statement = query.strip().lstrip("(").upper()
+    if not statement.startswith(("SELECT", "WITH")):
+        return "Only SELECT queries are allowed."
+    return None
+
+
+@contextmanager
+def _deadline(conn: sqlite3.Connection, timeout: float) -> Iterator[None]:
+    """Interrupt statements run on `conn` in this block after `timeout` seconds, raising QueryTimeout."""
+    deadline = time.monotonic() + timeout
+    conn.set_progress_handler(lambda: time.monotonic() > deadline, PROGRESS_STEPS)
+    try:
+        yield
+    except sqlite3.OperationalError as e:
+        if time.monotonic() > deadline:
+            raise QueryTimeout(f"Query exceeded its {timeout:g}s time budget") from e
+        raise
+    finally:
+        conn.set_progress_handler(None, 0)
+
+
+@contextmanager
+def iter_sql(query: str, params: Sequence[Any] = (), timeout: float = QUERY_TIMEOUT
+             ) -> Iterator[Tuple[List[str], Iterator[tuple]]]:
+    """
+    Run a read-only query and stream its rows:
+
+        with iter_sql("SELECT ...") as (columns, rows):
+            for row in rows: ...
+
+    The whole statement, fetching included, must finish within `timeout`
+    seconds or it is interrupted and QueryTimeout is raised.
+    """
+    error = _check_read_only(query)
+    if error:
+        raise ValueError(error)
+
+    with connection() as conn, _deadline(conn, timeout):
+        cursor = conn.execute(query, params)
+        try:
+            columns = [description[0] for description in cursor.description or ()]
+            yield columns, iter(cursor)
+        finally:
+            cursor.close()
+
+
+@contextmanager
+def query_context() -> Iterator[Dict[str, Any]]:
+    """
+    Collect the results of run_sql calls made while handling one request:
+
+        with query_context() as ctx:
+            crew.kickoff(...)
+        ctx["last"], ctx["queries"]
+
+    Worker threads started with the context copied (asyncio.to_thread does
+    this) record into the same ctx.
+    """
+    ctx: Dict[str, Any] = {"last": None, "queries": []}
+    token = _query_context.set(ctx)
+    try:
+        yield ctx
+    finally:
+        _query_context.reset(token)
+
+
+def _record(query: str, result: Dict[str, Any]) -> None:
+    ctx = _query_context.get()
+    if ctx is not None:
+        ctx["last"] = result
+        ctx["queries"].append(query)
+
+
+def _has_top_level_limit(query: str) -> bool:
+    depth = 0
+    for match in _SQL_TOKEN.finditer(query):
+        token = match.group()
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0 and match.lastgroup == "word" and token.lower() == "limit":
+            return True
+    return False
+
+
+def with_limit(query: str, limit: int = MAX_ROWS + 1) -> str:
+    """The query with a LIMIT appended unless it already has one."""
+    if _has_top_level_limit(query):
+        return query
+    # On its own line, so a trailing -- comment can't swallow it
+    return f"{query.strip().rstrip(';')}\nLIMIT {limit}"
+
+
+def _row_counts(conn: sqlite3.Connection) -> Dict[str, int]:
+    global _table_rows
+
+    version = get_data_version()
+    if _table_rows[0] != version:
+        tables = [name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+        )]
+        counts = {}
+        for table in tables:
+            quoted = table.replace('"', '""')
+            counts[table] = conn.execute(f'SELECT count(*) FROM "{quoted}"').fetchone()[0]
+        _table_rows = (version, counts)
+    return _table_rows[1]
+
+
+# Words that can follow a table name in FROM/JOIN but aren't an alias
+_NOT_ALIAS = {
+    "where", "join", "inner", "left", "right", "full", "cross", "natural", "outer", "on", "using",
+    "group", "order", "limit", "offset", "union", "except", "intersect", "window", "having",
+    "indexed", "not", "returning",
+}
+
+
+def _identifier(kind: Optional[str], token: str) -> Optional[str]:
+    if kind == "word":
+        return token.lower()
+    if kind == "ident":
+        return token[1:-1].replace('""', '"').lower()
+    return None
+
+
+def table_aliases(query: str) -> Dict[str, str]:
+    """
+    Alias -> table name for the tables in a query's FROM and JOIN clauses
+    (unaliased tables map to themselves), lowercased as SQLite compares them.
+    """
+    tokens = [(m.lastgroup, m.group()) for m in _SQL_TOKEN.finditer(query)
+              if m.lastgroup not in ("comment", "space")]
+    aliases: Dict[str, str] = {}
+    i = 0
+    while i < len(tokens):
+        kind, token = tokens[i]
+        i += 1
+        if kind != "word" or token.lower() not in ("from", "join"):
+            continue
+        # FROM a [AS] x, b [AS] y ...; a subquery ends the list
+        while i < len(tokens):
+            table = _identifier(*tokens[i])
+            if table is None:
+                break
+            i += 1
+            alias = table
+            if i < len(tokens) and tokens[i][1].lower() == "as":
+                i += 1
+            if i < len(tokens):
+                name = _identifier(*tokens[i])
+                if name is not None and name not in _NOT_ALIAS:
+                    alias = name
+                    i += 1
+            aliases[alias] = table
+            if i < len(tokens) and tokens[i][1] == ",":
+                i += 1
+                continue
+            break
+    return aliases
+
+
+def estimate_plan(plan: Sequence[Tuple[int, int, int, str]], table_rows: Dict[str, int],
+                  aliases: Optional[Dict[str, str]] = None) -> Tuple[int, int]:
+    """
+    (rows scanned, rows sorted without an index) estimated from EXPLAIN QUERY
+    PLAN output. Full scans under the same parent are nested loops, so their
+    row counts multiply; separate subqueries add up. Plan lines name tables
+    by alias, resolved through `aliases` (see table_aliases).
+    """
+    rows_by_table = {table.lower(): count for table, count in table_rows.items()}
+    largest = max(rows_by_table.values(), default=0)
+    aliases = aliases or {}
+
+    def rows(name: str) -> int:
+        name = name.lower()
+        # Names that aren't tables (e.g. a materialized CTE) are assumed to be as large as the largest
+        return rows_by_table.get(aliases.get(name, name), largest)
+
+    loops: Dict[int, int] = {}
+    sorted_by: Dict[int, bool] = {}
+    extra = 0
+    for _, parent, _, detail in plan:
+        automatic = re.match(r"(?:SCAN|SEARCH) (\w+) USING AUTOMATIC", detail)
+        scan = re.match(r"SCAN (\w+)", detail)
+        if automatic:
+            extra += rows(automatic.group(1))  # Building the temporary index reads its table once
+        elif scan and not detail.startswith("SCAN CONSTANT ROW"):
+            loops[parent] = loops.get(parent, 1) * rows(scan.group(1))
+        elif detail.startswith("USE TEMP B-TREE"):
+            sorted_by[parent] = True
+    scanned = sum(loops.values()) + extra
+    sorted_rows = max((loops.get(parent, 0) for parent in sorted_by), default=0)
+    return scanned, sorted_rows
+
+
+def plan_limits(table_rows: Dict[str, int]) -> Tuple[int, int]:
+    """
+    (scan, sort) row limits for a database. They grow with the largest table,
+    so plain aggregates and sorts over one table keep passing as it grows;
+    what they stop is multiplying tables together.
+    """
+    largest = max(table_rows.values(), default=0)
+    return max(MAX_SCAN_ROWS, SCAN_TABLE_PASSES * largest), max(MAX_SORT_ROWS, largest)
+
+
+def review_query(conn: sqlite3.Connection, query: str) -> Optional[str]:
+    """Reason to reject the query's plan as too expensive, or None."""
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {query}").fetchall()
+    table_rows = _row_counts(conn)
+    scanned, sorted_rows = estimate_plan(plan, table_rows, table_aliases(query))
+    max_scan, max_sort = plan_limits(table_rows)
+    if scanned > max_scan:
+        return (f"Query rejected: its plan scans about {scanned:,} rows (limit {max_scan:,}), "
+                "usually an unfiltered join. Add a join condition, or filter on the indexed timestamp column.")
+    if sorted_rows > max_sort:
+        return (f"Query rejected: it sorts about {sorted_rows:,} rows without an index (limit {max_sort:,}). "
+                "Filter on timestamp first, or aggregate before ORDER BY/GROUP BY.")
+    return None
 
 
 def run_sql(query: str) -> Dict[str, Any]:
     """
     Execute a read-only SQL SELECT query and return results.
     """
-    global _last_query_result
-    
-    print(f"[DEBUG] Database path: {DATABASE_PATH}")
-    print(f"[DEBUG] Database exists: {os.path.exists(DATABASE_PATH)}")
-    print(f"[DEBUG] Executing query: {query}")
-    
-    if not query.strip().upper().startswith("SELECT"):
-        return {"error": "Only SELECT queries are allowed."}
-    
-    if not os.path.exists(DATABASE_PATH):
-        return {"error": f"Database not found at: {DATABASE_PATH}"}    
-    
+    logger.debug("Executing query: %s", query)
+    started = time.perf_counter()
+
+    key = (*sql_fingerprint(query), get_data_version())
+    result = _result_cache.get(key)
+    if result is not None:
+        logger.debug("Result cache hit (%d rows)", result["row_count"])
+        _record(query, result)
+        observe_query("cached", time.perf_counter() - started, cache_hit=True)
+        return result
+
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        cursor.execute(query)
-        
-        columns = [description[0] for description in cursor.description]
-        rows = cursor.fetchmany(MAX_ROWS)  # Limit rows
-        
-        conn.close()
-        
-        _last_query_result = {
+        error = _check_read_only(query)
+        if error:
+            observe_query("rejected", time.perf_counter() - started, cache_hit=False)
+            return {"error": error}
+        # Planning and the row counts it needs share the query's time budget
+        with connection() as conn, _deadline(conn, QUERY_TIMEOUT):
+            rejection = review_query(conn, query)
+        if rejection:
+            logger.info("%s", rejection)
+            observe_query("rejected", time.perf_counter() - started, cache_hit=False)
+            return {"error": rejection}
+
+        with iter_sql(with_limit(query), timeout=QUERY_TIMEOUT) as (columns, rows):
+            fetched = list(islice(rows, MAX_ROWS + 1))
+
+        result = {
             "columns": columns,
-            "rows": rows,
-            "row_count": len(rows),
-            "truncated": len(rows) == MAX_ROWS
+            "rows": fetched[:MAX_ROWS],
+            "row_count": min(len(fetched), MAX_ROWS),
+            "truncated": len(fetched) > MAX_ROWS
         }
-        
-        print(f"[DEBUG] Query result: {_last_query_result}")
-        return _last_query_result
-        
+
+        logger.debug("Query returned %d rows", result["row_count"])
+        _result_cache.put(key, result)
+        _record(query, result)
+        observe_query("ok", time.perf_counter() - started, cache_hit=False)
+        return result
+
     except Exception as e:
-        print(f"[DEBUG] Query error: {str(e)}")
+        logger.warning("Query error: %s", e)
+        observe_query("error", time.perf_counter() - started, cache_hit=False)
         return {"error": str(e)}
 
 
 def get_last_query_result() -> Optional[Dict[str, Any]]:
-    return _last_query_result
+    """The last result in the current query_context, if any."""
+    ctx = _query_context.get()
+    return ctx["last"] if ctx else None
+
+
+def result_cache_stats() -> Dict[str, int]:
+    return _result_cache.stats()
+
+
+def get_data_version() -> str:
+    """
+    Fingerprint of the database contents: changes whenever data is committed
+    or the file is replaced. Used to key cached answers.
+    """
+    global _version_conn
+
+    try:
+        stat = os.stat(DATABASE_PATH)
+    except OSError:
+        return "missing"
+
+    with _version_lock:
+        if _version_conn is None:
+            _version_conn = sqlite3.connect(f"file:{DATABASE_PATH}?mode=ro", uri=True, check_same_thread=False)
+        data_version = _version_conn.execute("PRAGMA data_version").fetchone()[0]
+    return f"{stat.st_ino}:{stat.st_mtime_ns}:{data_version}"
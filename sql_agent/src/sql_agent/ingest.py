@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+"""
+Load metrics into the agent's SQLite database.
+
+    ingest --csv training_data/metrics.csv            # rebuild from an export
+    ingest --csv new_export.csv --append               # add rows newer than the DB
+    ingest --from-api http://localhost:5000            # sync new points from the collector
+"""
+import argparse
+import csv
+import json
+import sqlite3
+import time
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta
+from itertools import chain, islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .db import DATABASE_PATH
+from .rollups import refresh_rollups
+
+TABLE = "metrics"
+BATCH_SIZE = 50000  # Rows per executemany/transaction
+SAMPLE_SIZE = 1000  # Rows inspected to infer column types
+API_WINDOW = timedelta(hours=24)  # Span requested per /metrics call when syncing
+API_METADATA = {"id", "created_at"}  # Storage bookkeeping on /metrics points, not metrics
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _is_timestamp_column(name: str) -> bool:
+    name = name.lower()
+    return name == "timestamp" or name.endswith("_at")
+
+
+def normalize_timestamp(value: Any) -> Optional[str]:
+    """ISO-8601 'YYYY-MM-DD HH:MM:SS', so text order is time order."""
+    if value in (None, ""):
+        return None
+    if isinstance(value, str) and len(value) == 19 and value[10] == " ":
+        return value  # Already normalized (the common case for CSV exports)
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value).isoformat(sep=" ", timespec="seconds")
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).isoformat(sep=" ", timespec="seconds")
+
+
+def infer_types(headers: Sequence[str], rows: Iterable[Sequence[Any]]) -> Dict[str, str]:
+    """
+    SQL type per column from sample rows: TIMESTAMP for time columns,
+    INTEGER or REAL when every non-empty value parses as one, else TEXT.
+    Columns with no values in the sample are REAL. Later rows that don't fit
+    are handled by the converters (see ColumnConverter).
+    """
+    candidates = {h: {"INTEGER", "REAL"} for h in headers}
+    seen = set()
+    for row in rows:
+        for header, value in zip(headers, row):
+            if value in (None, "") or not candidates[header]:
+                continue
+            seen.add(header)
+            if "INTEGER" in candidates[header] and not _is_integer(value):
+                candidates[header].discard("INTEGER")
+            if "REAL" in candidates[header] and not _parses(float, value):
+                candidates[header].discard("REAL")
+
+    types = {}
+    for header in headers:
+        if _is_timestamp_column(header):
+            types[header] = "TIMESTAMP"
+        elif header not in seen:
+            types[header] = "REAL"
+        elif "INTEGER" in candidates[header]:
+            types[header] = "INTEGER"
+        elif "REAL" in candidates[header]:
+            types[header] = "REAL"
+        else:
+            types[header] = "TEXT"
+    return types
+
+
+def _is_integer(value: Any) -> bool:
+    if isinstance(value, str):
+        return _parses(int, value)
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _parses(kind: type, value: Any) -> bool:
+    try:
+        kind(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+# Order in which a column's type is widened when a value doesn't fit
+WIDER = {"INTEGER": "REAL", "REAL": "TEXT"}
+
+
+class ColumnConverter:
+    """
+    Converts one column's values to its SQL type. A value that doesn't fit
+    (e.g. '2.5' in an INTEGER column) widens the column, INTEGER -> REAL ->
+    TEXT, instead of failing the load; `sql_type` is the widest type needed.
+    """
+
+    def __init__(self, sql_type: str):
+        self.declared = sql_type
+        self.sql_type = sql_type
+
+    def __call__(self, value: Any) -> Any:
+        if value in (None, ""):
+            return None
+        if self.sql_type == "TIMESTAMP":
+            return normalize_timestamp(value)
+        if self.sql_type == "INTEGER":
+            if _is_integer(value):
+                return int(value)
+            self.sql_type = WIDER["INTEGER"]
+        if self.sql_type == "REAL":
+            if _parses(float, value):
+                return float(value)
+            self.sql_type = WIDER["REAL"]
+        return str(value)
+
+    @property
+    def widened(self) -> bool:
+        return self.sql_type != self.declared
+
+
+def connect(db_path: str = DATABASE_PATH) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")  # Agent queries keep reading during loads
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def table_columns(conn: sqlite3.Connection, table: str = TABLE) -> Dict[str, str]:
+    return {name: col_type for _, name, col_type, _, _, _ in conn.execute(f"PRAGMA table_info({_quote(table)})")}
+
+
+def create_table(conn: sqlite3.Connection, types: Dict[str, str], table: str = TABLE,
+                 indexed: bool = True) -> None:
+    columns = ", ".join(f"{_quote(name)} {sql_type}" for name, sql_type in types.items())
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {_quote(table)} ({columns})")
+    if indexed:
+        create_index(conn, table)
+
+
+def create_index(conn: sqlite3.Connection, table: str = TABLE) -> None:
+    if "timestamp" in table_columns(conn, table):
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {_quote(table + '_timestamp')} ON {_quote(table)} (timestamp)")
+
+
+def latest_timestamp(conn: sqlite3.Connection, table: str = TABLE) -> Optional[str]:
+    return conn.execute(f"SELECT max(timestamp) FROM {_quote(table)}").fetchone()[0]
+
+
+def insert_rows(conn: sqlite3.Connection, headers: Sequence[str], rows: Iterable[Sequence[Any]],
+                table: str = TABLE, after: Optional[str] = None) -> int:
+    """
+    Convert and insert rows in BATCH_SIZE transactions; with `after`, only rows
+    whose timestamp is later. Returns the number of rows inserted.
+    """
+    inserted, widened = _insert_rows(conn, headers, rows, table, after)
+    for name, (declared, needed) in widened.items():
+        print(f"[DEBUG] Column {name} is {declared} but has {needed} values, stored as given")
+    return inserted
+
+
+def _insert_rows(conn: sqlite3.Connection, headers: Sequence[str], rows: Iterable[Sequence[Any]],
+                 table: str, after: Optional[str]) -> Tuple[int, Dict[str, Tuple[str, str]]]:
+    """insert_rows() plus the columns that needed a wider type: name -> (declared, needed)."""
+    types = table_columns(conn, table)
+    keep = [i for i, h in enumerate(headers) if h in types]
+    names = [headers[i] for i in keep]
+    converters = [ColumnConverter(types[name].upper()) for name in names]
+    ts_index = names.index("timestamp") if "timestamp" in names else None
+
+    sql = (f"INSERT INTO {_quote(table)} ({', '.join(map(_quote, names))}) "
+           f"VALUES ({', '.join('?' for _ in names)})")
+
+    def converted() -> Iterator[Tuple[Any, ...]]:
+        for row in rows:
+            values = tuple(convert(row[i]) for convert, i in zip(converters, keep))
+            if after is None or ts_index is None or (values[ts_index] or "") > after:
+                yield values
+
+    inserted = 0
+    batches = iter(converted())
+    while True:
+        batch = list(islice(batches, BATCH_SIZE))
+        if not batch:
+            break
+        with conn:
+            conn.executemany(sql, batch)
+        inserted += len(batch)
+    widened = {name: (c.declared, c.sql_type) for name, c in zip(names, converters) if c.widened}
+    return inserted, widened
+
+
+def _retype(conn: sqlite3.Connection, table: str, types: Dict[str, str]) -> None:
+    """Copy `table` into a table with the given column types, under the same name."""
+    retyped = table + "__retyped"
+    with conn:
+        conn.execute(f"DROP TABLE IF EXISTS {_quote(retyped)}")
+        create_table(conn, types, retyped, indexed=False)
+        conn.execute(f"INSERT INTO {_quote(retyped)} SELECT * FROM {_quote(table)}")
+    _swap_table(conn, retyped, table, indexed=False)
+
+
+def _swap_table(conn: sqlite3.Connection, new: str, table: str, indexed: bool = True) -> None:
+    """Replace `table` with `new` in one transaction: readers see the old table or the new one."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(f"DROP TABLE IF EXISTS {_quote(table)}")
+        conn.execute(f"ALTER TABLE {_quote(new)} RENAME TO {_quote(table)}")
+        if indexed:
+            create_index(conn, table)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def load_csv(csv_path: str, db_path: str = DATABASE_PATH, table: str = TABLE, append: bool = False) -> int:
+    """
+    Load a CSV export. By default the table (and its rollups) is rebuilt with
+    inferred column types: rows load into a staging table that replaces the
+    old one only once complete, so a failed load leaves it untouched. With
+    append, rows newer than the table's latest timestamp are added and only
+    the rollup buckets they touch are refreshed.
+    """
+    conn = connect(db_path)
+    try:
+        with open(csv_path, newline="") as f:
+            reader = csv.reader(f)
+            headers = next(reader)
+            sample = list(islice(reader, SAMPLE_SIZE))
+            rows = chain(sample, reader)
+
+            after = None
+            if append and table_columns(conn, table):
+                after = latest_timestamp(conn, table)
+                inserted = insert_rows(conn, headers, rows, table, after)
+            else:
+                inserted = _rebuild(conn, headers, rows, infer_types(headers, sample), table)
+        if inserted or after is None:
+            refresh_rollups(conn, table, since=after)
+        conn.execute("PRAGMA optimize")
+        return inserted
+    finally:
+        conn.close()
+
+
+def _rebuild(conn: sqlite3.Connection, headers: Sequence[str], rows: Iterable[Sequence[Any]],
+             types: Dict[str, str], table: str) -> int:
+    """Load rows into a staging table, widen column types the data needed, then swap it in."""
+    staging = table + "__loading"
+    try:
+        with conn:
+            conn.execute(f"DROP TABLE IF EXISTS {_quote(staging)}")
+            create_table(conn, types, staging, indexed=False)
+        inserted, widened = _insert_rows(conn, headers, rows, staging, None)
+        if widened:
+            print(f"[DEBUG] Widened column types: {', '.join(f'{n} {d} -> {t}' for n, (d, t) in widened.items())}")
+            _retype(conn, staging, {**types, **{name: needed for name, (_, needed) in widened.items()}})
+        _swap_table(conn, staging, table)
+        return inserted
+    except BaseException:
+        with conn:
+            conn.execute(f"DROP TABLE IF EXISTS {_quote(staging)}")
+        raise
+
+
+def fetch_points(api_url: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+    """Raw points from the collector API's /metrics range query."""
+    query = urllib.parse.urlencode({
+        "start": start.isoformat(), "end": end.isoformat(), "resolution": "raw", "max_points": 1000000,
+    })
+    with urllib.request.urlopen(f"{api_url.rstrip('/')}/metrics?{query}", timeout=60) as response:
+        return json.load(response)["metrics"]
+
+
+def api_headers(points: Iterable[Dict[str, Any]]) -> List[str]:
+    """
+    Columns for collector API points: the union of their keys, timestamp
+    first, without API_METADATA or nested values (per-target breakdowns).
+    """
+    names, nested = set(), set()
+    for point in points:
+        for name, value in point.items():
+            (nested if isinstance(value, (dict, list)) else names).add(name)
+    return sorted(names - nested - API_METADATA, key=lambda h: (h != "timestamp", h))
+
+
+def sync_from_api(api_url: str, db_path: str = DATABASE_PATH, table: str = TABLE,
+                  since: Optional[datetime] = None) -> int:
+    """
+    Append the collector's points newer than the table's latest timestamp,
+    fetching one API_WINDOW at a time, and refresh the rollups they touch.
+    Creates the table if needed.
+    """
+    conn = connect(db_path)
+    try:
+        exists = bool(table_columns(conn, table))
+        latest = latest_timestamp(conn, table) if exists else None
+        start = datetime.fromisoformat(latest) if latest else (since or datetime.now() - timedelta(days=7))
+        now = datetime.now()
+        synced_after = latest
+
+        inserted = 0
+        while start < now:
+            end = min(start + API_WINDOW, now)
+            points = fetch_points(api_url, start, end)
+            if points:
+                headers = api_headers(points)
+                if not exists:
+                    with conn:
+                        create_table(conn, infer_types(headers, ([p.get(h) for h in headers] for p in points)), table)
+                    exists = True
+                rows = ([p.get(h) for h in headers] for p in points)
+                inserted += insert_rows(conn, headers, rows, table, latest)
+                latest = latest_timestamp(conn, table)
+            start = end
+        if inserted:
+            refresh_rollups(conn, table, since=synced_after)
+        return inserted
+    finally:
+        conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load metrics into the SQL agent's SQLite database")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="CSV export to load")
+    source.add_argument("--from-api", metavar="URL", help="Collector API base URL to sync new points from")
+    parser.add_argument("--append", action="store_true", help="With --csv, add newer rows instead of rebuilding")
+    parser.add_argument("--db", default=DATABASE_PATH, help="Database file")
+    parser.add_argument("--table", default=TABLE)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.csv:
+        inserted = load_csv(args.csv, args.db, args.table, append=args.append)
+    else:
+        inserted = sync_from_api(args.from_api, args.db, args.table)
+    print(f"Inserted {inserted} rows into {args.db} ({time.perf_counter() - started:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+except ImportError:  # Optional: without prometheus-client only Server-Timing works
+    CollectorRegistry = None
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+registry = CollectorRegistry() if CollectorRegistry else None
+if registry is not None:
+    _query_seconds = Histogram(
+        "sql_agent_query_seconds", "run_sql latency by outcome (ok, cached, rejected, error)",
+        ["outcome"], buckets=BUCKETS, registry=registry
+    )
+    _result_cache = Counter(
+        "sql_agent_result_cache_lookups", "SQL result cache lookups", ["result"], registry=registry
+    )
+    _answer_seconds = Histogram(
+        "sql_agent_answer_seconds", "/query latency by answer source (router, cache, crew)",
+        ["source"], buckets=BUCKETS, registry=registry
+    )
+
+# Per-request time by component, for Server-Timing headers
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("sql_agent_timings", default=None)
+
+
+def observe_query(outcome: str, seconds: float, cache_hit: Optional[bool] = None) -> None:
+    """Record one run_sql call; cache_hit is None when the cache wasn't consulted."""
+    add_timing("sql", seconds)
+    if registry is None:
+        return
+    _query_seconds.labels(outcome=outcome).observe(seconds)
+    if cache_hit is not None:
+        _result_cache.labels(result="hit" if cache_hit else "miss").inc()
+
+
+def observe_answer(source: str, seconds: float) -> None:
+    if registry is not None:
+        _answer_seconds.labels(source=source).observe(seconds)
+
+
+def add_timing(component: str, seconds: float) -> None:
+    timings = _timings.get()
+    if timings is not None:
+        timings[component] = timings.get(component, 0.0) + seconds
+
+
+@contextmanager
+def request_timing() -> Iterator[Dict[str, float]]:
+    """
+    Collect component timings for one request. Worker threads started with
+    the context copied (asyncio.to_thread) add to the same dict.
+    """
+    timings: Dict[str, float] = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def server_timing(total: float, timings: Dict[str, float]) -> str:
+    """Server-Timing header value, e.g. 'sql;dur=3.1, total;dur=1840.2'."""
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+    return ", ".join(parts + [f"total;dur={total * 1000:.1f}"])
+
+
+def exposition() -> Tuple[Optional[bytes], str]:
+    """(Prometheus text format, content type); the body is None without prometheus-client."""
+    if registry is None:
+        return None, CONTENT_TYPE_LATEST
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
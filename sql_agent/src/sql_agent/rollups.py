@@ -0,0 +1,116 @@
+import sqlite3
+from itertools import groupby
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+ROLLUP_METRICS = ["latency", "error_rate", "cpu", "memory", "request_time", "risk_score"]
+HIGH_RISK = 0.7  # risk_score at or above this counts as high risk
+
+# Rollup table suffix -> length of the timestamp prefix that forms its bucket
+GRANULARITIES = {"hourly": 13, "daily": 10}
+
+# Shown to the agent with the schema
+TABLE_NOTES = {
+    "hourly": "Pre-aggregated per hour (bucket 'YYYY-MM-DD HH:00:00'). Prefer it over the raw table for spans of hours or more.",
+    "daily": "Pre-aggregated per day (bucket 'YYYY-MM-DD'). Prefer it for spans of days or weeks.",
+}
+COUNT_NOTE = f"anomaly_count: rows with latency_anomaly > 0; high_risk_count: rows with risk_score >= {HIGH_RISK}."
+
+
+def rollup_table(table: str, granularity: str) -> str:
+    return f"{table}_{granularity}"
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _bucket(timestamp: str, granularity: str) -> str:
+    prefix = timestamp[:GRANULARITIES[granularity]]
+    return prefix + ":00:00" if granularity == "hourly" else prefix
+
+
+def rollup_columns(metrics: Sequence[str]) -> List[str]:
+    columns = ["bucket", "samples"]
+    for metric in metrics:
+        columns += [f"{metric}_min", f"{metric}_max", f"{metric}_avg", f"{metric}_p95"]
+    return columns + ["anomaly_count", "high_risk_count"]
+
+
+def _column_type(column: str) -> str:
+    if column == "bucket":
+        return "TIMESTAMP PRIMARY KEY"
+    if column in ("samples", "anomaly_count", "high_risk_count"):
+        return "INTEGER"
+    return "REAL"
+
+
+def _summary(bucket: str, rows: List[tuple], n_metrics: int,
+             anomaly_index: Optional[int], risk_index: Optional[int]) -> tuple:
+    """Rollup row for one bucket; rows are (timestamp, *fields) with the metrics first."""
+    values = np.array([row[1:] for row in rows], dtype=float)  # None -> nan
+    summary: list = [bucket, len(rows)]
+    for i in range(n_metrics):
+        column = values[:, i][~np.isnan(values[:, i])]
+        if len(column):
+            summary += [float(column.min()), float(column.max()), float(column.mean()),
+                        float(np.percentile(column, 95))]
+        else:
+            summary += [None] * 4
+    anomalies = int(np.nansum(values[:, anomaly_index] > 0)) if anomaly_index is not None else None
+    high_risk = int(np.nansum(values[:, risk_index] >= HIGH_RISK)) if risk_index is not None else None
+    return tuple(summary + [anomalies, high_risk])
+
+
+def refresh_rollups(conn: sqlite3.Connection, table: str = "metrics", since: Optional[str] = None) -> None:
+    """
+    Recompute the hourly and daily rollups of `table` from raw rows.
+    With `since` (a timestamp), only buckets from the one containing it
+    onwards are rebuilt, which is all an append touches.
+    """
+    available = {name for _, name, _, _, _, _ in conn.execute(f"PRAGMA table_info({_quote(table)})")}
+    metrics = [m for m in ROLLUP_METRICS if m in available]
+    if "timestamp" not in available or not metrics:
+        if since is None:
+            with conn:  # Nothing to roll up; don't leave rollups of an older table behind
+                for granularity in GRANULARITIES:
+                    conn.execute(f"DROP TABLE IF EXISTS {_quote(rollup_table(table, granularity))}")
+        return
+    extra = [c for c in ("latency_anomaly",) if c in available and c not in metrics]
+    fields = metrics + extra
+    anomaly_index = fields.index("latency_anomaly") if "latency_anomaly" in fields else None
+    risk_index = fields.index("risk_score") if "risk_score" in fields else None
+    columns = rollup_columns(metrics)
+
+    with conn:
+        for granularity in GRANULARITIES:
+            target = rollup_table(table, granularity)
+            definitions = ", ".join(f"{_quote(c)} {_column_type(c)}" for c in columns)
+            start = _bucket(since, granularity) if since else None
+            if not start:
+                # Full rebuild: the raw table's columns may have changed
+                conn.execute(f"DROP TABLE IF EXISTS {_quote(target)}")
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {_quote(target)} ({definitions})")
+            if start:
+                conn.execute(f"DELETE FROM {_quote(target)} WHERE bucket >= ?", (start,))
+
+            where, params = ("WHERE timestamp >= ?", (start,)) if start else ("WHERE timestamp IS NOT NULL", ())
+            rows = conn.execute(
+                f"SELECT timestamp, {', '.join(map(_quote, fields))} FROM {_quote(table)} {where} ORDER BY timestamp",
+                params
+            )
+            summaries = (
+                _summary(bucket, list(group), len(metrics), anomaly_index, risk_index)
+                for bucket, group in groupby(rows, key=lambda row: _bucket(row[0], granularity))
+            )
+            conn.executemany(
+                f"INSERT INTO {_quote(target)} ({', '.join(map(_quote, columns))}) "
+                f"VALUES ({', '.join('?' for _ in columns)})",
+                summaries
+            )
+
+
+def rollup_notes(table: str) -> Dict[str, str]:
+    """Rollup table name -> description, for the schema shown to the agent."""
+    return {rollup_table(table, granularity): f"{note} {COUNT_NOTE}" for granularity, note in TABLE_NOTES.items()}
@@ -0,0 +1,146 @@
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from atom_common.questions import Intent, parse_question
+
+from .db import run_sql
+from .rollups import HIGH_RISK
+
+TABLE = "metrics"
+
+UNITS = {"latency": " ms", "request_time": " ms", "cpu": "%", "memory": "%"}
+LABELS = {"error_rate": "error rate", "request_time": "request time", "risk_score": "risk score"}
+
+
+def fmt(value: float) -> str:
+    return f"{value:.4g}" if abs(value) < 10000 else f"{value:.0f}"
+
+
+def label(metric: str) -> str:
+    return LABELS.get(metric, metric)
+
+
+def value_text(metric: str, value: float) -> str:
+    text = fmt(value) + UNITS.get(metric, "")
+    if metric == "risk_score" and value >= HIGH_RISK:
+        text += f" (high risk, >= {HIGH_RISK})"
+    return text
+
+
+def span_text(intent: Intent, first: Optional[str], last: Optional[str]) -> str:
+    if not intent.window:
+        return f" across all data ({first} to {last})" if first else ""
+    return f" over the {intent.window_label} ({first} to {last})" if first else f" over the {intent.window_label}"
+
+
+def format_answer(intent: Intent, rows: List[Tuple[Any, ...]], first: Optional[str], last: Optional[str],
+                  samples: int = 0) -> str:
+    """
+    Plain-text answer. rows are (timestamp, value) for latest, max, min and
+    spikes, and a single (value,) for avg and p95.
+    """
+    name = label(intent.metric)
+    if not rows or rows[0][-1] is None:
+        return f"No {name} data{span_text(intent, None, None)}."
+    if intent.kind == "latest":
+        timestamp, value = rows[0]
+        return f"Latest {name}: {value_text(intent.metric, value)} at {timestamp}."
+    if intent.kind in ("max", "min"):
+        timestamp, value = rows[0]
+        word = "Highest" if intent.kind == "max" else "Lowest"
+        return f"{word} {name}{span_text(intent, first, last)}: {value_text(intent.metric, value)} at {timestamp}."
+    if intent.kind == "spikes":
+        lines = [f"Top {len(rows)} {name} readings{span_text(intent, first, last)}:"]
+        lines += [f"{i}. {value_text(intent.metric, value)} at {timestamp}"
+                  for i, (timestamp, value) in enumerate(rows, 1)]
+        return "\n".join(lines)
+    word = "Average" if intent.kind == "avg" else "95th percentile"
+    return (f"{word} {name}{span_text(intent, first, last)}: "
+            f"{value_text(intent.metric, rows[0][0])} from {samples} samples.")
+
+
+class IntentRouter:
+    """
+    Answers stock questions (latest/avg/max/min/p95 of one metric over a
+    window, top-N readings) with fixed SQL, so they skip the crew and its
+    LLM round trips. Windows end at the newest row, not the wall clock.
+    """
+
+    def __init__(self, table: str = TABLE):
+        self.table = table
+        self._lock = threading.Lock()
+        self.questions = 0
+        self.routed = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.by_kind: Counter = Counter()
+
+    def answer(self, question: str) -> Optional[str]:
+        """Formatted answer, or None when the question needs the crew."""
+        started = time.perf_counter()
+        intent = parse_question(question)
+        answer = None
+        if intent is not None:
+            try:
+                answer = self._answer(intent)
+            except Exception as e:
+                print(f"[DEBUG] Router error, falling back to the crew: {str(e)}")
+        with self._lock:
+            self.questions += 1
+            if answer is not None:
+                self.routed += 1
+                self.by_kind[intent.kind] += 1
+                self.total_seconds += time.perf_counter() - started
+            elif intent is not None:
+                self.errors += 1
+        return answer
+
+    def _query(self, query: str) -> List[Tuple[Any, ...]]:
+        result = run_sql(query)
+        if "error" in result:
+            raise RuntimeError(result["error"])
+        return result["rows"]
+
+    def _answer(self, intent: Intent) -> str:
+        column, table = f'"{intent.metric}"', f'"{self.table}"'
+        if intent.kind == "latest":
+            rows = self._query(f"SELECT timestamp, {column} FROM {table} "
+                               f"WHERE {column} IS NOT NULL ORDER BY timestamp DESC LIMIT 1")
+            return format_answer(intent, rows, None, None)
+
+        where = f"WHERE {column} IS NOT NULL"
+        if intent.window:
+            newest = self._query(f"SELECT max(timestamp) FROM {table}")[0][0]
+            if newest is None:
+                return format_answer(intent, [], None, None)
+            start = datetime.fromisoformat(newest) - timedelta(seconds=intent.window)
+            where += f" AND timestamp >= '{start.isoformat(sep=' ', timespec='seconds')}'"
+        samples, first, last = self._query(f"SELECT count({column}), min(timestamp), max(timestamp) FROM {table} {where}")[0]
+        if not samples:
+            return format_answer(intent, [], first, last)
+
+        if intent.kind in ("max", "min", "spikes"):
+            order = "ASC" if intent.kind == "min" else "DESC"
+            limit = intent.top if intent.kind == "spikes" else 1
+            rows = self._query(f"SELECT timestamp, {column} FROM {table} {where} ORDER BY {column} {order} LIMIT {limit}")
+        elif intent.kind == "avg":
+            rows = self._query(f"SELECT avg({column}) FROM {table} {where}")
+        else:
+            # Nearest-rank 95th percentile
+            rows = self._query(f"SELECT {column} FROM {table} {where} ORDER BY {column} "
+                               f"LIMIT 1 OFFSET {int(0.95 * (samples - 1))}")
+        return format_answer(intent, rows, first, last, samples)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "questions": self.questions,
+                "routed": self.routed,
+                "errors": self.errors,
+                "hit_rate": self.routed / self.questions if self.questions else 0.0,
+                "avg_routed_ms": 1000 * self.total_seconds / self.routed if self.routed else 0.0,
+                "by_kind": dict(self.by_kind),
+            }
@@ -1,48 +1,190 @@
 import sqlite3
-import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
 
-# Configure your database path here (should match db.py)
-DATABASE_PATH = os.path.join(os.path.dirname(__file__), "C:\Karan program\Atom\sql_agent\data\metrics.db")  
+from .db import DATABASE_PATH, connection, get_data_version
+from .rollups import rollup_notes
+
+LOW_CARDINALITY = 20  # Columns with at most this many distinct values list them
+NUMERIC_SAMPLE = 50  # Values checked to decide whether a TEXT column holds numbers
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _is_number(value: Any) -> bool:
+    try:
+        float(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def _fmt(value: Any) -> str:
+    return f"{value:.6g}" if isinstance(value, float) else str(value)
+
+
+class SchemaCache:
+    """
+    Schema description with per-column statistics, for the get_schema_info tool.
+    Reused while PRAGMA schema_version and data_version are unchanged; when
+    rows are only appended, statistics are updated from the new rows alone.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: Optional[Tuple[int, str]] = None
+        self._tables: Dict[str, Dict[str, Any]] = {}
+        self._text: Optional[str] = None
+
+    def get(self) -> str:
+        with self._lock, connection() as conn:
+            versions = (conn.execute("PRAGMA schema_version").fetchone()[0], get_data_version())
+            if self._text is None or versions != self._versions:
+                if self._versions is None or versions[0] != self._versions[0]:
+                    self._tables = {}  # Tables or columns changed: start over
+                self._refresh(conn)
+                self._text = self._render()
+                self._versions = versions
+            return self._text
+
+    def _refresh(self, conn: sqlite3.Connection) -> None:
+        names = [name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )]
+        print(f"[DEBUG] Found tables: {names}")
+        self._tables = {name: self._table_stats(conn, name, self._tables.get(name)) for name in names}
+
+    def _table_stats(self, conn: sqlite3.Connection, table: str,
+                     cached: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        count, max_rowid = conn.execute(f"SELECT count(*), max(rowid) FROM {_quote(table)}").fetchone()
+        if cached and (count, max_rowid) == (cached["rows"], cached["max_rowid"]):
+            return cached
+
+        if cached and cached["max_rowid"] is not None:
+            # Append-only change: every new row sits above the old max rowid
+            added = conn.execute(
+                f"SELECT count(*) FROM {_quote(table)} WHERE rowid > ?", (cached["max_rowid"],)
+            ).fetchone()[0]
+            if count == cached["rows"] + added:
+                scan = self._scan(conn, table, cached["columns"], cached["max_rowid"])
+                return self._merge(cached, scan, count, max_rowid)
+
+        columns = []
+        for _, name, col_type, _, _, _ in conn.execute(f"PRAGMA table_info({_quote(table)})"):
+            sample = [v for (v,) in conn.execute(
+                f"SELECT {_quote(name)} FROM {_quote(table)} WHERE {_quote(name)} IS NOT NULL LIMIT ?",
+                (NUMERIC_SAMPLE,)
+            )]
+            numeric = name.lower() != "timestamp" and bool(sample) and all(_is_number(v) for v in sample)
+            columns.append({"name": name, "type": col_type or "ANY", "numeric": numeric, "values": {}})
+        scan = self._scan(conn, table, columns, None)
+        return self._merge({"columns": columns}, scan, count, max_rowid)
+
+    def _scan(self, conn: sqlite3.Connection, table: str, columns: List[Dict[str, Any]],
+              after_rowid: Optional[int]) -> Dict[str, Dict[str, Any]]:
+        """One aggregate pass for null counts and ranges, plus value counts of low-cardinality columns."""
+        where, params = ("WHERE rowid > ?", (after_rowid,)) if after_rowid is not None else ("", ())
+        selects = []
+        for column in columns:
+            expr = f"CAST({_quote(column['name'])} AS REAL)" if column["numeric"] else _quote(column["name"])
+            selects += [f"sum({_quote(column['name'])} IS NULL)", f"min({expr})", f"max({expr})"]
+        row = conn.execute(f"SELECT {', '.join(selects)} FROM {_quote(table)} {where}", params).fetchone()
+
+        scan = {}
+        for i, column in enumerate(columns):
+            nulls, low, high = row[3 * i:3 * i + 3]
+            values = None
+            if column["values"] is not None:
+                values = dict(conn.execute(
+                    f"SELECT {_quote(column['name'])}, count(*) FROM {_quote(table)} {where} "
+                    f"GROUP BY 1 LIMIT {LOW_CARDINALITY + 1}", params
+                ).fetchall())
+            scan[column["name"]] = {"nulls": nulls or 0, "min": low, "max": high, "values": values}
+        return scan
+
+    @staticmethod
+    def _merge(cached: Dict[str, Any], scan: Dict[str, Dict[str, Any]],
+               count: int, max_rowid: Optional[int]) -> Dict[str, Any]:
+        columns = []
+        for column in cached["columns"]:
+            new = scan[column["name"]]
+            merged = dict(column)
+            merged["nulls"] = column.get("nulls", 0) + new["nulls"]
+            bounds = [b for b in (column.get("min"), new["min"]) if b is not None]
+            merged["min"] = min(bounds) if bounds else None
+            bounds = [b for b in (column.get("max"), new["max"]) if b is not None]
+            merged["max"] = max(bounds) if bounds else None
+            if column["values"] is not None and new["values"] is not None:
+                values = dict(column["values"])
+                for value, n in new["values"].items():
+                    values[value] = values.get(value, 0) + n
+                merged["values"] = values if len(values) <= LOW_CARDINALITY else None
+            else:
+                merged["values"] = None
+            columns.append(merged)
+        return {"rows": count, "max_rowid": max_rowid, "columns": columns}
+
+    def _render(self) -> str:
+        if not self._tables:
+            return "No tables found in database."
+        notes = {}
+        for table in self._tables:
+            notes.update(rollup_notes(table))
+
+        blocks = []
+        for table, stats in self._tables.items():
+            if table in notes:
+                blocks.append(self._render_rollup(table, stats, notes[table]))
+                continue
+            header = f"Table: {table} ({stats['rows']} rows)"
+            lines = []
+            for column in stats["columns"]:
+                line = f"  - {column['name']} ({column['type']})"
+                details = []
+                if column["name"].lower() == "timestamp" and column["min"] is not None:
+                    header = f"Table: {table} ({stats['rows']} rows, {column['min']} to {column['max']})"
+                elif any(v is not None for v in column["values"] or ()):
+                    values = sorted(
+                        ((v, n) for v, n in column["values"].items() if v is not None), key=lambda item: -item[1]
+                    )
+                    details.append("values " + ", ".join(f"{_fmt(v)} ({n})" for v, n in values))
+                elif column["min"] is not None:
+                    kind = "numbers stored as TEXT, " if column["numeric"] and column["type"].upper() == "TEXT" else ""
+                    details.append(f"{kind}range {_fmt(column['min'])} to {_fmt(column['max'])}")
+                if column["nulls"]:
+                    details.append(f"{column['nulls']} nulls")
+                if details:
+                    line += ": " + "; ".join(details)
+                lines.append(line)
+            blocks.append(header + "\n" + "\n".join(lines))
+        return "\n\n".join(blocks)
+
+    @staticmethod
+    def _render_rollup(table: str, stats: Dict[str, Any], note: str) -> str:
+        """Rollups have dozens of similar columns: list names, not per-column stats."""
+        columns = {column["name"]: column for column in stats["columns"]}
+        bucket = columns.get("bucket", {})
+        span = f", {bucket['min']} to {bucket['max']}" if bucket.get("min") is not None else ""
+        metrics = [name[:-4] for name in columns if name.endswith("_avg")]
+        return (f"Table: {table} ({stats['rows']} rows{span})\n  {note}\n"
+                f"  Columns: bucket, samples, <metric>_min/_max/_avg/_p95 for {', '.join(metrics)}, "
+                "anomaly_count, high_risk_count")
+
+
+_schema_cache = SchemaCache()
 
 
 def load_schema() -> str:
     """
-    Load and return the database schema as a formatted string.
+    Load and return the database schema, with row counts and per-column
+    ranges, null counts and (for low-cardinality columns) values.
     """
     print(f"[DEBUG] Loading schema from: {DATABASE_PATH}")
-    print(f"[DEBUG] Database exists: {os.path.exists(DATABASE_PATH)}")
-    
-    if not os.path.exists(DATABASE_PATH):
-        return f"Error: Database not found at: {DATABASE_PATH}"
-    
+
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
-        
-        print(f"[DEBUG] Found tables: {tables}")
-        
-        schema_info = []
-        
-        for (table_name,) in tables:
-            cursor.execute(f"PRAGMA table_info({table_name});")
-            columns = cursor.fetchall()
-            
-            column_details = []
-            for col in columns:
-                col_id, col_name, col_type, not_null, default_val, is_pk = col
-                column_details.append(f"  - {col_name} ({col_type})")
-            
-            schema_info.append(f"Table: {table_name}\n" + "\n".join(column_details))
-        
-        conn.close()
-        
-        result = "\n\n".join(schema_info) if schema_info else "No tables found in database."
-        print(f"[DEBUG] Schema result: {result}")
-        return result
-        
+        return _schema_cache.get()
     except Exception as e:
         print(f"[DEBUG] Schema error: {str(e)}")
         return f"Error loading schema: {str(e)}"
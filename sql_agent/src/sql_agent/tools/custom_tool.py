@@ -7,8 +7,26 @@ from ..schema import load_schema
 
 
 def truncate_result(result: Any, max_length: int = 2000) -> str:
-    """Truncate result to avoid context overflow."""
-    text = json.dumps(result) if isinstance(result, dict) else str(result)
+    """
+    Encode a result within max_length characters. Query results are encoded
+    row by row and stop at the budget, so large results are never
+    serialized in full.
+    """
+    if isinstance(result, dict) and isinstance(result.get("rows"), list):
+        rows = result["rows"]
+        head = json.dumps({k: v for k, v in result.items() if k != "rows"}, default=str)
+        parts = [head[:-1] + (', "rows": [' if len(head) > 2 else '"rows": [')]
+        length = len(parts[0])
+        for i, row in enumerate(rows):
+            encoded = (", " if i else "") + json.dumps(row, default=str)
+            note = f"]}} ... [truncated: {i} of {len(rows)} rows shown]"
+            if length + len(encoded) + len(note) > max_length:
+                return "".join(parts) + note
+            parts.append(encoded)
+            length += len(encoded)
+        return "".join(parts) + "]}"
+
+    text = json.dumps(result, default=str) if isinstance(result, dict) else str(result)
     if len(text) > max_length:
         return text[:max_length] + "... [truncated]"
     return text
@@ -0,0 +1,84 @@
+import csv
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Import the package from src/ without installing it, and server.py from the project root
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+
+@pytest.fixture
+def agent_db(tmp_path, monkeypatch):
+    """A day of 10-minute points the query layer reads instead of data/metrics.db."""
+    from sql_agent import db, ingest
+
+    csv_path = str(tmp_path / "metrics.csv")
+    start = datetime(2025, 1, 1)
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["timestamp", "latency", "cpu", "memory", "error_rate", "risk_score"])
+        for i in range(144):
+            ts = (start + timedelta(minutes=10 * i)).isoformat(sep=" ")
+            writer.writerow([ts, 100 + i, 20 + i % 50, 40.0, 0.5, i / 144])
+    path = str(tmp_path / "metrics.db")
+    ingest.load_csv(csv_path, path)
+
+    monkeypatch.setattr(db, "DATABASE_PATH", path)
+    monkeypatch.setattr(db, "_pool", queue.LifoQueue())
+    monkeypatch.setattr(db, "_pool_created", 0)
+    monkeypatch.setattr(db, "_version_conn", None)
+    monkeypatch.setattr(db, "_result_cache", db.ResultCache())
+    monkeypatch.setattr(db, "_table_rows", (None, {}))
+    yield path
+    while not db._pool.empty():
+        db._pool.get().close()
+    if db._version_conn is not None:
+        db._version_conn.close()
+
+
+class FakeCrew:
+    """Stands in for a crewai Crew: kickoff waits until released, then answers or raises."""
+
+    def __init__(self, name):
+        self.name = name
+        self.tasks = []
+        self.agents = []
+        self.release = threading.Event()
+        self.release.set()
+        self.running = threading.Event()
+        self.error = None
+
+    def kickoff(self, inputs):
+        self.running.set()
+        self.release.wait(5)
+        if self.error:
+            raise self.error
+        return f"{self.name}: {inputs['question']}"
+
+
+class CrewFactory:
+    """Builds FakeCrews, failing the next `failures` builds."""
+
+    def __init__(self):
+        self.built = []
+        self.failures = 0
+
+    def __call__(self):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("LLM unavailable")
+        crew = FakeCrew(f"crew{len(self.built)}")
+        self.built.append(crew)
+        return crew
+
+
+@pytest.fixture
+def crew_factory():
+    return CrewFactory()
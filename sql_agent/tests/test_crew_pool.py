@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from sql_agent.crew_pool import CrewPool, PoolBusyError
+
+
+async def started_pool(factory, size=1, max_waiting=8):
+    pool = CrewPool(size=size, max_waiting=max_waiting, factory=factory, rebuild_delay=0)
+    await pool.start()
+    return pool
+
+
+async def settle(pool):
+    while pool._rebuilds:
+        await asyncio.sleep(0.01)
+
+
+def test_busy_pool_rejects_beyond_max_waiting(crew_factory):
+    async def scenario():
+        pool = await started_pool(crew_factory, max_waiting=1)
+        async with pool.checkout():
+            waiter = asyncio.create_task(pool.kickoff({"question": "q"}))
+            await asyncio.sleep(0.01)
+            assert pool.stats()["waiting"] == 1
+            with pytest.raises(PoolBusyError):
+                await pool.kickoff({"question": "q"})
+        assert await waiter == "crew0: q"
+        return pool.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected"] == 1
+    assert stats["served"] == 1
+    assert stats["available"] == 1
+
+
+def test_free_crew_is_used_even_with_no_waiting_room(crew_factory):
+    async def scenario():
+        pool = await started_pool(crew_factory, max_waiting=0)
+        return await pool.kickoff({"question": "q"})
+
+    assert asyncio.run(scenario()) == "crew0: q"
+
+
+def test_failed_crew_is_replaced(crew_factory):
+    async def scenario():
+        pool = await started_pool(crew_factory)
+        crew_factory.built[0].error = RuntimeError("tool crashed")
+        with pytest.raises(RuntimeError):
+            await pool.kickoff({"question": "q"})
+        await settle(pool)
+        return pool, await pool.kickoff({"question": "again"})
+
+    pool, answer = asyncio.run(scenario())
+    assert len(crew_factory.built) == 2
+    assert answer == "crew1: again"
+    assert pool.stats()["failed"] == 1
+    assert pool.stats()["available"] == 1
+
+
+def test_cancelled_run_is_never_shared(crew_factory):
+    async def scenario():
+        pool = await started_pool(crew_factory)
+        hung = crew_factory.built[0]
+        hung.release.clear()
+
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(pool.kickoff({"question": "slow"}), 0.05)
+        assert hung.running.is_set() and not hung.release.is_set()
+
+        # The next request gets a fresh crew while the old kickoff is still running
+        answer = await pool.kickoff({"question": "next"})
+        hung.release.set()
+        return pool, answer
+
+    pool, answer = asyncio.run(scenario())
+    assert answer == "crew1: next"
+    assert pool.stats()["failed"] == 1
+    assert pool.stats()["rebuilt"] == 1
+
+
+def test_replacement_build_is_retried(crew_factory):
+    async def scenario():
+        pool = await started_pool(crew_factory)
+        crew_factory.built[0].error = RuntimeError("tool crashed")
+        crew_factory.failures = 2
+        with pytest.raises(RuntimeError):
+            await pool.kickoff({"question": "q"})
+        await settle(pool)
+        return pool.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rebuild_failed"] == 2
+    assert stats["rebuilt"] == 1
+    assert stats["available"] == 1
@@ -0,0 +1,108 @@
+import sqlite3
+
+import pytest
+
+from sql_agent import db
+
+ENDLESS = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT count(*) FROM n"
+
+
+def test_runaway_query_is_interrupted(agent_db, monkeypatch):
+    monkeypatch.setattr(db, "QUERY_TIMEOUT", 0.2)
+
+    with pytest.raises(db.QueryTimeout):
+        with db.iter_sql(ENDLESS, timeout=0.2) as (columns, rows):
+            list(rows)
+    assert "time budget" in db.run_sql(ENDLESS)["error"]
+
+    # The pooled connection is usable again, without the deadline
+    assert db.run_sql("SELECT count(*) FROM metrics")["rows"] == [(144,)]
+
+
+def test_plan_review_shares_the_time_budget(agent_db, monkeypatch):
+    def slow_review(conn, query):
+        conn.execute(ENDLESS).fetchone()
+
+    monkeypatch.setattr(db, "QUERY_TIMEOUT", 0.2)
+    monkeypatch.setattr(db, "review_query", slow_review)
+
+    assert "time budget" in db.run_sql("SELECT count(*) FROM metrics")["error"]
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM metrics",
+    "WITH doomed AS (SELECT 1) DELETE FROM metrics",
+    "SELECT 1; DROP TABLE metrics",
+])
+def test_writes_are_rejected(agent_db, sql):
+    assert "error" in db.run_sql(sql)
+    assert db.run_sql("SELECT count(*) FROM metrics")["rows"] == [(144,)]
+
+
+def test_connections_are_read_only(agent_db):
+    db.get_data_version()
+    with db.connection() as conn:
+        with pytest.raises(sqlite3.OperationalError, match="readonly|read-only"):
+            conn.execute("PRAGMA query_only = OFF")
+            conn.execute("DELETE FROM metrics")
+    with pytest.raises(sqlite3.OperationalError, match="readonly"):
+        db._version_conn.execute("CREATE TABLE scratch (x)")
+
+
+def test_data_version_follows_commits(agent_db):
+    before = db.get_data_version()
+    assert db.get_data_version() == before
+
+    writer = sqlite3.connect(agent_db)
+    writer.execute("DELETE FROM metrics WHERE latency > 200")
+    writer.commit()
+    writer.close()
+
+    assert db.get_data_version() != before
+
+
+def test_fingerprint_ignores_formatting_but_not_values():
+    assert db.sql_fingerprint("SELECT avg(cpu)  FROM metrics -- now\nWHERE cpu > 10;") == db.sql_fingerprint(
+        "select AVG(CPU) from METRICS where cpu>10"
+    )
+    assert db.sql_fingerprint("SELECT 1 WHERE 'a' = 'a'") != db.sql_fingerprint("SELECT 1 WHERE 'a' = 'b'")
+
+
+def test_results_are_cached_until_the_data_changes(agent_db):
+    sql = "SELECT count(*), max(latency) FROM metrics"
+    assert db.run_sql(sql)["rows"] == [(144, 243.0)]
+    assert db.run_sql(sql.lower())["rows"] == [(144, 243.0)]
+    assert db.result_cache_stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+    writer = sqlite3.connect(agent_db)
+    writer.execute("DELETE FROM metrics WHERE latency > 200")
+    writer.commit()
+    writer.close()
+
+    assert db.run_sql(sql)["rows"] == [(101, 200.0)]
+    assert db.result_cache_stats() == {"entries": 2, "hits": 1, "misses": 2}
+
+
+def test_results_are_not_reused_after_a_reload(agent_db, tmp_path):
+    from sql_agent import ingest
+
+    sql = "SELECT count(*) FROM metrics"
+    assert db.run_sql(sql)["rows"] == [(144,)]
+
+    csv_path = tmp_path / "small.csv"
+    csv_path.write_text("timestamp,latency\n2025-02-01 00:00:00,1\n2025-02-01 00:10:00,2\n")
+    ingest.load_csv(str(csv_path), agent_db)
+
+    assert db.run_sql(sql)["rows"] == [(2,)]
+
+
+def test_result_cache_is_bounded_and_copies():
+    cache = db.ResultCache(max_entries=2)
+    cache.put(("a",), {"rows": [1]})
+    cache.put(("b",), {"rows": [2]})
+    assert cache.get(("a",)) == {"rows": [1]}
+    cache.put(("c",), {"rows": [3]})  # Evicts b, the least recently used
+
+    assert cache.get(("b",)) is None
+    cache.get(("a",))["error"] = "changed by a caller"
+    assert cache.get(("a",)) == {"rows": [1]}
@@ -0,0 +1,68 @@
+import sqlite3
+
+import pytest
+
+from sql_agent import db
+
+ROWS = {"metrics": 2_000_000, "metrics_hourly": 48, "metrics_daily": 2}
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE metrics (timestamp TIMESTAMP, cpu REAL, latency REAL)")
+    conn.execute("CREATE INDEX metrics_timestamp ON metrics (timestamp)")
+    conn.execute("CREATE TABLE metrics_hourly (bucket TIMESTAMP, avg_cpu REAL)")
+    conn.execute("CREATE TABLE metrics_daily (bucket TIMESTAMP, avg_cpu REAL)")
+    # Pretend the tables are full without filling them
+    monkeypatch.setattr(db, "_row_counts", lambda conn: ROWS)
+    yield conn
+    conn.close()
+
+
+def plan(conn, sql):
+    return conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+
+
+def test_table_aliases():
+    sql = ('SELECT * FROM metrics m, metrics_hourly AS h JOIN "metrics_daily" d ON d.bucket = h.bucket '
+           "WHERE m.cpu > 1")
+    assert db.table_aliases(sql) == {"m": "metrics", "h": "metrics_hourly", "d": "metrics_daily"}
+    assert db.table_aliases("SELECT count(*) FROM metrics WHERE cpu > 1") == {"metrics": "metrics"}
+    assert db.table_aliases("SELECT * FROM (SELECT cpu FROM metrics) AS s") == {"metrics": "metrics"}
+
+
+def test_aliases_resolve_to_their_own_tables(conn):
+    sql = "SELECT h.bucket, d.avg_cpu FROM metrics_hourly AS h JOIN metrics_daily AS d"
+    scanned, _ = db.estimate_plan(plan(conn, sql), ROWS, db.table_aliases(sql))
+
+    assert scanned == 48 * 2
+    assert db.review_query(conn, sql) is None
+
+
+def test_automatic_index_is_charged_to_its_table(conn):
+    sql = "SELECT * FROM metrics_hourly h JOIN metrics_daily d ON d.avg_cpu = h.avg_cpu"
+    query_plan = plan(conn, sql)
+    if not any("AUTOMATIC" in detail for *_, detail in query_plan):
+        pytest.skip("this SQLite doesn't build an automatic index here")
+
+    scanned, _ = db.estimate_plan(query_plan, ROWS, db.table_aliases(sql))
+    assert scanned < 200
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT avg(cpu), max(latency) FROM metrics",
+    "SELECT count(*) FROM metrics",
+    "SELECT cpu FROM metrics ORDER BY cpu DESC LIMIT 5",
+])
+def test_single_table_passes_are_allowed_past_the_limit(conn, sql):
+    assert ROWS["metrics"] > db.MAX_SCAN_ROWS
+    assert db.review_query(conn, sql) is None
+
+
+def test_cartesian_join_is_rejected(conn):
+    # An equi-join builds one automatic index: two passes, within the limit
+    assert db.review_query(conn, "SELECT count(*) FROM metrics a JOIN metrics b ON a.cpu = b.latency + 1") is None
+
+    reason = db.review_query(conn, "SELECT count(*) FROM metrics a, metrics b")
+    assert reason is not None and "scans about" in reason
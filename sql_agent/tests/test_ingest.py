@@ -0,0 +1,170 @@
+import csv
+import json
+import sqlite3
+import threading
+import urllib.parse
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from sql_agent import ingest
+
+
+def write_csv(path, headers, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        writer.writerows(rows)
+    return str(path)
+
+
+def timestamp(i):
+    return f"2025-01-01 {i // 3600:02d}:{i // 60 % 60:02d}:{i % 60:02d}"
+
+
+def column_types(db_path, table="metrics"):
+    conn = sqlite3.connect(db_path)
+    try:
+        return ingest.table_columns(conn, table)
+    finally:
+        conn.close()
+
+
+def query(db_path, sql):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+@pytest.fixture(autouse=True)
+def small_sample(monkeypatch):
+    monkeypatch.setattr(ingest, "SAMPLE_SIZE", 5)
+
+
+def test_types_widen_when_values_change_after_the_sample(tmp_path):
+    rows = [[timestamp(i), "", i, 1] for i in range(5)]
+    rows += [[timestamp(5), "2.5", 5.5, "n/a"]]
+    csv_path = write_csv(tmp_path / "m.csv", ["timestamp", "latency", "requests", "flag"], rows)
+    db_path = str(tmp_path / "m.db")
+
+    assert ingest.load_csv(csv_path, db_path) == 6
+
+    assert column_types(db_path) == {
+        "timestamp": "TIMESTAMP", "latency": "REAL", "requests": "REAL", "flag": "TEXT",
+    }
+    assert query(db_path, "SELECT latency, requests, flag FROM metrics ORDER BY timestamp DESC LIMIT 1") == [
+        (2.5, 5.5, "n/a")
+    ]
+    assert query(db_path, "SELECT typeof(requests) FROM metrics GROUP BY 1") == [("real",)]
+    tables = {name for (name,) in query(db_path, "SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert not {"metrics__loading", "metrics__retyped"} & tables
+
+
+def test_empty_sample_column_is_real(tmp_path):
+    rows = [[timestamp(i), ""] for i in range(5)] + [[timestamp(5), "0.25"]]
+    csv_path = write_csv(tmp_path / "m.csv", ["timestamp", "cpu"], rows)
+    db_path = str(tmp_path / "m.db")
+
+    ingest.load_csv(csv_path, db_path)
+
+    assert column_types(db_path)["cpu"] == "REAL"
+    assert query(db_path, "SELECT max(cpu) FROM metrics") == [(0.25,)]
+
+
+def test_failed_rebuild_keeps_the_old_table(tmp_path):
+    db_path = str(tmp_path / "m.db")
+    good = write_csv(tmp_path / "good.csv", ["timestamp", "cpu"], [[timestamp(i), i] for i in range(10)])
+    ingest.load_csv(good, db_path)
+
+    bad_rows = [[timestamp(i), i] for i in range(6)] + [["not a time", 1]]
+    bad = write_csv(tmp_path / "bad.csv", ["timestamp", "cpu"], bad_rows)
+    with pytest.raises(ValueError):
+        ingest.load_csv(bad, db_path)
+
+    assert query(db_path, "SELECT count(*) FROM metrics") == [(10,)]
+    tables = {name for (name,) in query(db_path, "SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert "metrics__loading" not in tables
+    assert query(db_path, "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'metrics'") == [
+        ("metrics_timestamp",)
+    ]
+
+
+def test_append_stores_values_that_outgrow_the_column(tmp_path):
+    db_path = str(tmp_path / "m.db")
+    first = write_csv(tmp_path / "a.csv", ["timestamp", "latency"], [[timestamp(i), i] for i in range(5)])
+    ingest.load_csv(first, db_path)
+
+    more = write_csv(tmp_path / "b.csv", ["timestamp", "latency"], [[timestamp(i), i + 0.5] for i in range(3, 8)])
+    assert ingest.load_csv(more, db_path, append=True) == 3
+
+    assert query(db_path, "SELECT latency FROM metrics WHERE timestamp > '2025-01-01 00:00:04'") == [
+        (5.5,), (6.5,), (7.5,)
+    ]
+
+
+def test_rebuild_without_metric_columns_skips_rollups(tmp_path):
+    db_path = str(tmp_path / "m.db")
+    ingest.load_csv(write_csv(tmp_path / "a.csv", ["timestamp", "cpu"], [[timestamp(i), i] for i in range(5)]), db_path)
+    ingest.load_csv(write_csv(tmp_path / "b.csv", ["timestamp", "requests"], [[timestamp(i), i] for i in range(5)]), db_path)
+
+    tables = {name for (name,) in query(db_path, "SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert not {"metrics_hourly", "metrics_daily"} & tables
+
+
+def api_point(ts, **values):
+    """One point as the collector's /metrics returns it (Flask sends datetimes as HTTP dates)."""
+    created = format_datetime(ts.astimezone(timezone.utc), usegmt=True)
+    return {"id": f"doc{ts:%H%M}", "created_at": created, "timestamp": ts.isoformat(), **values}
+
+
+@pytest.fixture
+def collector_api():
+    points = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = dict(urllib.parse.parse_qsl(urllib.parse.urlparse(self.path).query))
+            start, end = datetime.fromisoformat(query["start"]), datetime.fromisoformat(query["end"])
+            body = json.dumps({"resolution": "raw", "metrics": [
+                p for p in points if start <= datetime.fromisoformat(p["timestamp"]) <= end
+            ]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}", points
+    server.shutdown()
+    server.server_close()
+
+
+def test_sync_from_api_payload(tmp_path, collector_api):
+    url, points = collector_api
+    now = datetime.now().replace(microsecond=0)
+    points += [
+        api_point(now - timedelta(hours=3), latency=120.5, cpu=40, latency_anomaly=False),
+        # Fields can appear later in the window; nested per-target values are skipped
+        api_point(now - timedelta(hours=2), latency=130.0, cpu=41, latency_anomaly=True,
+                  risk_score=0.25, targets={"job=api": {"cpu": 12}}),
+    ]
+    db_path = str(tmp_path / "m.db")
+
+    assert ingest.sync_from_api(url, db_path, since=now - timedelta(hours=4)) == 2
+
+    assert list(column_types(db_path)) == ["timestamp", "cpu", "latency", "latency_anomaly", "risk_score"]
+    assert query(db_path, "SELECT latency, risk_score FROM metrics ORDER BY timestamp") == [
+        (120.5, None), (130.0, 0.25)
+    ]
+
+    points.append(api_point(now - timedelta(hours=1), latency=140.0, cpu=42, latency_anomaly=False, risk_score=0.5))
+    assert ingest.sync_from_api(url, db_path) == 1
+    assert query(db_path, "SELECT count(*), max(latency) FROM metrics") == [(3, 140.0)]
@@ -0,0 +1,97 @@
+import sqlite3
+
+import pytest
+
+from sql_agent import schema
+
+
+def execute(path, sql, rows=()):
+    conn = sqlite3.connect(path)
+    try:
+        conn.executemany(sql, rows) if rows else conn.execute(sql)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+INSERT = "INSERT INTO metrics (timestamp, latency, cpu, memory, error_rate, risk_score) VALUES (?, ?, ?, ?, ?, ?)"
+
+
+@pytest.fixture
+def scans(monkeypatch):
+    """Rowid each _scan call started after (None for a full scan), by table."""
+    calls = []
+    scan = schema.SchemaCache._scan
+
+    def counting_scan(self, conn, table, columns, after_rowid):
+        calls.append((table, after_rowid))
+        return scan(self, conn, table, columns, after_rowid)
+
+    monkeypatch.setattr(schema.SchemaCache, "_scan", counting_scan)
+    return calls
+
+
+def test_unchanged_database_is_not_rescanned(agent_db, scans):
+    cache = schema.SchemaCache()
+    text = cache.get()
+    assert "Table: metrics (144 rows, 2025-01-01 00:00:00 to 2025-01-01 23:50:00)" in text
+    assert "error_rate (REAL): values 0.5 (144)" in text
+
+    scans.clear()
+    assert cache.get() is text
+    assert scans == []
+
+
+def test_appended_rows_update_the_stats_incrementally(agent_db, scans):
+    cache = schema.SchemaCache()
+    cache.get()
+    scans.clear()
+
+    execute(agent_db, INSERT, [
+        ("2025-01-02 00:00:00", 1000.0, None, 40.0, 0.75, 0.9),
+        ("2025-01-02 00:10:00", 50.0, 99.0, 40.0, 0.5, 0.1),
+    ])
+    text = cache.get()
+
+    assert ("metrics", 144) in scans and ("metrics", None) not in scans
+    assert "Table: metrics (146 rows, 2025-01-01 00:00:00 to 2025-01-02 00:10:00)" in text
+    assert "latency (INTEGER): range 50 to 1000" in text
+    assert "cpu (INTEGER): range 20 to 99; 1 nulls" in text
+    assert "error_rate (REAL): values 0.5 (145), 0.75 (1)" in text
+    assert text == schema.SchemaCache().get()  # Same as building from scratch
+
+
+def test_deleted_rows_force_a_full_rescan(agent_db, scans):
+    cache = schema.SchemaCache()
+    cache.get()
+    scans.clear()
+
+    execute(agent_db, "DELETE FROM metrics WHERE latency > 200")
+    text = cache.get()
+
+    assert ("metrics", None) in scans
+    assert "Table: metrics (101 rows" in text
+    assert "latency (INTEGER): range 100 to 200" in text
+    assert text == schema.SchemaCache().get()
+
+
+def test_values_are_dropped_once_a_column_is_no_longer_low_cardinality(agent_db):
+    cache = schema.SchemaCache()
+    assert "memory (REAL): values 40 (144)" in cache.get()
+
+    rows = [(f"2025-01-02 {i:02d}:00:00", 100.0, 20.0, 41.0 + i, 0.5, 0.1) for i in range(schema.LOW_CARDINALITY)]
+    execute(agent_db, INSERT, rows)
+    text = cache.get()
+
+    assert "memory (REAL): range 40 to 60" in text
+    assert text == schema.SchemaCache().get()
+
+
+def test_schema_changes_start_over(agent_db):
+    cache = schema.SchemaCache()
+    cache.get()
+
+    execute(agent_db, "ALTER TABLE metrics ADD COLUMN region TEXT")
+    execute(agent_db, "UPDATE metrics SET region = 'eu' WHERE rowid <= 10")
+
+    assert "region (TEXT): values eu (10); 134 nulls" in cache.get()
@@ -0,0 +1,73 @@
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from atom_common.semantic_cache import SemanticCache
+
+pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient
+
+import server
+from sql_agent.crew_pool import CrewPool
+
+
+@pytest.fixture
+def api(agent_db, crew_factory, monkeypatch):
+    """The API with one fake crew and no room to queue."""
+    monkeypatch.setattr(server, "crew_pool", CrewPool(size=1, max_waiting=0, factory=crew_factory, rebuild_delay=0))
+    monkeypatch.setattr(server, "answer_cache", SemanticCache())
+    with TestClient(server.app) as client:
+        yield client
+
+
+def ask(client, question):
+    return client.post("/query", json={"question": question})
+
+
+def test_busy_pool_returns_503(api, crew_factory):
+    crew = crew_factory.built[0]
+    crew.release.clear()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        first = pool.submit(ask, api, "Why did latency rise?")
+        assert crew.running.wait(5)
+        busy = ask(api, "Why did cpu rise?")
+        crew.release.set()
+        assert first.result().status_code == 200
+
+    assert busy.status_code == 503
+    assert api.get("/pool/stats").json()["rejected"] == 1
+
+
+def test_failed_crew_returns_500_and_is_replaced(api, crew_factory):
+    crew_factory.built[0].error = RuntimeError("tool crashed")
+    assert ask(api, "Why did latency rise?").status_code == 500
+
+    deadline = time.monotonic() + 5
+    while api.get("/pool/stats").json()["available"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    response = ask(api, "Why did cpu rise?")
+    assert response.status_code == 200
+    assert response.json()["answer"] == "crew1: Why did cpu rise?"
+
+
+def test_answers_are_cached_until_the_data_changes(api, agent_db):
+    question = "Why did latency rise on the first day?"
+    assert ask(api, question).json()["answer"] == f"crew0: {question}"
+
+    # Rephrased: answered from the cache without running the crew
+    cached = ask(api, "why did latency rise on the first day").json()
+    assert cached["answer"] == f"crew0: {question}"
+    assert api.get("/pool/stats").json()["served"] == 1
+
+    # A different metric is a different question
+    assert ask(api, "Why did cpu rise on the first day?").json()["answer"].endswith("cpu rise on the first day?")
+    assert api.get("/pool/stats").json()["served"] == 2
+
+    conn = sqlite3.connect(agent_db)
+    with conn:
+        conn.execute("INSERT INTO metrics (timestamp, latency) VALUES ('2025-01-02 00:00:00', 500)")
+    conn.close()
+    ask(api, question)
+    assert api.get("/pool/stats").json()["served"] == 3
+    assert api.get("/cache/stats").json()["answers"] == {"entries": 3, "hits": 1, "misses": 3}